@@ -0,0 +1,226 @@
+"""
+Answer cache in front of the LLM
+
+An answer is reused only when the question (after normalization), the
+retrieved chunks, the prompt template and the model are all the same, so
+editing the notes or the prompt naturally invalidates old answers.
+
+Two optional extras:
+- `path`: an SQLite file that keeps answers across restarts and processes
+  (expired rows and those past `max_disk_entries` are pruned on write)
+- `semantic_threshold`: also reuse an answer when a new question's
+  embedding is at least this cosine-similar to a cached question that
+  retrieved the same chunks ("what's a stack" vs "What is a stack?")
+"""
+
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def doc_chunk_id(doc):
+    """Chunk ID stored by the index, or a hash of the text for older entries"""
+    cid = doc.metadata.get("chunk_id") if doc.metadata else None
+    if cid:
+        return cid
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class DiskAnswerStore:
+    """
+    SQLite-backed answer store shared by every process using the same file
+
+    Every `put` deletes expired rows and, past `max_rows`, the oldest ones,
+    so the file stays bounded like the in-memory tier.
+    """
+
+    def __init__(self, path, max_rows=10000):
+        self.path = path
+        self.max_rows = max_rows
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers "
+                "(key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers (created)")
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, ttl):
+        row = self._connect().execute(
+            "SELECT answer, created FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        answer, created = row
+        if ttl is not None and time.time() - created > ttl:
+            return None
+        return answer
+
+    def put(self, key, answer, ttl=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created) VALUES (?, ?, ?)",
+                (key, answer, now),
+            )
+            if ttl is not None:
+                conn.execute("DELETE FROM answers WHERE created < ?", (now - ttl,))
+            if self.max_rows is not None:
+                conn.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers "
+                    "ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+class AnswerCache:
+    """In-memory LRU/TTL answer cache with optional disk and semantic tiers"""
+
+    def __init__(self, max_entries=512, ttl=24 * 3600, path=None,
+                 semantic_threshold=None, embeddings=None, max_disk_entries=10000):
+        if semantic_threshold is not None and embeddings is None:
+            raise ValueError("semantic_threshold needs an embeddings model")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self.embeddings = embeddings
+        self.disk = DiskAnswerStore(path, max_disk_entries) if path else None
+        self._lock = threading.Lock()
+        # key -> (answer, created, question vector or None, context key)
+        self._entries = OrderedDict()
+        # context key (chunks + prompt + model) -> keys of cached questions
+        self._by_context = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def context_key(docs, namespace):
+        """Everything except the question: retrieved chunks, prompt and model"""
+        payload = json.dumps([namespace, [doc_chunk_id(doc) for doc in docs]])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def answer_key(question, context_key):
+        payload = json.dumps([normalize_question(question), context_key])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_context.get(entry[3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry[3]]
+
+    def _remember(self, key, ctx, answer, vector):
+        self._drop(key)
+        self._entries[key] = (answer, time.time(), vector, ctx)
+        self._by_context.setdefault(ctx, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _question_vector(self, question):
+        if self.semantic_threshold is None:
+            return None
+        return self.embeddings.embed_query(normalize_question(question))
+
+    def get(self, question, docs, namespace):
+        """Cached answer for this question and context, or None"""
+        ctx = self.context_key(docs, namespace)
+        key = self.answer_key(question, ctx)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._drop(key)
+
+        if self.disk is not None:
+            answer = self.disk.get(key, self.ttl)
+            if answer is not None:
+                with self._lock:
+                    self._remember(key, ctx, answer, None)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return answer
+
+        if self.semantic_threshold is not None:
+            vector = self._question_vector(question)
+            with self._lock:
+                best, best_score = None, self.semantic_threshold
+                for other in self._by_context.get(ctx, ()):
+                    answer, created, other_vector, _ = self._entries[other]
+                    if other_vector is None or self._expired(created):
+                        continue
+                    score = _cosine(vector, other_vector)
+                    if score >= best_score:
+                        best, best_score = answer, score
+                if best is not None:
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return best
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question, docs, namespace, answer):
+        """Store a freshly generated answer"""
+        ctx = self.context_key(docs, namespace)
+        key = self.answer_key(question, ctx)
+        vector = self._question_vector(question)
+        with self._lock:
+            self._remember(key, ctx, answer, vector)
+        if self.disk is not None:
+            self.disk.put(key, answer, self.ttl)
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+            }
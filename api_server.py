@@ -0,0 +1,325 @@
+"""
+HTTP/JSON query service for the DSA Assistant (ASGI, no Streamlit)
+
+Endpoints:
+    POST /ask          {"question": ..., "topic": ...}   -> answer and sources
+    POST /ask/batch    {"questions": [...]}              -> one result per question
+    POST /ask/stream   {"question": ..., "topic": ...}   -> NDJSON: {"token"} lines,
+                                                            then {"done": true, ...}
+    GET  /healthz      readiness, in-flight and queued requests
+    GET  /metrics      per-stage latency metrics, Prometheus text format
+
+Each worker process holds one shared DSAAssistant (built at startup from
+shared_resources). At most `max_in_flight` requests run at once and up
+to `max_queue` more wait, each for at most `queue_timeout` seconds;
+anything beyond that gets 503 with Retry-After, so a burst backs up into
+the clients instead of into memory. On shutdown the worker stops
+admitting requests and lets the ones in flight finish.
+
+Usage:
+    python api_server.py --port 8000 --workers 2
+    uvicorn api_server:app --port 8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from llm_client import is_rate_limit_error
+
+MAX_BATCH = 32
+
+
+class Rejected(Exception):
+    """The service can't take the request right now (503)"""
+
+
+class BadRequest(Exception):
+    """The request body is invalid (400)"""
+
+
+class Admission:
+    """Bounded concurrency with a bounded, time-limited wait queue"""
+
+    def __init__(self, max_in_flight=8, max_queue=64, queue_timeout=30.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.draining = False
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def acquire(self):
+        if self.draining:
+            self.rejected += 1
+            raise Rejected("shutting down")
+        if self.in_flight >= self.max_in_flight and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Rejected("queue full")
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Rejected("timed out waiting in the queue")
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        self._idle.clear()
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+        if self.in_flight == 0:
+            self._idle.set()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def drain(self, timeout):
+        """Refuse new requests and wait up to `timeout` s for running ones"""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _source(doc):
+    metadata = doc.metadata or {}
+    return {
+        "source": metadata.get("source"),
+        "topic": metadata.get("topic"),
+        "heading_path": metadata.get("heading_path"),
+        "text": doc.page_content,
+    }
+
+
+def _error(status, message, **headers):
+    return JSONResponse({"error": message}, status_code=status, headers=headers or None)
+
+
+async def _question(request):
+    """(question, topic) from the JSON body, or BadRequest"""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("Body must be JSON")
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        raise BadRequest('"question" must be a non-empty string')
+    return question, body.get("topic")
+
+
+def _guarded(handler):
+    """Map admission, input and upstream errors to HTTP responses"""
+    async def endpoint(request):
+        if request.app.state.assistant is None:
+            return _error(503, "assistant is loading", **{"Retry-After": "5"})
+        try:
+            return await handler(request)
+        except Rejected as e:
+            return _error(503, str(e), **{"Retry-After": "1"})
+        except BadRequest as e:
+            return _error(400, str(e))
+        except TimeoutError as e:
+            return _error(504, str(e))
+        except Exception as e:
+            if is_rate_limit_error(e):
+                return _error(503, f"LLM rate limit: {e}", **{"Retry-After": "5"})
+            return _error(502, f"{type(e).__name__}: {e}")
+    return endpoint
+
+
+@_guarded
+async def ask(request):
+    question, topic = await _question(request)
+    state = request.app.state
+    start = time.perf_counter()
+    async with state.admission.slot():
+        answer, docs = await state.assistant.aask(question, timeout=state.request_timeout,
+                                                  topic=topic)
+    return JSONResponse({
+        "answer": answer,
+        "sources": [_source(doc) for doc in docs],
+        "seconds": round(time.perf_counter() - start, 3),
+    })
+
+
+@_guarded
+async def ask_batch(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise BadRequest("Body must be JSON")
+    questions = body.get("questions") if isinstance(body, dict) else None
+    if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+        raise BadRequest('"questions" must be a list of strings')
+    if len(questions) > MAX_BATCH:
+        raise BadRequest(f"At most {MAX_BATCH} questions per batch")
+    state = request.app.state
+    async with state.admission.slot():
+        results = await state.assistant.abatch(questions, timeout=state.request_timeout)
+    return JSONResponse({"results": [
+        {"error": f"{type(r).__name__}: {r}"} if isinstance(r, Exception)
+        else {"answer": r[0], "sources": [_source(doc) for doc in r[1]]}
+        for r in results
+    ]})
+
+
+class _SlotResponse(StreamingResponse):
+    """A streaming response that gives back its admission slot however it ends"""
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        # Also when the body never starts, e.g. the client left while queued
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+@_guarded
+async def ask_stream(request):
+    question, topic = await _question(request)
+    state = request.app.state
+    await state.admission.acquire()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            state.admission.release()
+
+    async def lines():
+        # The slot is held until the last token is sent
+        try:
+            chunks = state.assistant.ask_stream(question, topic=topic)
+            async for chunk in iterate_in_threadpool(chunks):
+                if isinstance(chunk, str):
+                    yield json.dumps({"token": chunk}) + "\n"
+                else:
+                    chunk = dict(chunk, done=True,
+                                 sources=[_source(doc) for doc in chunk["sources"]])
+                    yield json.dumps(chunk) + "\n"
+        except Exception as e:
+            yield json.dumps({"done": True, "error": f"{type(e).__name__}: {e}"}) + "\n"
+        finally:
+            release()
+
+    return _SlotResponse(lines(), release, media_type="application/x-ndjson")
+
+
+async def healthz(request):
+    state = request.app.state
+    admission = state.admission
+    if admission is not None and admission.draining:
+        status = "draining"
+    else:
+        status = "ok" if state.assistant is not None else "loading"
+    return JSONResponse({
+        "status": status,
+        "in_flight": admission.in_flight if admission else 0,
+        "queued": admission.queued if admission else 0,
+        "rejected": admission.rejected if admission else 0,
+    }, status_code=200 if status == "ok" else 503)
+
+
+async def metrics(request):
+    assistant = request.app.state.assistant
+    text = assistant.metrics.to_prometheus() if assistant is not None else ""
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+def _default_assistant():
+    from shared_resources import get_shared_resources
+
+    return get_shared_resources().assistant(
+        notes_file=os.getenv("DSA_NOTES", "dsa_notes.txt"),
+        persist_directory=os.getenv("DSA_PERSIST_DIRECTORY", "./chroma_db"),
+    )
+
+
+def create_app(assistant_factory=_default_assistant, max_in_flight=8, max_queue=64,
+               queue_timeout=30.0, request_timeout=60.0, shutdown_timeout=30.0):
+    """
+    The ASGI app. `assistant_factory()` builds the worker's DSAAssistant
+    at startup (in a thread, so the event loop stays responsive).
+    """
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.admission = Admission(max_in_flight, max_queue, queue_timeout)
+        app.state.assistant = await run_in_threadpool(assistant_factory)
+        app.state.assistant.wait_until_ready()
+        try:
+            yield
+        finally:
+            await app.state.admission.drain(shutdown_timeout)
+            app.state.assistant.stop_watching()
+
+    app = Starlette(
+        routes=[
+            Route("/ask", ask, methods=["POST"]),
+            Route("/ask/batch", ask_batch, methods=["POST"]),
+            Route("/ask/stream", ask_stream, methods=["POST"]),
+            Route("/healthz", healthz),
+            Route("/metrics", metrics),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.assistant = None
+    app.state.admission = None
+    app.state.request_timeout = request_timeout
+    return app
+
+
+def _app_from_env():
+    return create_app(
+        max_in_flight=int(os.getenv("DSA_API_MAX_IN_FLIGHT", "8")),
+        max_queue=int(os.getenv("DSA_API_MAX_QUEUE", "64")),
+        queue_timeout=float(os.getenv("DSA_API_QUEUE_TIMEOUT", "30")),
+    )
+
+
+app = _app_from_env()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="DSA Assistant HTTP/JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes, each with its own assistant")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="seconds to let in-flight requests finish on shutdown")
+    args = parser.parse_args()
+
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers,
+                timeout_graceful_shutdown=args.graceful_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,11 @@ Streamlit Web UI for DSA Learning Assistant
 
 import streamlit as st
 import os
+import uuid
 from dotenv import load_dotenv
-from dsa_assistant import DSAAssistant
+from llm_client import is_rate_limit_error
+from precomputed_answers import EXAMPLE_TOPICS
+from shared_resources import get_shared_resources
 
 # Page configuration
 st.set_page_config(
@@ -617,8 +620,19 @@ st.markdown("""
 # Initialize session state
 if 'assistant' not in st.session_state:
     st.session_state.assistant = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+# Every rerun counts as activity; idle sessions drop out of the stats
+get_shared_resources().touch_session(st.session_state.session_id)
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if 'pending_question' not in st.session_state:
+    st.session_state.pending_question = None
+
+if 'pending_topic' not in st.session_state:
+    st.session_state.pending_topic = None
+if 'last_timing' not in st.session_state:
+    st.session_state.last_timing = None
 if 'initialized' not in st.session_state:
     st.session_state.initialized = False
 if 'reaction_counts' not in st.session_state:
@@ -642,7 +656,10 @@ def initialize_assistant():
     try:
         load_dotenv()
         with st.spinner("🔄 Initializing DSA Assistant... This may take a moment on first run."):
-            st.session_state.assistant = DSAAssistant()
+            # One assistant per server process, shared read-only by all sessions
+            st.session_state.assistant = get_shared_resources().assistant(
+                session_id=st.session_state.session_id
+            )
             st.session_state.initialized = True
         st.success("✅ Assistant ready!")
         return True
@@ -652,34 +669,45 @@ def initialize_assistant():
         st.exception(e)  # Show full traceback
         return False
 
-def get_answer(question):
-    """Get answer from the assistant"""
+def stream_answer(question, placeholder, topic=None):
+    """Stream the answer into `placeholder` as tokens arrive"""
+    answer = ""
     try:
-        rag_chain, retriever = st.session_state.assistant.qa_chain
-        answer = rag_chain.invoke(question)
-        source_docs = retriever.invoke(question)  # Updated method
-        return answer, source_docs
+        for chunk in st.session_state.assistant.ask_stream(question, topic=topic):
+            if isinstance(chunk, str):
+                answer += chunk
+                display_message("assistant", answer, container=placeholder)
+            else:
+                st.session_state.last_timing = chunk
+        return answer
     except Exception as e:
+        if is_rate_limit_error(e):
+            # Retries already waited; this is a burst, not a broken app
+            st.warning("⏳ Lots of questions right now! Please ask again in a few seconds.")
+            return "⏳ I'm a bit busy right now, please ask again in a few seconds!"
         st.error(f"Error getting answer: {str(e)}")
         st.exception(e)  # Show full traceback
-        return f"❌ Error: {str(e)}", []
+        return f"❌ Error: {str(e)}"
 
-def display_message(role, content):
-    """Display a chat message with fun reactions"""
-    import html
+def pick_reactions():
+    """Four fun reaction emojis, picked once when a message is added"""
     import random
+    reactions = ['💯', '🔥', '⭐', '🎉', '👍', '💪', '🚀', '❤️']
+    return random.sample(reactions, 4)
+
+def display_message(role, content, container=None, reactions=()):
+    """Display a chat message with its reactions (none while it's still streaming)"""
+    target = container if container is not None else st
+    import html
     # Properly escape and format content
     content = html.escape(str(content))
     # Replace newlines with proper line breaks
     content = content.replace('\n', '<br>')
     
-    # Fun reaction emojis
-    reactions = ['💯', '🔥', '⭐', '🎉', '👍', '💪', '🚀', '❤️']
-    random_reactions = random.sample(reactions, 4)
-    reaction_html = ''.join([f'<span class="message-reaction" title="React!">{emoji}</span>' for emoji in random_reactions])
+    reaction_html = ''.join([f'<span class="message-reaction" title="React!">{emoji}</span>' for emoji in reactions])
     
     if role == "user":
-        st.markdown(f"""
+        target.markdown(f"""
 <div class="chat-message user-message">
 <div class="message-header">
 <span style="font-size: 24px;">👤</span>
@@ -692,7 +720,7 @@ def display_message(role, content):
 </div>
 """, unsafe_allow_html=True)
     else:
-        st.markdown(f"""
+        target.markdown(f"""
 <div class="chat-message assistant-message">
 <div class="message-header">
 <span style="font-size: 24px;">🎓</span>
@@ -705,6 +733,19 @@ def display_message(role, content):
 </div>
 """, unsafe_allow_html=True)
 
+@st.fragment(run_every=2)
+def show_latency_breakdown():
+    """Live per-stage latency of recent questions (refreshes every 2 s)"""
+    stages = get_shared_resources().stats()["stages"]
+    if not stages:
+        st.caption("📈 Latency breakdown appears after the first question")
+        return
+    st.caption("📈 Latency by stage (recent questions)")
+    st.table([
+        {"stage": stage, "count": s["count"], "p50 ms": s["p50_ms"], "p95 ms": s["p95_ms"]}
+        for stage, s in stages.items()
+    ])
+
 def show_typing_indicator():
     """Display a fun typing indicator"""
     import random
@@ -763,39 +804,17 @@ with st.sidebar:
 </div>
 """, unsafe_allow_html=True)
     
-    example_topics = {
-        "📊 Arrays": "What is an array and how does it work?",
-        "🔗 Linked Lists": "How do I reverse a linked list?",
-        "📚 Stacks": "What is a stack and when should I use it?",
-        "🚶 Queues": "What's the difference between stack and queue?",
-        "🔍 Binary Search": "Explain binary search in simple terms",
-        "📈 Big O": "What is Big O notation?",
-        "🔄 Recursion": "What is recursion and how does it work?",
-        "🌲 Trees": "What is a binary search tree?",
-        "🔢 Bubble Sort": "How does bubble sort work?",
-        "⚡ Merge Sort": "Explain merge sort step by step",
-    }
+    # Each button searches only its own topic's sections of the notes;
+    # their answers are precomputed at startup (see precomputed_answers.py)
+    example_topics = EXAMPLE_TOPICS
     
-    for topic, question in example_topics.items():
+    for topic, (question, search_topic) in example_topics.items():
         if st.button(topic, key=topic, use_container_width=True):
             if st.session_state.initialized:
-                # Add user message
-                st.session_state.chat_history.append(("user", question))
-                
-                # Show typing indicator
-                typing_placeholder = st.empty()
-                with typing_placeholder:
-                    show_typing_indicator()
-                
-                # Get assistant response
-                answer, sources = get_answer(question)
-                typing_placeholder.empty()
-                
-                # Add assistant message
-                st.session_state.chat_history.append(("assistant", answer))
-                
-                # Rerun to update chat
-                st.rerun()
+                # Add user message; the answer streams into the chat below
+                st.session_state.chat_history.append(("user", question, pick_reactions()))
+                st.session_state.pending_question = question
+                st.session_state.pending_topic = search_topic
             else:
                 st.warning("Please wait for assistant to initialize first!")
     
@@ -805,6 +824,24 @@ with st.sidebar:
         st.session_state.chat_history = []
         st.rerun()
     
+    with st.expander("⚙️ Server stats"):
+        stats = get_shared_resources().stats()
+        st.caption(f"👥 Active sessions sharing the assistant: {stats['sessions']}")
+        st.caption(f"🧠 Shared models memory: {stats['build_memory_mb']} MB "
+                   f"(process: {stats['process_memory_mb']} MB)")
+        st.caption(f"⏱️ One-time build: {stats['build_seconds']} s")
+        st.caption(f"💾 Answer cache: {stats['cache_hits']} hits / "
+                   f"{stats['cache_misses']} misses")
+        st.caption(f"🔥 Precomputed answers: {stats['precomputed_answers']} stored, "
+                   f"{stats['precomputed_hits']} served")
+        st.caption(f"🔢 Embedding cache: {stats['embedding_cache_hits']} hits / "
+                   f"{stats['embedding_cache_misses']} misses")
+        st.caption(f"🪙 Tokens: {stats['prompt_tokens']} prompt / "
+                   f"{stats['completion_tokens']} completion, {stats['errors']} errors")
+        st.caption(f"🚦 LLM queue: {stats['llm_queue_depth']} waiting, "
+                   f"{stats['llm_retries']} retries, {stats['llm_rate_limited']} rate-limited")
+        show_latency_breakdown()
+    
     st.markdown("---")
     st.markdown("""
 <div class='info-box'>
@@ -895,8 +932,34 @@ with chat_container:
 </div>
 """, unsafe_allow_html=True)
     else:
-        for role, message in st.session_state.chat_history:
-            display_message(role, message)
+        for role, message, reactions in st.session_state.chat_history:
+            display_message(role, message, reactions=reactions)
+        
+        if st.session_state.pending_question:
+            question = st.session_state.pending_question
+            topic = st.session_state.pending_topic
+            st.session_state.pending_question = None
+            st.session_state.pending_topic = None
+            
+            # Typing indicator until the first token replaces it
+            answer_placeholder = st.empty()
+            with answer_placeholder:
+                show_typing_indicator()
+            
+            answer = stream_answer(question, answer_placeholder, topic=topic)
+            
+            # Add assistant message
+            st.session_state.chat_history.append(("assistant", answer, pick_reactions()))
+            
+            # Rerun to update chat
+            st.rerun()
+        
+        if st.session_state.last_timing:
+            timing = st.session_state.last_timing
+            st.caption(f"⚡ First token in {timing['time_to_first_token']:.2f}s · "
+                       f"full answer in {timing['total_time']:.2f}s · "
+                       f"{timing['context_tokens']} context tokens "
+                       f"({timing['saved_tokens']} saved)")
 
 # Input area
 st.markdown("""
@@ -918,20 +981,9 @@ with st.form(key="question_form", clear_on_submit=True):
 # Handle question submission
 if submit_button and user_input and user_input.strip():
     if st.session_state.initialized:
-        # Add user message
-        st.session_state.chat_history.append(("user", user_input))
-        
-        # Show typing indicator
-        typing_placeholder = st.empty()
-        with typing_placeholder:
-            show_typing_indicator()
-        
-        # Get assistant response
-        answer, sources = get_answer(user_input)
-        typing_placeholder.empty()
-        
-        # Add assistant message
-        st.session_state.chat_history.append(("assistant", answer))
+        # Add user message; the answer streams into the chat on rerun
+        st.session_state.chat_history.append(("user", user_input, pick_reactions()))
+        st.session_state.pending_question = user_input
         
         # Rerun to update chat
         st.rerun()
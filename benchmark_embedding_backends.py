@@ -0,0 +1,93 @@
+"""
+Benchmark: torch vs ONNX Runtime vs int8 ONNX embeddings
+
+Embeds the chunks of the notes with each backend and reports model load
+time and embeddings per second, then a parity check: for a set of
+questions, the share of torch's top-k chunks each backend also ranks in
+its top k (recall@k). Exits non-zero if a backend falls below
+`--min-recall`. Needs the model files (downloaded on first run).
+
+Usage:
+    python benchmark_embedding_backends.py
+    python benchmark_embedding_backends.py --backends torch onnx-int8 --threads 2 -k 5
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from dsa_assistant import EMBEDDING_MODEL, SPLITTER_SETTINGS
+from embedding_backends import EMBEDDING_BACKENDS, load_embeddings
+from example_usage import questions as EXAMPLE_QUESTIONS
+from ingestion import iter_chunks
+
+
+def top_k(doc_vectors, query_vectors, k):
+    """Indices of the k most similar chunks for each query (unit vectors)"""
+    scores = np.asarray(query_vectors) @ np.asarray(doc_vectors).T
+    return [list(row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+
+def recall_at_k(reference, candidate):
+    """Mean share of each reference top-k list found in the candidate's"""
+    hits = [len(set(ref) & set(cand)) / len(ref) for ref, cand in zip(reference, candidate)]
+    return sum(hits) / len(hits)
+
+
+def run_backend(backend, texts, queries, batch_size, threads, k):
+    """Load, embed and search with one backend; returns timings and rankings"""
+    start = time.perf_counter()
+    embeddings = load_embeddings(EMBEDDING_MODEL, backend, batch_size=batch_size, threads=threads)
+    embeddings.embed_query("warm up")
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc_vectors = embeddings.embed_documents(texts)
+    embed_s = time.perf_counter() - start
+
+    query_vectors = [embeddings.embed_query(q) for q in queries]
+    return {
+        "load_s": load_s,
+        "per_second": len(texts) / embed_s,
+        "ranking": top_k(doc_vectors, query_vectors, k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", default="dsa_notes.txt")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS),
+                        choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    args = parser.parse_args()
+
+    texts = [text for text, _ in iter_chunks(args.notes, SPLITTER_SETTINGS, workers=1)]
+    print(f"📚 {len(texts)} chunks, {len(EXAMPLE_QUESTIONS)} questions, k={args.k}\n")
+
+    # torch is the reference for the parity check
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    reference = None
+    failed = []
+    print(f"{'backend':>10} {'load s':>8} {'emb/s':>9} {'recall@k':>9}")
+    for backend in backends:
+        r = run_backend(backend, texts, EXAMPLE_QUESTIONS, args.batch_size, args.threads, args.k)
+        if reference is None:
+            reference = r["ranking"]
+        recall = recall_at_k(reference, r["ranking"])
+        if recall < args.min_recall:
+            failed.append(backend)
+        print(f"{backend:>10} {r['load_s']:>8.2f} {r['per_second']:>9.1f} {recall:>9.3f}")
+
+    if failed:
+        print(f"\n❌ recall@{args.k} below {args.min_recall} for: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"\n✅ Every backend matches torch's top {args.k} within recall {args.min_recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark: retrieval quality and speed of DSAAssistant, offline
+
+Builds an assistant for every configuration (chunk size x k x vector
+backend x retrieval mode) over the notes and asks the labeled questions
+in `benchmark_questions.json`, each tagged with the notes heading that
+answers it. Reports recall@k (share of questions with a chunk from the
+right section in the top k), MRR, index build time, embedding throughput
+and p50/p95/p99 retrieval latency, and writes everything as JSON so two
+releases can be compared.
+
+Nothing is downloaded and no LLM is called. `--embeddings hashing` uses
+a deterministic bag-of-words embedding instead of the model, for
+machines without the model files.
+
+Usage:
+    python benchmark_retrieval.py
+    python benchmark_retrieval.py --chunk-sizes 500 1000 -k 3 5 --backends numpy chroma
+    python benchmark_retrieval.py --embeddings hashing --output results.json
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from dsa_assistant import DSAAssistant, EMBEDDING_MODEL, SPLITTER_SETTINGS
+from embedding_backends import EMBEDDING_BACKENDS, load_embeddings
+from embedding_cache import CachedEmbeddings
+from ingestion import heading_titles
+from lexical_index import tokenize
+from section_tree import normalize_title
+
+QUESTIONS_FILE = "benchmark_questions.json"
+DIM = 384
+
+
+class HashingEmbeddings(Embeddings):
+    """Signed feature hashing of word tokens into unit vectors; no model needed"""
+
+    def _vector(self, text):
+        vector = np.zeros(DIM, dtype=np.float32)
+        for token in tokenize(text):
+            h = zlib.crc32(token.encode("utf-8"))
+            vector[h % DIM] += 1.0 if h & 1 << 31 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class ThroughputEmbeddings(Embeddings):
+    """Counts the documents embedded and the time spent embedding them"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.documents = 0
+        self.seconds = 0.0
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        self.seconds += time.perf_counter() - start
+        self.documents += len(texts)
+        return vectors
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def load_questions(path=QUESTIONS_FILE):
+    """The labeled (question, section heading) set"""
+    with open(path, encoding="utf-8") as f:
+        return [(item["question"], item["section"]) for item in json.load(f)]
+
+
+def in_section(doc, section):
+    """Whether a chunk sits under, or contains, the heading `section`"""
+    titles = doc.metadata.get("heading_path", "").split(" > ") + heading_titles(doc.page_content)
+    return normalize_title(section) in {normalize_title(title) for title in titles}
+
+
+def first_hit_rank(docs, section):
+    """1-based rank of the first chunk from `section`, or None"""
+    for rank, doc in enumerate(docs, start=1):
+        if in_section(doc, section):
+            return rank
+    return None
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(np.ceil(p / 100 * len(ordered))) - 1))]
+
+
+def run_config(embeddings, notes, questions, chunk_size, k, backend, retrieval, rounds):
+    """Build one assistant and measure it; returns a result dict"""
+    directory = tempfile.mkdtemp(prefix="bench_retrieval_")
+    timed = ThroughputEmbeddings(embeddings)
+    splitter = dict(SPLITTER_SETTINGS, chunk_size=chunk_size, chunk_overlap=chunk_size // 5)
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            assistant = DSAAssistant(
+                notes_file=notes,
+                persist_directory=directory,
+                # max_entries=0: every question is embedded, as on first sight
+                embeddings=CachedEmbeddings(timed, namespace="benchmark", max_entries=0),
+                llm=FakeListChatModel(responses=["unused"]),
+                k=k,
+                vector_backend=backend,
+                retrieval=retrieval,
+                ingest_workers=1,
+                splitter_settings=splitter,
+            )
+        build_s = time.perf_counter() - start
+        assistant.retrieve(questions[0][0])  # warm up
+
+        ranks, latencies = [], []
+        for round_number in range(rounds):
+            for question, section in questions:
+                start = time.perf_counter()
+                docs = assistant.retrieve(question)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if round_number == 0:
+                    ranks.append(first_hit_rank(docs, section))
+
+        return {
+            "chunk_size": chunk_size,
+            "k": k,
+            "backend": backend,
+            "retrieval": retrieval,
+            "chunks": len(assistant.index.chunks),
+            "recall_at_k": sum(r is not None for r in ranks) / len(ranks),
+            "mrr": sum(1 / r for r in ranks if r) / len(ranks),
+            "build_s": build_s,
+            "embeddings_per_s": timed.documents / timed.seconds if timed.seconds else None,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def create_benchmark_embeddings(name):
+    """The embedding model to benchmark with, from local files only"""
+    if name == "hashing":
+        return HashingEmbeddings()
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    return load_embeddings(EMBEDDING_MODEL, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", default="dsa_notes.txt")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--embeddings", default="torch",
+                        choices=list(EMBEDDING_BACKENDS) + ["hashing"])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+",
+                        default=[SPLITTER_SETTINGS["chunk_size"]])
+    parser.add_argument("-k", type=int, nargs="+", default=[3])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"],
+                        choices=["numpy", "chroma"])
+    parser.add_argument("--retrieval", nargs="+", default=["hybrid", "dense"],
+                        choices=["hybrid", "dense"])
+    parser.add_argument("--rounds", type=int, default=5,
+                        help="times each question is asked for the latency percentiles")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    embeddings = create_benchmark_embeddings(args.embeddings)
+    print(f"📚 {len(questions)} labeled questions, embeddings: {args.embeddings}\n")
+
+    results = []
+    print(f"{'chunk':>6} {'k':>3} {'backend':>8} {'mode':>7} {'recall':>7} {'mrr':>6} "
+          f"{'build s':>8} {'emb/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}")
+    grid = itertools.product(args.chunk_sizes, args.k, args.backends, args.retrieval)
+    for chunk_size, k, backend, retrieval in grid:
+        r = run_config(embeddings, args.notes, questions, chunk_size, k, backend,
+                       retrieval, args.rounds)
+        results.append(r)
+        print(f"{chunk_size:>6} {k:>3} {backend:>8} {retrieval:>7} {r['recall_at_k']:>7.3f} "
+              f"{r['mrr']:>6.3f} {r['build_s']:>8.2f} {r['embeddings_per_s'] or 0:>8.1f} "
+              f"{r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['p99_ms']:>7.2f}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "embeddings": args.embeddings,
+        "notes": args.notes,
+        "questions": len(questions),
+        "rounds": args.rounds,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: Chroma vs the in-process NumPy backend
+
+Builds both backends over synthetic 384-d vectors (the size of
+all-MiniLM-L6-v2) at several corpus sizes and reports build time, cold
+load time and query latency, then the first size at which Chroma's
+queries become faster than brute force. Runs offline.
+
+Usage:
+    python benchmark_vector_backends.py
+    python benchmark_vector_backends.py --sizes 1000 10000 100000 --queries 300
+"""
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from vector_index import PersistentIndex
+
+DIM = 384
+
+
+class RandomEmbeddings(Embeddings):
+    """Deterministic random unit vectors, so the benchmark measures only the store"""
+
+    def _vector(self, text):
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        vector = rng.standard_normal(DIM).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def run_backend(backend, texts, queries, k):
+    """Build, reopen and query one backend; returns timings in milliseconds"""
+    directory = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    embeddings = RandomEmbeddings()
+    query_vectors = embeddings.embed_documents(queries)
+    settings = {"embedding_model": "random", "dim": DIM}
+    try:
+        start = time.perf_counter()
+        PersistentIndex(embeddings, settings, directory, backend=backend).sync(texts)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Cold start: open the persisted store and answer one query
+        start = time.perf_counter()
+        store, _ = PersistentIndex(embeddings, settings, directory, backend=backend).sync(texts)
+        store.similarity_search_by_vector(query_vectors[0], k=k)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        latencies = []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            store.similarity_search_by_vector(vector, k=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return {
+            "build_ms": build_ms,
+            "load_ms": load_ms,
+            "p50_ms": statistics.median(latencies),
+            "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    queries = [f"question {i}" for i in range(args.queries)]
+    crossover = None
+
+    print(f"{'chunks':>8} {'backend':>8} {'build ms':>10} {'load ms':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for size in args.sizes:
+        texts = [f"chunk {i}" for i in range(size)]
+        results = {}
+        for backend in ("numpy", "chroma"):
+            r = run_backend(backend, texts, queries, args.k)
+            results[backend] = r
+            print(f"{size:>8} {backend:>8} {r['build_ms']:>10.1f} {r['load_ms']:>9.1f} "
+                  f"{r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f}")
+        if crossover is None and results["chroma"]["p50_ms"] < results["numpy"]["p50_ms"]:
+            crossover = size
+
+    if crossover is None:
+        print(f"\n⚡ NumPy backend is faster at every size tested (up to {args.sizes[-1]} chunks)")
+    else:
+        print(f"\n⚡ Chroma queries overtake brute force at about {crossover} chunks")
+
+
+if __name__ == "__main__":
+    main()
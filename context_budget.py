@@ -0,0 +1,159 @@
+"""
+Context assembly: fewer prompt tokens for the same information
+
+Retrieved chunks overlap by up to `chunk_overlap` characters and often
+repeat each other's sentences, and all of that used to be pasted into the
+prompt verbatim. `ContextBudget.assemble` instead
+
+1. trims the text a chunk shares with an earlier chunk (the splitter overlap),
+2. drops lines and sentences that repeat one already kept,
+3. packs what's left into `max_tokens`: whole chunks in retrieval order
+   while they fit, then the spans of the next chunk that share the most
+   words with the question,
+
+and reports how many tokens that saved. Tokens are counted with the
+embedding model's tokenizer when it is in the local Hugging Face cache,
+otherwise with a word/punctuation estimate; nothing is downloaded.
+"""
+
+import re
+
+from lexical_index import tokenize
+
+ESTIMATE_RE = re.compile(r"\w+|[^\w\s]")
+# A sentence ends after a word, not after a list number like "1."
+SENTENCE_END_RE = re.compile(r"(?<=[a-z)][.!?])\s+(?=[A-Z])")
+MIN_OVERLAP = 20   # shorter shared text is coincidence, not splitter overlap
+NEAR_DUPLICATE = 0.8  # word-set similarity above which a span is a repeat
+# Short spans like "- Time: O(n)" repeat legitimately under different headings
+MIN_DEDUPE_WORDS = 6
+
+
+def estimate_tokens(text):
+    """Rough token count: words and punctuation marks"""
+    return len(ESTIMATE_RE.findall(text))
+
+
+def load_token_counter(model_name):
+    """Token counter for `model_name` from the local cache, or the estimate"""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        from tokenizers import Tokenizer
+    except ImportError:
+        return estimate_tokens
+    path = try_to_load_from_cache(model_name, "tokenizer.json")
+    if not isinstance(path, str):
+        return estimate_tokens
+    tokenizer = Tokenizer.from_file(path)
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def trim_overlap(previous, text):
+    """`text` without the prefix it shares with the end of `previous`"""
+    probe = text[:MIN_OVERLAP]
+    if len(probe) < MIN_OVERLAP:
+        return text
+    start = previous.find(probe)
+    while start != -1:
+        shared = len(previous) - start
+        if text.startswith(previous[start:]):
+            return text[shared:].lstrip()
+        start = previous.find(probe, start + 1)
+    return text
+
+
+def split_spans(text):
+    """Lines, with prose lines further cut into sentences"""
+    spans = []
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        if line.lstrip().startswith("#"):
+            spans.append(line)
+        else:
+            spans.extend(s for s in SENTENCE_END_RE.split(line) if s.strip())
+    return spans
+
+
+def _words(span):
+    return frozenset(re.findall(r"\w+", span.lower()))
+
+
+class ContextBudget:
+    """Builds the prompt context from retrieved chunks within a token budget"""
+
+    def __init__(self, max_tokens=1024, count_tokens=estimate_tokens):
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+
+    def _deduplicate(self, docs):
+        """Each chunk's spans, minus overlap and repeats of earlier spans"""
+        kept_texts = []
+        seen = []
+        per_doc = []
+        for doc in docs:
+            text = doc.page_content
+            for previous in kept_texts:
+                # The chunk may follow or precede `previous` in the notes;
+                # reversing both strings turns a shared suffix into a prefix
+                text = trim_overlap(previous, text)
+                text = trim_overlap(previous[::-1], text[::-1])[::-1]
+            kept_texts.append(doc.page_content)
+
+            spans = []
+            for span in split_spans(text):
+                words = _words(span)
+                if len(words) >= MIN_DEDUPE_WORDS:
+                    if any(len(words & other) / len(words | other) >= NEAR_DUPLICATE
+                           for other in seen):
+                        continue
+                    seen.append(words)
+                spans.append(span)
+            per_doc.append(spans)
+        return per_doc
+
+    def assemble(self, question, docs):
+        """
+        Returns a dict with the context `text`, its `tokens`, the
+        `original_tokens` of pasting every chunk verbatim, and `saved_tokens`
+        """
+        original = "\n\n".join(doc.page_content for doc in docs)
+        original_tokens = self.count_tokens(original)
+
+        blocks = []
+        used = 0
+        question_words = set(tokenize(question))
+        for spans in self._deduplicate(docs):
+            if not spans:
+                continue
+            block = "\n".join(spans)
+            cost = self.count_tokens(block)
+            if used + cost <= self.max_tokens:
+                blocks.append(block)
+                used += cost
+                continue
+
+            # Doesn't fit whole: keep its most question-like spans, in order
+            ranked = sorted(
+                range(len(spans)),
+                key=lambda i: -len(question_words & set(tokenize(spans[i]))),
+            )
+            chosen = []
+            for i in ranked:
+                cost = self.count_tokens(spans[i])
+                if used + cost <= self.max_tokens:
+                    chosen.append(i)
+                    used += cost
+            if chosen:
+                blocks.append("\n".join(spans[i] for i in sorted(chosen)))
+            if used >= self.max_tokens:
+                break
+
+        text = "\n\n".join(blocks)
+        tokens = self.count_tokens(text)
+        return {
+            "text": text,
+            "tokens": tokens,
+            "original_tokens": original_tokens,
+            "saved_tokens": max(0, original_tokens - tokens),
+        }
@@ -2,142 +2,719 @@
 Beginner-Friendly DSA Assistant using RAG with Groq API
 """
 
+import asyncio
+import hashlib
 import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+
+from vector_index import ReadWriteLock
+
+# LangChain, Groq, Chroma and torch are imported inside the functions that
+# need them: together they take about a second to import, and the CLI
+# should show its first prompt before that work is done.
 
 # Load environment variables
 load_dotenv()
 
+LLM_MODEL = "llama-3.3-70b-versatile"  # Updated to currently supported model
+
+# Everything that changes the chunk vectors; part of the index fingerprint
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SPLITTER_SETTINGS = {
+    "chunk_size": 1000,
+    "chunk_overlap": 200,
+    "separators": ["\n## ", "\n### ", "\n\n", "\n", " ", ""],
+}
+
+# Each hybrid retrieval leg ranks k * HYBRID_DEPTH candidates before fusion
+HYBRID_DEPTH = 4
+
+
+# Custom prompt template following the user's rules
+PROMPT_TEMPLATE = """You are a beginner-friendly Data Structures and Algorithms (DSA) assistant
+built using a Retrieval-Augmented Generation (RAG) model.
+
+Your job is to help students understand DSA problems using ONLY the
+information provided in the retrieved context.
+
+Rules:
+1. Use ONLY the given context.
+2. Do NOT assume the student knows advanced concepts.
+3. Explain in simple words.
+4. If the answer is not in the context, say:
+   "This information is not available in the provided notes."
+5. Do NOT invent algorithms or shortcuts.
+6. Follow the same language and examples from the context.
+
+Context:
+{context}
+
+User Question:
+{question}
+
+Answer:"""
+
+
+def create_llm(groq_api_key=None, provider=None):
+    """
+    Create the chat model used to write answers
+    
+    `provider` is "groq" or "mock" (a local stand-in for load tests, see
+    llm_providers.py); it defaults to DSA_LLM_PROVIDER, then "groq".
+    """
+    from llm_providers import load_llm
+    
+    provider = provider or os.getenv("DSA_LLM_PROVIDER", "groq")
+    return load_llm(provider, LLM_MODEL, groq_api_key=groq_api_key)
+
+
+def create_embeddings(backend="torch", batch_size=32, threads=None):
+    """
+    Create the embedding model (using free HuggingFace embeddings)
+    
+    `backend` is "torch", "onnx" or "onnx-int8" (see embedding_backends.py);
+    all three give vectors in the same space.
+    """
+    from embedding_backends import load_embeddings
+    
+    return load_embeddings(EMBEDDING_MODEL, backend, batch_size=batch_size, threads=threads)
+
+
+def embedding_namespace(backend="torch"):
+    """Embedding cache namespace: vectors from different backends differ slightly"""
+    return EMBEDDING_MODEL if backend == "torch" else f"{EMBEDDING_MODEL}@{backend}"
+
+
 class DSAAssistant:
-    def __init__(self, notes_file="dsa_notes.txt"):
-        """Initialize the DSA Assistant with RAG capabilities"""
-        self.groq_api_key = os.getenv("GROQ_API_KEY")
+    def __init__(self, notes_file="dsa_notes.txt", persist_directory="./chroma_db",
+                 embeddings=None, llm=None, max_concurrency=8, request_timeout=60, k=3,
+                 answer_cache=None, embedding_cache_dir=None, vector_backend="chroma",
+                 background_init=False, ingest_workers=None, watch_interval=None,
+                 expand_context=False, retrieval="hybrid", context_tokens=1024,
+                 reranker=None, embedding_backend="torch", splitter_settings=None,
+                 llm_provider=None, metrics=None, coalesce=True, precomputed=None,
+                 warmup_questions=None):
+        """
+        Initialize the DSA Assistant with RAG capabilities
         
-        if not self.groq_api_key:
+        `notes_file` may be one path or a list of files, directories and
+        glob patterns (Markdown, text and LaTeX), parsed by
+        `ingest_workers` processes (default: one per CPU).
+        `embeddings` and `llm` can be passed in to reuse models that are
+        already loaded (see shared_resources.py); otherwise they are created.
+        `max_concurrency` and `request_timeout` (seconds) apply to the
+        concurrent APIs (`aask`/`abatch`/`ask_many`); `k` is the number of
+        chunks retrieved per question. `answer_cache` (an AnswerCache) lets
+        repeated questions over the same chunks skip the LLM call.
+        `embedding_cache_dir` adds a memory-mapped on-disk tier to the
+        embedding cache that other worker processes can share.
+        `vector_backend` is "chroma" or "numpy" (in-process brute force,
+        faster for small and medium corpora; see numpy_store.py).
+        With `background_init=True` the models and index are built in a
+        background thread and the first question waits for them.
+        With `watch_interval` (seconds) the notes files are polled and
+        edits are applied with `refresh()` while the assistant is running.
+        With `expand_context=True` every retrieved chunk brings along its
+        neighbours under the same heading and the opening chunk of its
+        parent heading (looked up in the section tree, not searched).
+        `retrieval` is "hybrid" (dense + BM25 rankings fused with reciprocal
+        rank fusion, so exact terms like "O(log n)" are found too) or
+        "dense" (vector search only).
+        `context_tokens` is the prompt context budget: overlapping and
+        repeated text is removed from the retrieved chunks and the rest is
+        packed into this many tokens (None pastes the chunks verbatim).
+        `reranker` (a reranker.Reranker) widens the search to its
+        `candidates` chunks and keeps the k that a cross-encoder scores
+        best, unless that would exceed the reranker's latency budget.
+        `embedding_backend` ("torch", "onnx" or "onnx-int8") picks how the
+        embedding model runs when `embeddings` isn't passed in.
+        `splitter_settings` overrides SPLITTER_SETTINGS (chunk size and
+        overlap), e.g. to compare chunkings in benchmark_retrieval.py.
+        `llm_provider` ("groq" or "mock", default DSA_LLM_PROVIDER or
+        "groq") picks the chat model when `llm` isn't passed in.
+        `metrics` (a metrics.PipelineMetrics, shared or new) records the
+        time spent in each stage of every question, token counts, cache
+        hits and errors.
+        With `coalesce=True` concurrent identical questions (after
+        normalization, same topic) share one retrieval and one LLM call.
+        `precomputed` (a precomputed_answers.PrecomputedAnswers) serves the
+        `warmup_questions` ((question, topic) pairs) without retrieval or
+        an LLM call; they are answered in the background once the index is
+        ready, and again after `refresh()` changes the notes.
+        """
+        if retrieval not in ("hybrid", "dense"):
+            raise ValueError(f"Unknown retrieval {retrieval!r}, expected 'hybrid' or 'dense'")
+        self.notes_file = notes_file
+        self.persist_directory = persist_directory
+        self.k = k
+        self.answer_cache = answer_cache
+        self.embedding_cache_dir = embedding_cache_dir
+        self.vector_backend = vector_backend
+        self.ingest_workers = ingest_workers
+        self.watch_interval = watch_interval
+        self.expand_context = expand_context
+        self.retrieval = retrieval
+        self.context_tokens = context_tokens
+        self.reranker = reranker
+        self.embedding_backend = embedding_backend
+        self.splitter_settings = splitter_settings or SPLITTER_SETTINGS
+        self.embeddings = embeddings
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        # asyncio primitives belong to one event loop, so keep one per loop
+        self._llm_slots = weakref.WeakKeyDictionary()
+        # The BM25 leg of hybrid retrieval runs here, next to the vector search
+        self._lexical_pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="dsa-bm25"
+        )
+        self.llm = llm
+        self.llm_provider = llm_provider or os.getenv("DSA_LLM_PROVIDER", "groq")
+        from metrics import MetricsCallback, PipelineMetrics
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        self._metrics_callback = MetricsCallback(self.metrics)
+        # Queue depth and retries of the shared LLM connection pool
+        from llm_client import shared_counters, shared_gauges
+        self.metrics.add_collector(shared_counters)
+        self.metrics.add_collector(shared_gauges, kind="gauge")
+        from single_flight import SingleFlight
+        self._single_flight = SingleFlight() if coalesce else None
+        if self._single_flight is not None:
+            flights = self._single_flight
+            self.metrics.add_collector(lambda: {"coalesced_requests_total": flights.coalesced},
+                                       key=("single_flight", flights))
+        self.precomputed = precomputed
+        self.warmup_questions = list(warmup_questions or [])
+        if precomputed is not None:
+            self.metrics.add_collector(lambda: {"precomputed_hits_total": precomputed.hits},
+                                       key=("precomputed", precomputed))
+        self._warmup_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._init_error = None
+        # Searches read the index; refresh() takes it exclusively to swap chunks
+        self._index_lock = ReadWriteLock()
+        self._refresh_lock = threading.Lock()
+        self._notes_seen = None
+        self._stop_watching = None
+        
+        # Fail fast on a missing key even when the rest loads in the background
+        if llm is None and self.llm_provider == "groq" and not os.getenv("GROQ_API_KEY"):
             raise ValueError("GROQ_API_KEY not found in environment variables")
         
-        # Initialize Groq LLM
-        self.llm = ChatGroq(
-            groq_api_key=self.groq_api_key,
-            model_name="llama-3.3-70b-versatile",  # Updated to currently supported model
-            temperature=0  # Deterministic responses, no creativity
-        )
+        if background_init:
+            threading.Thread(
+                target=self._initialize_in_background,
+                args=(notes_file,),
+                name="dsa-assistant-init",
+                daemon=True,
+            ).start()
+        else:
+            self._initialize(notes_file)
+    
+    def _initialize(self, notes_file):
+        """Build the heavy parts: LLM client, embeddings, index and chains"""
+        # Initialize the LLM (Groq unless a mock was asked for)
+        if self.llm is None:
+            self.llm = create_llm(provider=self.llm_provider)
+        
+        # Token counter for the context budget (local files only)
+        if self.context_tokens is not None:
+            from context_budget import ContextBudget, load_token_counter
+            self.context_budget = ContextBudget(
+                self.context_tokens, load_token_counter(EMBEDDING_MODEL)
+            )
         
         # Load and process DSA notes
+        self._notes_seen = self._notes_signature()
         self.vectorstore = self._create_vectorstore(notes_file)
         
         # Create the RAG chain
+        self.answer_chain = self._create_answer_chain()
         self.qa_chain = self._create_qa_chain()
-    
-    def _load_documents(self, file_path):
-        """Load DSA notes from file"""
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Notes file not found: {file_path}")
+        self._ready.set()
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        return content
+        if self.precomputed is not None and self.warmup_questions:
+            self.warm_up_in_background()
+        if self.watch_interval:
+            self.watch(self.watch_interval)
+    
+    def _initialize_in_background(self, notes_file):
+        try:
+            self._initialize(notes_file)
+        except Exception as e:
+            # Re-raised by wait_until_ready() on the first question
+            self._init_error = e
+            self._ready.set()
+    
+    def is_ready(self):
+        """True once the index and chains are built (or failed to build)"""
+        return self._ready.is_set()
+    
+    def wait_until_ready(self, timeout=None):
+        """Block until background initialization is done; re-raise its error"""
+        if not self._ready.wait(timeout):
+            raise TimeoutError("DSA Assistant is still loading")
+        if self._init_error is not None:
+            raise self._init_error
     
     def _create_vectorstore(self, notes_file):
         """Create vector store from DSA notes"""
+        from embedding_cache import CachedEmbeddings
+        from ingestion import discover_files, iter_chunks
+        from vector_index import PersistentIndex
+        
         print("📚 Loading DSA notes...")
         
-        # Load the notes
-        notes_content = self._load_documents(notes_file)
+        # Find the notes files up front so a bad path fails before model loading
+        files = discover_files(notes_file)
+        print(f"📂 Found {len(files)} notes file(s)")
+        
+        # Parse and split in worker processes; chunks stream into the index
+        chunks = iter_chunks(files, self.splitter_settings, workers=self.ingest_workers)
+        
+        # Create embeddings unless a shared model was handed to us
+        if self.embeddings is None:
+            print("🔢 Loading embedding model...")
+            self.embeddings = create_embeddings(self.embedding_backend)
         
-        # Split into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n## ", "\n### ", "\n\n", "\n", " ", ""]
+        # Memoize vectors so repeated questions skip the model entirely
+        if not isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                namespace=embedding_namespace(self.embedding_backend),
+                disk_path=self.embedding_cache_dir,
+            )
+        embedding_cache = self.embeddings
+        self.metrics.add_collector(lambda: {
+            "embedding_cache_hits_total": embedding_cache.hits,
+            "embedding_cache_misses_total": embedding_cache.misses,
+        }, key=("embedding_cache", embedding_cache))
+        
+        # Load the persisted index and embed only new or changed chunks
+        index_directory = self.persist_directory
+        if self.vector_backend == "numpy":
+            index_directory = os.path.join(self.persist_directory, "numpy_index")
+        index = PersistentIndex(
+            self.embeddings,
+            settings={"splitter": self.splitter_settings, "embedding_model": EMBEDDING_MODEL},
+            persist_directory=index_directory,
+            backend=self.vector_backend,
+            lexical=self.retrieval == "hybrid",
         )
+        vectorstore, stats = index.sync_chunks(chunks)
+        self.index = index
         
-        texts = text_splitter.split_text(notes_content)
+        print(f"✂️  Split notes into {stats['added'] + stats['kept']} chunks")
+        print(f"🔢 Embedded {stats['added']} new chunks, reused {stats['kept']}, "
+              f"removed {stats['removed']} stale")
+        print("✅ Vector store ready!")
+        return vectorstore
+    
+    def _notes_signature(self):
+        """(path, mtime, size) of every notes file, to notice edits cheaply"""
+        from ingestion import discover_files
         
-        print(f"✂️  Split notes into {len(texts)} chunks")
+        signature = []
+        for path in discover_files(self.notes_file):
+            info = os.stat(path)
+            signature.append((path, info.st_mtime_ns, info.st_size))
+        return tuple(signature)
+    
+    def refresh(self):
+        """
+        Re-read the notes and apply only the sections that changed
         
-        # Create embeddings (using free HuggingFace embeddings)
-        print("🔢 Creating embeddings...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        Sections are diffed by their "# " / "## " / "### " headings: new or edited
+        ones are split and embedded, removed ones are deleted, and the
+        result is swapped into the live index in one step. Questions that
+        already retrieved keep their chunks, and no search sees half an
+        update. Returns the counts from `PersistentIndex.sync_sections`
+        plus `seconds`.
+        """
+        from ingestion import iter_sections
+        
+        self.wait_until_ready()
+        with self._refresh_lock:
+            start = time.perf_counter()
+            # Read before syncing, so edits made during the sync are seen next poll
+            signature = self._notes_signature()
+            stats = self.index.sync_sections(
+                iter_sections(self.notes_file, self.splitter_settings),
+                write_lock=self._index_lock.write,
+            )
+            # Only now: after a failed sync the watcher must try again
+            self._notes_seen = signature
+            stats["seconds"] = time.perf_counter() - start
+        
+        if stats["sections_changed"] or stats["removed"]:
+            print(f"🔄 Notes updated: {stats['sections_changed']} changed sections, "
+                  f"embedded {stats['added']} chunks, removed {stats['removed']} "
+                  f"in {stats['seconds']:.2f}s")
+            if self.precomputed is not None and self.warmup_questions:
+                self.warm_up_in_background()
+        return stats
+    
+    def watch(self, interval=2.0):
+        """Poll the notes files every `interval` seconds and refresh on edits"""
+        if self._stop_watching is not None:
+            return
+        stop = threading.Event()
+        self._stop_watching = stop
+        
+        def poll():
+            while not stop.wait(interval):
+                try:
+                    if self._notes_signature() != self._notes_seen:
+                        self.refresh()
+                except Exception as e:
+                    # e.g. an editor replacing the file; try again next time
+                    print(f"❌ Could not reload notes: {str(e)}")
+        
+        threading.Thread(target=poll, name="dsa-notes-watch", daemon=True).start()
+    
+    def stop_watching(self):
+        """Stop the thread started by `watch()`"""
+        if self._stop_watching is not None:
+            self._stop_watching.set()
+            self._stop_watching = None
+    
+    def _create_answer_chain(self):
+        """Create the prompt -> LLM part of the chain, fed {question, docs}"""
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.runnables import (
+            RunnableGenerator, RunnableLambda, RunnablePassthrough
         )
         
-        # Create vector store
-        vectorstore = Chroma.from_texts(
-            texts=texts,
-            embedding=embeddings,
-            persist_directory="./chroma_db"
+        prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+        
+        def context_text(inputs):
+            # The full RAG chain assembles the context first (to report it);
+            # ask_many feeds {question, docs} straight in
+            context = inputs.get("context") or self._assemble_context(
+                inputs["question"], inputs["docs"]
+            )
+            return context["text"]
+        
+        # Run names are the metrics stages (see metrics.MetricsCallback)
+        llm_chain = (
+            RunnablePassthrough.assign(context=context_text)
+            | prompt.with_config(run_name="prompt")
+            | self.llm
+            | StrOutputParser().with_config(run_name="parse")
         )
         
-        print("✅ Vector store created successfully!")
-        return vectorstore
+        if self.answer_cache is None:
+            return llm_chain
+        
+        namespace = self._answer_namespace()
+        cache = self.answer_cache
+        
+        def answer_from_cache(inputs):
+            cached = cache.get(inputs["question"], inputs["docs"], namespace)
+            if cached is not None:
+                self.metrics.count("answer_cache_hits_total")
+                return cached
+            self.metrics.count("answer_cache_misses_total")
+            
+            # Pass tokens through unchanged and store the full answer at the end
+            def store(chunks):
+                parts = []
+                for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+                cache.put(inputs["question"], inputs["docs"], namespace, "".join(parts))
+            
+            async def astore(chunks):
+                parts = []
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+                cache.put(inputs["question"], inputs["docs"], namespace, "".join(parts))
+            
+            return llm_chain | RunnableGenerator(store, astore)
+        
+        return RunnableLambda(answer_from_cache)
+    
+    def _answer_namespace(self):
+        """Stored answers depend on the prompt and the model as well"""
+        model_name = getattr(self.llm, "model_name", None) or type(self.llm).__name__
+        return hashlib.sha256(
+            f"{model_name}\0{PROMPT_TEMPLATE}".encode("utf-8")
+        ).hexdigest()
+    
+    def _assemble_context(self, question, docs):
+        """
+        Prompt context for the retrieved docs: a dict with `text`, `tokens`,
+        `original_tokens` (all chunks pasted verbatim) and `saved_tokens`
+        """
+        with self.metrics.stage("context"):
+            if self.context_tokens is None:
+                from context_budget import estimate_tokens
+                
+                text = "\n\n".join(doc.page_content for doc in docs)
+                tokens = estimate_tokens(text)
+                return {"text": text, "tokens": tokens, "original_tokens": tokens,
+                        "saved_tokens": 0}
+            return self.context_budget.assemble(question, docs)
     
     def _create_qa_chain(self):
         """Create the RAG QA chain with custom prompt"""
-        
-        # Custom prompt template following the user's rules
-        template = """You are a beginner-friendly Data Structures and Algorithms (DSA) assistant
-built using a Retrieval-Augmented Generation (RAG) model.
-
-Your job is to help students understand DSA problems using ONLY the
-information provided in the retrieved context.
-
-Rules:
-1. Use ONLY the given context.
-2. Do NOT assume the student knows advanced concepts.
-3. Explain in simple words.
-4. If the answer is not in the context, say:
-   "This information is not available in the provided notes."
-5. Do NOT invent algorithms or shortcuts.
-6. Follow the same language and examples from the context.
-
-Context:
-{context}
-
-User Question:
-{question}
-
-Answer:"""
-
-        prompt = ChatPromptTemplate.from_template(template)
+        from langchain_core.runnables import RunnableLambda, RunnableParallel
         
         # Create retriever
         retriever = self.vectorstore.as_retriever(
-            search_kwargs={"k": 3}  # Retrieve top 3 most relevant chunks
+            search_kwargs={"k": self.k}  # Retrieve top k most relevant chunks
         )
         
-        # Create the chain
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
+        def retrieve(inputs, config=None):
+            question, topic = self._unpack(inputs)
+            hybrid = self.retrieval == "hybrid"
+            rerank = self.reranker is not None
+            # Embed before taking the lock so refresh() never waits on the model
+            vector = None
+            if topic or hybrid or rerank:
+                with self.metrics.stage("embed"):
+                    vector = self.embeddings.embed_query(question)
+            
+            # Never search while refresh() is swapping chunks in and out
+            with self.metrics.stage("search"), self._index_lock.read():
+                ids = self._topic_chunk_ids(topic)
+                if hybrid:
+                    docs = self._hybrid_search([question], [vector], ids=ids,
+                                               k=self._candidate_k())[0]
+                elif ids or rerank:
+                    docs = self._search_by_vectors([vector], ids=ids, k=self._candidate_k())[0]
+                else:
+                    docs = retriever.invoke(question, config)
+            
+            # The cross-encoder runs outside the lock: the docs are copies
+            if rerank:
+                with self.metrics.stage("rerank"):
+                    docs = self._rerank(question, docs)
+            if self.expand_context:
+                with self.metrics.stage("expand"), self._index_lock.read():
+                    docs = self._expand(docs)
+            return docs
         
-        rag_chain = (
-            {"context": retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | self.llm
-            | StrOutputParser()
+        self._retrieve = retrieve
+        
+        # Retrieve once and keep the documents next to the answer, so the
+        # sources we show are exactly the context the model saw
+        rag_chain = RunnableParallel(
+            docs=RunnableLambda(retrieve),
+            question=RunnableLambda(lambda inputs: self._unpack(inputs)[0]),
+        ).assign(
+            context=lambda x: self._assemble_context(x["question"], x["docs"])
+        ).assign(answer=self.answer_chain).with_config(
+            run_name="total", callbacks=[self._metrics_callback]
         )
         
         return rag_chain, retriever
     
-    def ask(self, question):
-        """Ask a question and get an answer"""
+    def retrieve(self, question, topic=None):
+        """The documents a question would be answered from, without the LLM call"""
+        self.wait_until_ready()
+        return self._retrieve(self._chain_input(question, topic))
+    
+    @staticmethod
+    def _unpack(inputs):
+        """Chain input is a question, or {"question": ..., "topic": ...}"""
+        if isinstance(inputs, dict):
+            return inputs["question"], inputs.get("topic")
+        return inputs, None
+    
+    @staticmethod
+    def _flight_key(question, topic):
+        """Questions with the same key get the same answer"""
+        from answer_cache import normalize_question
+        
+        topics = (topic,) if isinstance(topic, str) else tuple(topic or ())
+        return (normalize_question(question), topics)
+    
+    @staticmethod
+    def _chain_input(question, topic):
+        return question if topic is None else {"question": question, "topic": topic}
+    
+    def topics(self):
+        """Topic ("## " section) names of the indexed notes"""
+        self.wait_until_ready()
+        return self.index.tree.topics()
+    
+    def _topic_chunk_ids(self, topic):
+        """Chunk IDs to search for a topic label (or labels); None means all"""
+        if not topic:
+            return None
+        tree = self.index.tree
+        return tree.topic_chunks(tree.resolve(topic)) or None
+    
+    def _documents_by_id(self, ids):
+        """Fetch chunks by ID (a direct lookup, not a vector query)"""
+        from langchain_core.documents import Document
+        
+        if not ids:
+            return {}
+        found = self.vectorstore.get(ids=list(ids), include=["documents", "metadatas"])
+        return {
+            cid: Document(page_content=text, metadata=metadata or {})
+            for cid, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+    
+    def _candidate_k(self):
+        """How many chunks to retrieve: k, or the reranker's candidate set"""
+        if self.reranker is None:
+            return self.k
+        return max(self.k, self.reranker.candidates)
+    
+    def _rerank(self, question, docs):
+        """The k best of the retrieved docs by cross-encoder score"""
+        if self.reranker is None:
+            return docs
+        return self.reranker.rerank(question, docs, self.k)
+    
+    def _expand(self, docs):
+        """Add parent and sibling chunks of the hits, fetched by ID"""
+        hits = [doc.metadata["chunk_id"] for doc in docs if doc.metadata.get("chunk_id")]
+        extra = self.index.tree.related(hits)
+        by_id = self._documents_by_id(extra)
+        return list(docs) + [by_id[cid] for cid in extra if cid in by_id]
+    
+    def _hybrid_search(self, questions, vectors, ids=None, k=None):
+        """
+        Dense and BM25 candidates for each question, fused with reciprocal
+        rank fusion and cut to k. Call with the index lock held.
+        """
+        from lexical_index import rrf_fuse
+        
+        k = k or self.k
+        depth = k * HYBRID_DEPTH
+        lexical = self.index.lexical
+        
+        def lexical_leg():
+            return [[cid for cid, _ in lexical.search(q, depth, ids=ids)] for q in questions]
+        
+        # Both legs at once: BM25 on a worker thread, vectors on this one
+        lexical_hits = self._lexical_pool.submit(lexical_leg)
+        dense_docs = self._search_by_vectors(vectors, ids=ids, k=depth)
+        lexical_hits = lexical_hits.result()
+        
+        fused, known = [], {}
+        for docs, hits in zip(dense_docs, lexical_hits):
+            dense_ids = []
+            for doc in docs:
+                known[doc.metadata["chunk_id"]] = doc
+                dense_ids.append(doc.metadata["chunk_id"])
+            fused.append(rrf_fuse([dense_ids, hits], k=k))
+        
+        # Chunks only BM25 found still need their text
+        missing = {cid for ranked in fused for cid in ranked} - set(known)
+        known.update(self._documents_by_id(missing))
+        return [[known[cid] for cid in ranked if cid in known] for ranked in fused]
+    
+    def warm_up(self, questions=None):
+        """
+        Precompute answers for (question, topic) pairs, default
+        `warmup_questions`, one at a time
+        
+        A question whose stored answer is still valid and was written from
+        the chunks it retrieves now is kept; the others are answered and
+        stored. Returns counts of `answered`, `kept` and `failed`.
+        """
+        from precomputed_answers import question_key
+        
+        self.wait_until_ready()
+        questions = self.warmup_questions if questions is None else list(questions)
+        namespace = self._answer_namespace()
+        rag_chain, _ = self.qa_chain
+        stats = {"answered": 0, "kept": 0, "failed": 0}
+        with self._warmup_lock:
+            for question, topic in questions:
+                key = question_key(question, topic)
+                chain_input = self._chain_input(question, topic)
+                try:
+                    entry = self.precomputed.entry(key)
+                    if entry is not None and self.precomputed.is_valid(
+                        entry, namespace, self.index.chunks
+                    ):
+                        docs = self._retrieve(chain_input)
+                        if [doc.metadata.get("chunk_id") for doc in docs] == entry["chunk_ids"]:
+                            stats["kept"] += 1
+                            continue
+                    if self._single_flight is None:
+                        result = rag_chain.invoke(chain_input)
+                    else:
+                        # A user asking the same question meanwhile shares this run
+                        result = self._single_flight.call(
+                            ("invoke",) + self._flight_key(question, topic),
+                            lambda: rag_chain.invoke(chain_input),
+                        )
+                    self.precomputed.put(key, result["answer"], result["docs"], namespace,
+                                         result["context"])
+                    stats["answered"] += 1
+                except Exception as e:
+                    # Keep going: one failed call shouldn't leave the rest cold
+                    print(f"⚠️  Warm-up failed for {question!r}: {e}")
+                    stats["failed"] += 1
+        print(f"🔥 Precomputed answers: {stats['answered']} answered, "
+              f"{stats['kept']} still valid, {stats['failed']} failed")
+        return stats
+    
+    def warm_up_in_background(self):
+        """Run `warm_up()` on a daemon thread"""
+        thread = threading.Thread(target=self.warm_up, name="dsa-warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    def _precomputed_answer(self, question, topic):
+        """The valid precomputed entry for a question, or None"""
+        if self.precomputed is None:
+            return None
+        from precomputed_answers import question_key
+        
+        return self.precomputed.get(
+            question_key(question, topic), self._answer_namespace(), self.index.chunks
+        )
+    
+    def ask(self, question, topic=None):
+        """
+        Ask a question and get an answer
+        
+        `topic` (a heading like "Stacks" or "Binary Search", or a list of
+        them) restricts the search to the matching "## " sections.
+        """
         print(f"\n❓ Question: {question}\n")
         print("🔍 Searching through DSA notes...")
+        self.wait_until_ready()
         
-        # Get answer from RAG chain
-        rag_chain, retriever = self.qa_chain
-        answer = rag_chain.invoke(question)
-        source_docs = retriever.invoke(question)  # Updated method
+        # Get answer and its context from a single retrieval
+        rag_chain, _ = self.qa_chain
+        chain_input = self._chain_input(question, topic)
+        entry = self._precomputed_answer(question, topic)
+        if entry is not None:
+            result = {
+                "answer": entry["answer"],
+                "docs": self.precomputed.documents(entry),
+                "context": {"tokens": entry["context_tokens"],
+                            "saved_tokens": entry["saved_tokens"],
+                            "original_tokens": None},
+            }
+        elif self._single_flight is None:
+            result = rag_chain.invoke(chain_input)
+        else:
+            result = self._single_flight.call(
+                ("invoke",) + self._flight_key(question, topic),
+                lambda: rag_chain.invoke(chain_input),
+            )
+        answer, source_docs = result["answer"], result["docs"]
+        context = result["context"]
         
         print(f"\n💡 Answer:\n{answer}\n")
+        if context["original_tokens"] is not None:
+            print(f"✂️  Context: {context['tokens']} tokens "
+                  f"(saved {context['saved_tokens']} of {context['original_tokens']})")
         
         # Show which parts of notes were used
         if source_docs:
@@ -145,6 +722,197 @@ Answer:"""
         
         return answer, source_docs
     
+    def ask_stream(self, question, topic=None):
+        """
+        Stream an answer token by token
+        
+        Yields each answer token as a `str`, then one final dict with
+        `sources` (the documents used as context), `time_to_first_token`
+        and `total_time` in seconds, and `context_tokens` / `saved_tokens`
+        from the context budget. `topic` works as in `ask`. `precomputed`
+        is True when the answer came from the precomputed store, whole.
+        """
+        self.wait_until_ready()
+        rag_chain, _ = self.qa_chain
+        start = time.perf_counter()
+        first_token_at = None
+        source_docs = []
+        context = {}
+        
+        entry = self._precomputed_answer(question, topic)
+        if entry is not None:
+            # Served whole: there is nothing to wait for between tokens
+            yield entry["answer"]
+            end = time.perf_counter()
+            yield {
+                "sources": self.precomputed.documents(entry),
+                "time_to_first_token": end - start,
+                "total_time": end - start,
+                "context_tokens": entry["context_tokens"],
+                "saved_tokens": entry["saved_tokens"],
+                "precomputed": True,
+            }
+            return
+        
+        chain_input = self._chain_input(question, topic)
+        if self._single_flight is None:
+            chunks = rag_chain.stream(chain_input)
+        else:
+            # Identical streams in flight share one chain run and replay its chunks
+            chunks = self._single_flight.stream(
+                ("stream",) + self._flight_key(question, topic),
+                lambda: rag_chain.stream(chain_input),
+            )
+        
+        for chunk in chunks:
+            if "docs" in chunk:
+                source_docs = chunk["docs"]
+            if "context" in chunk:
+                context = chunk["context"]
+            token = chunk.get("answer")
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield str(token)
+        
+        end = time.perf_counter()
+        yield {
+            "sources": source_docs,
+            "time_to_first_token": (first_token_at or end) - start,
+            "total_time": end - start,
+            "context_tokens": context.get("tokens"),
+            "saved_tokens": context.get("saved_tokens"),
+            "precomputed": False,
+        }
+    
+    def _search_by_vectors(self, vectors, ids=None, k=None):
+        """
+        Top-k documents for many query vectors in one vector store call,
+        optionally among the chunk `ids` only. Call with the index lock held.
+        """
+        from langchain_core.documents import Document
+        
+        k = k or self.k
+        if hasattr(self.vectorstore, "search_many"):
+            return self.vectorstore.search_many(vectors, k=k, ids=ids)
+        
+        query = {"ids": ids} if ids is not None else {}
+        result = self.vectorstore._collection.query(
+            query_embeddings=vectors,
+            n_results=min(k, len(ids) if ids is not None else len(self.index.chunks)) or 1,
+            include=["documents", "metadatas"],
+            **query,
+        )
+        return [
+            [Document(page_content=text, metadata=metadata or {})
+             for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(result["documents"], result["metadatas"])
+        ]
+    
+    def ask_many(self, questions):
+        """
+        Answer a list of questions with batched retrieval
+        
+        All questions are embedded in one model call and searched in one
+        vector store query, then the LLM calls run concurrently (up to
+        `max_concurrency`). Returns one item per question, in input order:
+        (answer, source_docs), or the exception raised for that question.
+        """
+        questions = list(questions)
+        if not questions:
+            return []
+        self.wait_until_ready()
+        
+        # MiniLM embeds queries and documents the same way, so the batched
+        # document call gives the same vectors as embed_query one at a time
+        with self.metrics.stage("embed"):
+            vectors = self.embeddings.embed_documents(questions)
+        with self.metrics.stage("search"), self._index_lock.read():
+            if self.retrieval == "hybrid":
+                docs_per_question = self._hybrid_search(questions, vectors, k=self._candidate_k())
+            else:
+                docs_per_question = self._search_by_vectors(vectors, k=self._candidate_k())
+        if self.reranker is not None:
+            with self.metrics.stage("rerank"):
+                docs_per_question = [
+                    self._rerank(question, docs)
+                    for question, docs in zip(questions, docs_per_question)
+                ]
+        # Same context as a single ask(): neighbours and parents, fetched by ID
+        if self.expand_context:
+            with self.metrics.stage("expand"), self._index_lock.read():
+                docs_per_question = [self._expand(docs) for docs in docs_per_question]
+        
+        inputs = [
+            {"question": question, "docs": docs}
+            for question, docs in zip(questions, docs_per_question)
+        ]
+        answers = self.answer_chain.batch(
+            inputs,
+            config={"max_concurrency": self.max_concurrency,
+                    "callbacks": [self._metrics_callback]},
+            return_exceptions=True,
+        )
+        
+        return [
+            answer if isinstance(answer, Exception) else (answer, item["docs"])
+            for answer, item in zip(answers, inputs)
+        ]
+    
+    def _llm_slot(self):
+        """Semaphore bounding in-flight LLM calls on the running event loop"""
+        loop = asyncio.get_running_loop()
+        slot = self._llm_slots.get(loop)
+        if slot is None:
+            slot = asyncio.Semaphore(self.max_concurrency)
+            self._llm_slots[loop] = slot
+        return slot
+    
+    async def aask(self, question, timeout=None, topic=None):
+        """
+        Async version of `ask` that returns (answer, source_docs) quietly
+        
+        At most `max_concurrency` questions are in the chain at once (each
+        run makes exactly one LLM call); the rest wait for a free slot. The
+        timeout covers the chain run, not the time spent waiting for a slot.
+        """
+        timeout = self.request_timeout if timeout is None else timeout
+        if not self.is_ready():
+            # Don't block the event loop while the index is still loading
+            await asyncio.get_running_loop().run_in_executor(None, self._ready.wait)
+        self.wait_until_ready()
+        entry = self._precomputed_answer(question, topic)
+        if entry is not None:
+            return entry["answer"], self.precomputed.documents(entry)
+        rag_chain, _ = self.qa_chain
+        
+        async def run():
+            async with self._llm_slot():
+                try:
+                    return await asyncio.wait_for(
+                        rag_chain.ainvoke(self._chain_input(question, topic)), timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"No answer within {timeout}s for: {question!r}")
+        
+        if self._single_flight is None:
+            result = await run()
+        else:
+            result = await self._single_flight.acall(self._flight_key(question, topic), run)
+        return result["answer"], result["docs"]
+    
+    async def abatch(self, questions, timeout=None):
+        """
+        Answer many questions concurrently, in input order
+        
+        Each item is (answer, source_docs) or the exception that question
+        raised, so one failure doesn't sink the batch.
+        """
+        return await asyncio.gather(
+            *(self.aask(question, timeout=timeout) for question in questions),
+            return_exceptions=True,
+        )
+    
     def interactive_mode(self):
         """Run in interactive mode"""
         print("\n" + "="*60)
@@ -166,7 +934,21 @@ Answer:"""
                     print("Please enter a question.\n")
                     continue
                 
-                self.ask(question)
+                if not self.is_ready():
+                    print("\n⏳ Still loading the DSA notes, your answer will follow...")
+                print("\n💡 Answer:")
+                for chunk in self.ask_stream(question):
+                    if isinstance(chunk, str):
+                        print(chunk, end="", flush=True)
+                    else:
+                        result = chunk
+                print("\n")
+                if result["sources"]:
+                    print(f"📖 Retrieved {len(result['sources'])} relevant sections from notes")
+                print(f"⚡ First token in {result['time_to_first_token']:.2f}s, "
+                      f"full answer in {result['total_time']:.2f}s, "
+                      f"{result['context_tokens']} context tokens "
+                      f"({result['saved_tokens']} saved)")
                 print("\n" + "-"*60 + "\n")
                 
             except KeyboardInterrupt:
@@ -179,8 +961,8 @@ Answer:"""
 def main():
     """Main function to run the DSA assistant"""
     try:
-        # Initialize the assistant
-        assistant = DSAAssistant()
+        # Initialize the assistant; notes load while the first question is typed
+        assistant = DSAAssistant(background_init=True)
         
         # Run in interactive mode
         assistant.interactive_mode()
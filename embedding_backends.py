@@ -0,0 +1,137 @@
+"""
+Embedding backends for all-MiniLM-L6-v2
+
+- "torch": sentence-transformers on PyTorch (the original setup)
+- "onnx": the model's ONNX export run with ONNX Runtime
+- "onnx-int8": the int8-quantized ONNX export, smaller and faster on CPU
+
+The ONNX paths skip PyTorch entirely: the graph and `tokenizer.json`
+come from the same Hugging Face repo and the sentence-transformers
+pooling (mean over tokens, then L2 normalization) is done in NumPy, so
+the vectors live in the same space as the torch ones and an existing
+index keeps working. `benchmark_embedding_backends.py` checks recall@k
+against torch and measures load time and embeddings per second.
+"""
+
+import os
+import platform
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's sentence-transformers limit
+
+
+def _int8_file():
+    """The pre-quantized export that suits this CPU"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+
+def onnx_file(backend):
+    """Path of the ONNX graph for a backend inside the model repo"""
+    return _int8_file() if backend == "onnx-int8" else "onnx/model.onnx"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence-transformers mean-pooled embeddings on ONNX Runtime"""
+
+    def __init__(self, model_name, file_name="onnx/model.onnx", batch_size=32,
+                 threads=None, max_length=MAX_SEQ_LENGTH, session=None, tokenizer=None):
+        """
+        `threads` caps ONNX Runtime's intra-op threads (default: all
+        cores). `session` and `tokenizer` can be passed in instead of
+        being loaded from the Hugging Face cache.
+        """
+        self.model_name = model_name
+        self.file_name = file_name
+        self.batch_size = batch_size
+        self.threads = threads
+        self.tokenizer = tokenizer or self._load_tokenizer()
+        self.tokenizer.enable_truncation(max_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+        self.session = session or self._load_session()
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _load_tokenizer(self):
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        return Tokenizer.from_file(hf_hub_download(self.model_name, "tokenizer.json"))
+
+    def _load_session(self):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.threads or 0
+        options.inter_op_num_threads = 1
+        return ort.InferenceSession(
+            hf_hub_download(self.model_name, self.file_name),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feed = {name: value for name, value in feed.items() if name in self._input_names}
+        tokens = self.session.run(None, feed)[0]
+
+        # Mean pooling over real tokens, then unit length
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (tokens * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def load_embeddings(model_name, backend="torch", batch_size=32, threads=None):
+    """Embeddings for `model_name` on one of EMBEDDING_BACKENDS"""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}"
+        )
+    if backend == "torch":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        if threads:
+            # Process-wide: torch has a single intra-op thread pool
+            import torch
+            torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(
+            model_name=model_name, encode_kwargs={"batch_size": batch_size}
+        )
+    return OnnxEmbeddings(
+        model_name, onnx_file(backend), batch_size=batch_size, threads=threads
+    )
+
+
+def backend_from_env():
+    """Backend options from DSA_EMBEDDING_BACKEND/_BATCH_SIZE/_THREADS, if set"""
+    options = {}
+    if os.getenv("DSA_EMBEDDING_BACKEND"):
+        options["backend"] = os.environ["DSA_EMBEDDING_BACKEND"]
+    if os.getenv("DSA_EMBEDDING_BATCH_SIZE"):
+        options["batch_size"] = int(os.environ["DSA_EMBEDDING_BATCH_SIZE"])
+    if os.getenv("DSA_EMBEDDING_THREADS"):
+        options["threads"] = int(os.environ["DSA_EMBEDDING_THREADS"])
+    return options
@@ -0,0 +1,206 @@
+"""
+Caching wrapper around an embeddings model
+
+Vectors are memoized by a hash of (namespace, kind, text), where the
+namespace is the embedding model name, so repeated questions skip the
+transformer forward pass. The in-memory tier is a bounded LRU. The
+optional disk tier is a fixed-size, memory-mapped table that several
+worker processes can open at once: each key hashes to one slot, a newer
+vector simply overwrites an older one, and readers re-check the slot key
+after copying so they never return a half-written vector. The files are
+created by whichever process first takes an O_EXCL lock file; the rest
+wait for them and map the same files.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+KEY_BYTES = 16
+
+
+def _digest(namespace, kind, text):
+    payload = f"{namespace}\0{kind}\0{text}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=KEY_BYTES).digest()
+
+
+class MmapVectorStore:
+    """Direct-mapped vector table in two .npy files, shared between processes"""
+
+    def __init__(self, path, slots=65536, create_timeout=10.0):
+        self.path = path
+        self.slots = slots
+        self.create_timeout = create_timeout
+        self._keys = None
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    def _published(self):
+        # keys.npy is published last, so once it exists both files are complete
+        return os.path.exists(os.path.join(self.path, "keys.npy"))
+
+    def _open(self, dim=None):
+        """Map the files, creating them once the vector size is known"""
+        if self._keys is not None:
+            return True
+        if self._published():
+            self._keys = np.load(os.path.join(self.path, "keys.npy"), mmap_mode="r+")
+            self._vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r+")
+            self.slots = self._keys.shape[0]
+            return True
+        if dim is None:
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        # Only the process that creates the lock file writes the table; the
+        # others map whatever it publishes, so nobody replaces a file in use
+        lock_path = os.path.join(self.path, "create.lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return self._wait_for_creator(lock_path)
+        try:
+            if not self._published():
+                self._create(dim)
+        finally:
+            os.close(fd)
+            os.remove(lock_path)
+        return self._open()
+
+    def _wait_for_creator(self, lock_path):
+        deadline = time.monotonic() + self.create_timeout
+        while not self._published() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        if self._published():
+            return self._open()
+        # The creator died holding the lock: clear it so a later put retries
+        try:
+            if time.time() - os.path.getmtime(lock_path) > self.create_timeout:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        return False
+
+    def _create(self, dim):
+        keys_path = os.path.join(self.path, "keys.npy")
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        # Write under temporary names so other processes never map a partial file
+        tmp_suffix = f".{os.getpid()}.tmp.npy"
+        keys = np.lib.format.open_memmap(
+            keys_path + tmp_suffix, mode="w+", dtype=np.uint8, shape=(self.slots, KEY_BYTES)
+        )
+        vectors = np.lib.format.open_memmap(
+            vectors_path + tmp_suffix, mode="w+", dtype=np.float32, shape=(self.slots, dim)
+        )
+        keys.flush()
+        vectors.flush()
+        del keys, vectors
+        os.replace(vectors_path + tmp_suffix, vectors_path)
+        os.replace(keys_path + tmp_suffix, keys_path)
+
+    def _slot(self, key):
+        return int.from_bytes(key[:8], "little") % self.slots
+
+    def get(self, key):
+        with self._lock:
+            if not self._open():
+                return None
+            slot = self._slot(key)
+            wanted = np.frombuffer(key, dtype=np.uint8)
+            if not np.array_equal(self._keys[slot], wanted):
+                return None
+            vector = np.array(self._vectors[slot])
+            # Another process may have overwritten the slot while we copied
+            if not np.array_equal(self._keys[slot], wanted):
+                return None
+            return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            if not self._open(dim=len(vector)) or self._vectors.shape[1] != len(vector):
+                return
+            slot = self._slot(key)
+            # Invalidate, write the vector, then publish the key
+            self._keys[slot] = 0
+            self._vectors[slot] = vector
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes query and document vectors"""
+
+    def __init__(self, embeddings, namespace, max_entries=4096, disk_path=None,
+                 disk_slots=65536):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.disk = MmapVectorStore(disk_path, disk_slots) if disk_path else None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                with self._lock:
+                    self.hits += 1
+                return vector
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, key, values):
+        vector = np.asarray(values, dtype=np.float32)
+        self._remember(key, vector)
+        if self.disk is not None:
+            self.disk.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts):
+        keys = [_digest(self.namespace, "doc", text) for text in texts]
+        vectors = [self._lookup(key) for key in keys]
+
+        # Embed every miss in one batched model call
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, values in zip(missing, fresh):
+                vectors[i] = self._store(keys[i], values)
+
+        return [vector.tolist() for vector in vectors]
+
+    def embed_query(self, text):
+        key = _digest(self.namespace, "query", text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self._store(key, self.embeddings.embed_query(text))
+        return vector.tolist()
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+            }
@@ -2,8 +2,22 @@
 Example usage of the DSA Assistant
 """
 
+import sys
+import time
+
 from dsa_assistant import DSAAssistant
 
+# Example questions
+questions = [
+    "What is an array and how does it work?",
+    "How do I reverse a linked list?",
+    "What is the difference between a stack and a queue?",
+    "Explain binary search in simple terms",
+    "What is Big O notation?",
+    "How does bubble sort work?",
+    "What is recursion?",
+]
+
 def run_examples():
     """Run example questions"""
     
@@ -11,17 +25,6 @@ def run_examples():
     print("Initializing DSA Assistant...")
     assistant = DSAAssistant()
     
-    # Example questions
-    questions = [
-        "What is an array and how does it work?",
-        "How do I reverse a linked list?",
-        "What is the difference between a stack and a queue?",
-        "Explain binary search in simple terms",
-        "What is Big O notation?",
-        "How does bubble sort work?",
-        "What is recursion?",
-    ]
-    
     print("\n" + "="*70)
     print("Running Example Questions")
     print("="*70)
@@ -37,5 +40,30 @@ def run_examples():
             input("\nPress Enter to continue to next question...")
 
 
+def run_batch_examples():
+    """Answer all example questions at once with ask_many"""
+    
+    print("Initializing DSA Assistant...")
+    assistant = DSAAssistant()
+    
+    start = time.perf_counter()
+    results = assistant.ask_many(questions)
+    elapsed = time.perf_counter() - start
+    
+    for question, result in zip(questions, results):
+        print(f"\n{'='*70}\n❓ {question}\n{'='*70}")
+        if isinstance(result, Exception):
+            print(f"❌ Error: {result}")
+        else:
+            answer, _ = result
+            print(answer)
+    
+    print(f"\n⚡ Answered {len(questions)} questions in {elapsed:.2f}s "
+          f"({len(questions) / elapsed:.2f} questions/s)")
+
+
 if __name__ == "__main__":
-    run_examples()
+    if "--batch" in sys.argv:
+        run_batch_examples()
+    else:
+        run_examples()
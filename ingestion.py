@@ -0,0 +1,383 @@
+"""
+Multi-file, multi-format ingestion of DSA notes
+
+Takes files, directories and glob patterns, parses Markdown, plain text
+and LaTeX into one Markdown-like form (so the "## " / "### " separators
+work everywhere), splits each file section by section (a section starts
+at a "# ", "## " or "### " heading) and tags every chunk with its source
+file, heading path, topic (the enclosing "## " heading) and section ID. Files are parsed and split in a process pool and
+the chunks are yielded as each file finishes, so the caller can embed
+one batch while the workers are still parsing the next files.
+
+Markdown and text files larger than STREAM_THRESHOLD_BYTES are not read
+whole: `stream_split` reads them a block at a time, cuts the buffer at
+the last "\n## " (or next best separator) and splits only what is
+before the cut, so memory stays at a few blocks whatever the file size.
+"""
+
+import bisect
+import functools
+import glob
+import hashlib
+import itertools
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+MARKDOWN_EXTENSIONS = (".md", ".markdown", ".txt")
+LATEX_EXTENSIONS = (".tex",)
+SUPPORTED_EXTENSIONS = MARKDOWN_EXTENSIONS + LATEX_EXTENSIONS
+
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$", re.MULTILINE)
+
+# LaTeX sectioning commands and the Markdown heading level they map to
+LATEX_HEADINGS = {
+    "chapter": "#",
+    "section": "##",
+    "subsection": "###",
+    "subsubsection": "####",
+}
+LATEX_INLINE = ("textbf", "textit", "emph", "texttt", "underline", "text")
+LATEX_CODE_RE = re.compile(
+    r"\\begin\{(lstlisting|verbatim|minted)\}(?:\[[^\]]*\])?(?:\{[^{}]*\})?(.*?)\\end\{\1\}",
+    re.DOTALL,
+)
+FENCE_RE = re.compile(r"^```.*?^```", re.MULTILINE | re.DOTALL)
+FENCE_MARK_RE = re.compile(r"^```", re.MULTILINE)
+SECTION_LEVEL = 3  # "# ", "## " and "### " headings start a new section
+TOPIC_LEVEL = 2  # the "## " heading names a chunk's topic
+
+STREAM_BLOCK_CHARS = 1 << 20
+STREAM_THRESHOLD_BYTES = 32 << 20
+
+
+def discover_files(sources):
+    """
+    Expand files, directories and globs into a de-duplicated file list
+
+    Directories are searched recursively for supported extensions. A plain
+    path that doesn't exist raises FileNotFoundError.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+
+    found = []
+    seen = set()
+
+    def add(path):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            found.append(os.path.normpath(path))
+
+    for source in sources:
+        if glob.has_magic(source):
+            for path in sorted(glob.glob(source, recursive=True)):
+                if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS):
+                    add(path)
+        elif os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        add(os.path.join(root, name))
+        elif os.path.isfile(source):
+            add(source)
+        else:
+            raise FileNotFoundError(f"Notes file not found: {source}")
+
+    return found
+
+
+def _strip_inline_commands(text):
+    """\\textbf{x} -> x, repeated so nested commands unwrap too"""
+    pattern = re.compile(r"\\(?:%s)\{([^{}]*)\}" % "|".join(LATEX_INLINE))
+    previous = None
+    while previous != text:
+        previous = text
+        text = pattern.sub(r"\1", text)
+    return text
+
+
+def latex_to_markdown(source):
+    """Turn a LaTeX document into Markdown-ish text with ## / ### headings"""
+    body = source
+    if "\\begin{document}" in body:
+        body = body.split("\\begin{document}", 1)[1]
+    body = body.split("\\end{document}", 1)[0]
+
+    # Code listings become fenced blocks and are kept verbatim
+    code_blocks = []
+
+    def stash_code(match):
+        code_blocks.append("```\n" + match.group(2).strip("\n") + "\n```")
+        return f"\n@@CODE{len(code_blocks) - 1}@@\n"
+
+    body = LATEX_CODE_RE.sub(stash_code, body)
+
+    # Comments (but not escaped \%)
+    body = re.sub(r"(?<!\\)%.*", "", body)
+
+    for command, hashes in LATEX_HEADINGS.items():
+        body = re.sub(
+            r"\\%s\*?\{([^{}]*)\}" % command,
+            lambda m, h=hashes: f"\n{h} {m.group(1).strip()}\n",
+            body,
+        )
+
+    body = re.sub(r"\\item(?:\[[^\]]*\])?\s*", "- ", body)
+    body = _strip_inline_commands(body)
+    body = re.sub(r"\\(?:begin|end)\{[^{}]*\}(?:\[[^\]]*\])?(?:\{[^{}]*\})*", "", body)
+    body = re.sub(r"\\\\(?:\[[^\]]*\])?", "\n", body)
+    body = body.replace("\\&", "&").replace("\\%", "%").replace("\\_", "_")
+    # Remaining layout commands (\newpage, \vspace{1cm}, \includegraphics[..]{..})
+    body = re.sub(r"\\[a-zA-Z]+\*?(?:\[[^\]]*\])?(?:\{[^{}]*\})*", "", body)
+    body = body.replace("{", "").replace("}", "")
+    body = re.sub(r"[ \t]+\n", "\n", body)
+    body = re.sub(r"\n{3,}", "\n\n", body)
+    for i, block in enumerate(code_blocks):
+        body = body.replace(f"@@CODE{i}@@", block)
+    return body.strip() + "\n"
+
+
+def parse_file(path):
+    """Read one notes file and return its text in the common Markdown form"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if path.lower().endswith(LATEX_EXTENSIONS):
+        return latex_to_markdown(content)
+    return content
+
+
+def _enter_heading(path, level, title):
+    """Update the open-heading stack {level: title} for a new heading"""
+    path[level] = title
+    # A new heading closes every deeper one
+    for deeper in [lvl for lvl in path if lvl > level]:
+        del path[deeper]
+
+
+def _make_splitter(splitter_settings):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(add_start_index=True, **splitter_settings)
+
+
+def _headings(text):
+    """(position, level, title) for every heading outside a code fence"""
+    # "# comment" lines inside code fences are not headings
+    fences = [(m.start(), m.end()) for m in FENCE_RE.finditer(text)]
+    return [
+        (m.start(), len(m.group(1)), m.group(2).strip())
+        for m in HEADING_RE.finditer(text)
+        if not any(start <= m.start() < end for start, end in fences)
+    ]
+
+
+def heading_titles(text):
+    """Titles of the headings that appear in a piece of text"""
+    return [title for _, _, title in _headings(text)]
+
+
+def split_sections(text):
+    """
+    Cut text in front of every "# " / "## " / "### " heading
+
+    Sections are the unit of change detection: each one is split on its
+    own, so editing one section never changes another section's chunks.
+    """
+    cuts = [pos for pos, level, _ in _headings(text) if level <= SECTION_LEVEL and pos > 0]
+    bounds = [0] + cuts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+def _section_id(source, path, section):
+    """Stable ID for a section's text, file and inherited heading path"""
+    inherited = " > ".join(path[level] for level in sorted(path))
+    payload = f"{source}\0{inherited}\0{section.strip()}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _advance(path, section):
+    """Move the heading stack past a section without splitting it"""
+    for _, level, title in _headings(section):
+        _enter_heading(path, level, title)
+
+
+def _split_section(section, source, splitter, path):
+    """
+    List the (chunk, metadata) pairs of one section
+
+    `path` is the open-heading stack and is updated in place, so the next
+    section (or the next streamed segment) keeps the right heading path.
+    """
+    section_id = _section_id(source, path, section)
+    headings = _headings(section)
+
+    chunks = []
+    next_heading = 0
+    for doc in splitter.create_documents([section]):
+        content = doc.page_content
+        # Position of the first real character, so a chunk that opens with
+        # a heading is filed under that heading
+        anchor = doc.metadata["start_index"] + (len(content) - len(content.lstrip()))
+        # Chunks come in document order, so walk the headings only once
+        while next_heading < len(headings) and headings[next_heading][0] <= anchor:
+            _, level, title = headings[next_heading]
+            _enter_heading(path, level, title)
+            next_heading += 1
+        metadata = {"source": source, "section_id": section_id}
+        if path:
+            metadata["heading_path"] = " > ".join(path[level] for level in sorted(path))
+            # The "## " heading (or "# " before the first one) names the topic
+            topic_levels = [level for level in path if level <= TOPIC_LEVEL]
+            if topic_levels:
+                metadata["topic"] = path[max(topic_levels)]
+        chunks.append((content, metadata))
+
+    # Headings after the last chunk start still apply to the next section
+    for _, level, title in headings[next_heading:]:
+        _enter_heading(path, level, title)
+    return chunks
+
+
+def _split_segment(text, source, splitter, path):
+    """Yield (chunk, metadata) pairs for every section of a piece of text"""
+    for section in split_sections(text):
+        yield from _split_section(section, source, splitter, path)
+
+
+def split_with_metadata(text, source, splitter_settings):
+    """Split text into (chunk, metadata) pairs carrying source and headings"""
+    return list(_split_segment(text, source, _make_splitter(splitter_settings), {}))
+
+
+def iter_sections(sources, splitter_settings):
+    """
+    Yield (section_id, split) for every section of every notes file
+
+    `split()` returns that section's (chunk, metadata) pairs, exactly as
+    `iter_chunks` would produce them, so a refresh only pays for splitting
+    the sections whose ID it hasn't seen before.
+    """
+    splitter = _make_splitter(splitter_settings)
+    for path in discover_files(sources):
+        heading_path = {}
+        for section in split_sections(parse_file(path)):
+            start_path = dict(heading_path)
+            _advance(heading_path, section)
+            yield _section_id(path, start_path, section), functools.partial(
+                _split_section, section, path, splitter, start_path
+            )
+
+
+def _cut_point(buffer, separators):
+    """
+    Where to cut a streaming buffer: the last occurrence of the best
+    separator that is not inside a code fence. Everything before the cut
+    can be split now; the rest waits for more text. 0 means "don't cut
+    yet" (the buffer ends inside a code fence that hasn't closed).
+    """
+    fence_marks = [m.start() for m in FENCE_MARK_RE.finditer(buffer)]
+    for separator in separators:
+        if not separator:
+            break
+        index = buffer.rfind(separator)
+        while index > 0:
+            # An odd number of ``` lines before the cut means we're in a fence
+            if bisect.bisect_left(fence_marks, index) % 2 == 0:
+                return index
+            index = buffer.rfind(separator, 0, index)
+    if len(fence_marks) % 2:
+        return 0
+    return len(buffer)
+
+
+def stream_split(path, splitter_settings, block_chars=STREAM_BLOCK_CHARS):
+    """
+    Yield (chunk, metadata) pairs for a Markdown/text file without loading it
+
+    Reads `block_chars` characters at a time and splits up to the last
+    separator in the buffer. Cuts normally fall in front of a "## "
+    heading, i.e. on a section boundary, so the chunks match a whole-file
+    split; only a single section longer than a block is cut inside.
+    """
+    splitter = _make_splitter(splitter_settings)
+    separators = splitter_settings.get("separators", ["\n\n", "\n", " ", ""])
+    heading_path = {}
+    buffer = ""
+
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(block_chars)
+            buffer += block
+            if not block:
+                break
+            if len(buffer) < block_chars:
+                continue
+            cut = _cut_point(buffer, separators)
+            if not cut:
+                continue
+            segment, buffer = buffer[:cut], buffer[cut:]
+            yield from _split_segment(segment, path, splitter, heading_path)
+
+    if buffer.strip():
+        yield from _split_segment(buffer, path, splitter, heading_path)
+
+
+def parse_and_split(path, splitter_settings):
+    """Worker entry point: one file in, its (chunk, metadata) pairs out"""
+    return split_with_metadata(parse_file(path), path, splitter_settings)
+
+
+def _should_stream(path):
+    return (
+        not path.lower().endswith(LATEX_EXTENSIONS)
+        and os.path.getsize(path) > STREAM_THRESHOLD_BYTES
+    )
+
+
+def iter_chunks(sources, splitter_settings, workers=None):
+    """
+    Yield (chunk, metadata) pairs for every file in `sources`
+
+    Files are processed in a process pool of `workers` processes (default:
+    one per CPU), at most two per worker at a time, and yielded in file
+    order as soon as each file is done.
+    Very large Markdown/text files are streamed in this process instead,
+    so their chunks are never held in memory all at once.
+    """
+    files = discover_files(sources)
+    streamed = {path for path in files if _should_stream(path)}
+    pooled = [path for path in files if path not in streamed]
+    workers = min(workers or os.cpu_count() or 1, len(pooled))
+
+    if workers <= 1:
+        for path in files:
+            if path in streamed:
+                yield from stream_split(path, splitter_settings)
+            else:
+                yield from parse_and_split(path, splitter_settings)
+        return
+
+    # "spawn" because the caller may already be running model threads,
+    # and forking a multi-threaded process can deadlock
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        # Keep only ~2 files per worker in flight, so finished chunk lists
+        # don't pile up in memory while the caller is still embedding
+        queue = iter(pooled)
+        pending = deque(
+            pool.submit(parse_and_split, path, splitter_settings)
+            for path in itertools.islice(queue, workers * 2)
+        )
+        for path in files:
+            if path in streamed:
+                yield from stream_split(path, splitter_settings)
+                continue
+            chunks = pending.popleft().result()
+            following = next(queue, None)
+            if following is not None:
+                pending.append(pool.submit(parse_and_split, following, splitter_settings))
+            yield from chunks
@@ -0,0 +1,120 @@
+"""
+In-memory BM25 index over the same chunks as the vector store
+
+Dense search is good at paraphrases but can rank an exact term like
+"bubble sort" or "O(log n)" below vaguely similar chunks; BM25 is the
+opposite. The retriever runs both and fuses the two rankings with
+reciprocal rank fusion (`rrf_fuse`).
+
+Postings are kept per term as {doc number: term frequency}, with chunk
+IDs mapped to small integers, so the index stays a fraction of the size
+of the notes. Chunks can be added and removed one at a time, which is
+what PersistentIndex needs for incremental syncs and refreshes.
+"""
+
+import heapq
+import math
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words too common to say anything about which chunk is relevant
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in into is it its of on
+or that the their then there these this to was what when where which while
+who why will with you your
+""".split())
+
+RRF_K = 60  # the constant from the original reciprocal rank fusion paper
+
+
+def tokenize(text):
+    """Lowercase word and number tokens, without stopwords"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def rrf_fuse(rankings, k=None):
+    """
+    Fuse ranked lists of IDs: each ID scores sum(1 / (RRF_K + rank)).
+    Returns the IDs best first, cut to `k` if given.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (RRF_K + rank)
+    fused = sorted(scores, key=lambda item: -scores[item])
+    return fused if k is None else fused[:k]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk IDs with incremental add and remove"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # term -> {doc number: term frequency}
+        self._numbers = {}   # chunk ID -> doc number
+        self._ids = []       # doc number -> chunk ID (None once removed)
+        self._lengths = []   # doc number -> token count
+        self._terms = []     # doc number -> distinct terms, for removal
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __contains__(self, cid):
+        return cid in self._numbers
+
+    def add(self, cid, text):
+        if cid in self._numbers:
+            return
+        tokens = tokenize(text)
+        number = len(self._ids)
+        self._numbers[cid] = number
+        self._ids.append(cid)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            self._postings.setdefault(token, {})[number] = count
+        self._terms.append(tuple(counts))
+
+    def remove(self, cid):
+        number = self._numbers.pop(cid, None)
+        if number is None:
+            return
+        self._ids[number] = None
+        self._total_length -= self._lengths[number]
+        for token in self._terms[number]:
+            docs = self._postings[token]
+            del docs[number]
+            if not docs:
+                del self._postings[token]
+        self._terms[number] = ()
+
+    def search(self, query, k=10, ids=None):
+        """Top-k (chunk ID, score) pairs for the query, optionally among `ids`"""
+        if not self._numbers:
+            return []
+        allowed = None
+        if ids is not None:
+            allowed = {self._numbers[cid] for cid in ids if cid in self._numbers}
+        total = len(self._numbers)
+        average = self._total_length / total or 1.0
+
+        scores = {}
+        for token in set(tokenize(query)):
+            docs = self._postings.get(token)
+            if not docs:
+                continue
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for number, tf in docs.items():
+                if allowed is not None and number not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[number] / average)
+                scores[number] = scores.get(number, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self._ids[number], score) for number, score in best]
@@ -0,0 +1,385 @@
+"""
+Shared, rate-limit-aware HTTP client for the hosted LLM (Groq)
+
+Every ChatGroq in the process sends its requests through one
+`LLMHTTPClient`:
+
+- one httpx connection pool, so requests reuse open TLS connections
+  instead of each session opening its own (async requests get one pool
+  per event loop: asyncio connections can't outlive or cross loops)
+- a `RateLimiter` with token buckets for the per-minute request and token
+  quotas: a request waits for its share instead of being sent into a 429,
+  and callers that would wait longer than `max_wait` get `LLMBusy`
+- retries of 429, 5xx and connection errors with jittered exponential
+  backoff; a 429's Retry-After pauses every caller, not just the one that
+  hit it
+
+The retries happen below the Groq SDK (its own retries are turned off),
+so they cover streaming requests too: a stream is retried before its
+first byte is read. The queue depth and retry counts are exported with
+the pipeline metrics. `base_url` points everything at a local stub
+server for tests.
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Completion tokens assumed when the request doesn't set max_tokens
+DEFAULT_COMPLETION_TOKENS = 400
+
+
+class LLMBusy(RuntimeError):
+    """The LLM quota won't have room for this request within `max_wait`"""
+
+
+def is_rate_limit_error(error):
+    """
+    True for LLMBusy and for a 429 that survived every retry
+
+    The SDKs wrap exceptions raised in the transport (LLMBusy comes out of
+    groq as an APIConnectionError), so the cause chain is searched too.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, LLMBusy) or getattr(error, "status_code", None) == 429:
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class RateLimiter:
+    """Token buckets for requests per minute and tokens per minute"""
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=12000, max_wait=30.0,
+                 clock=time.monotonic):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self.waiting = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        self._requests = min(self.requests_per_minute,
+                             self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute,
+                           self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _reserve(self, tokens):
+        """Take the quota and return 0 if it's there now, else seconds to wait"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            tokens = min(tokens, self.tokens_per_minute)
+            wait = max(
+                (1 - self._requests) * 60 / self.requests_per_minute,
+                (tokens - self._tokens) * 60 / self.tokens_per_minute,
+            )
+            if wait <= 0:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            return wait
+
+    def _check_wait(self, waited, wait):
+        if self.max_wait is not None and waited + wait > self.max_wait:
+            with self._lock:
+                self.rejected += 1
+            raise LLMBusy(f"LLM rate limit: no room for this request within {self.max_wait}s")
+
+    def _enter(self):
+        with self._lock:
+            self.waiting += 1
+            self.throttled += 1
+
+    def _leave(self, waited):
+        with self._lock:
+            self.waiting -= 1
+            self.wait_seconds += waited
+
+    def acquire(self, tokens=0, sleep=time.sleep):
+        """Block until one request and `tokens` tokens fit; returns seconds waited"""
+        wait = self._reserve(tokens)
+        if not wait:
+            return 0.0
+        self._check_wait(0.0, wait)
+        self._enter()
+        waited = 0.0
+        try:
+            while wait:
+                self._check_wait(waited, wait)
+                sleep(wait)
+                waited += wait
+                wait = self._reserve(tokens)
+        finally:
+            self._leave(waited)
+        return waited
+
+    async def aacquire(self, tokens=0):
+        """`acquire` for the event loop"""
+        wait = self._reserve(tokens)
+        if not wait:
+            return 0.0
+        self._check_wait(0.0, wait)
+        self._enter()
+        waited = 0.0
+        try:
+            while wait:
+                self._check_wait(waited, wait)
+                await asyncio.sleep(wait)
+                waited += wait
+                wait = self._reserve(tokens)
+        finally:
+            self._leave(waited)
+        return waited
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds` (the server said to back off)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def observe_remaining_tokens(self, remaining):
+        """Never assume more token quota than the server reports left"""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, float(remaining))
+
+
+def estimate_request_tokens(request):
+    """Prompt plus expected completion tokens of a chat completion request"""
+    from context_budget import estimate_tokens
+
+    try:
+        body = json.loads(request.content or b"{}")
+    except ValueError:
+        return DEFAULT_COMPLETION_TOKENS
+    prompt = " ".join(
+        message.get("content") or "" for message in body.get("messages", [])
+        if isinstance(message.get("content"), str)
+    )
+    completion = body.get("max_completion_tokens") or body.get("max_tokens")
+    return estimate_tokens(prompt) + (completion or DEFAULT_COMPLETION_TOKENS)
+
+
+def _retry_after(response):
+    """Seconds from a Retry-After header (delta or HTTP date), or None"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _RetryingTransport(httpx.BaseTransport):
+    def __init__(self, owner, transport):
+        self.owner = owner
+        self.transport = transport
+
+    def handle_request(self, request):
+        owner = self.owner
+        tokens = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            owner.limiter.acquire(tokens)
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                if attempt >= owner.max_retries:
+                    raise
+                delay = owner.backoff(attempt)
+            else:
+                retry_after = owner.after_response(response)
+                if response.status_code not in RETRY_STATUSES or attempt >= owner.max_retries:
+                    return response
+                response.read()
+                response.close()
+                delay = owner.backoff(attempt, retry_after)
+            owner.count_retry()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+
+class _AsyncRetryingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, owner, make_transport):
+        self.owner = owner
+        self.make_transport = make_transport
+        self._lock = threading.Lock()
+        self._transports = weakref.WeakKeyDictionary()  # event loop -> pool
+
+    @property
+    def transport(self):
+        """The connection pool of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = self.make_transport()
+            return transport
+
+    async def handle_async_request(self, request):
+        owner = self.owner
+        tokens = estimate_request_tokens(request)
+        transport = self.transport
+        attempt = 0
+        while True:
+            await owner.limiter.aacquire(tokens)
+            try:
+                response = await transport.handle_async_request(request)
+            except httpx.TransportError:
+                if attempt >= owner.max_retries:
+                    raise
+                delay = owner.backoff(attempt)
+            else:
+                retry_after = owner.after_response(response)
+                if response.status_code not in RETRY_STATUSES or attempt >= owner.max_retries:
+                    return response
+                await response.aread()
+                await response.aclose()
+                delay = owner.backoff(attempt, retry_after)
+            owner.count_retry()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class LLMHTTPClient:
+    """Connection pool, rate limiter and retry policy shared by the LLM clients"""
+
+    def __init__(self, limiter=None, max_retries=4, base_delay=0.5, max_delay=20.0,
+                 max_connections=20, timeout=60.0, transport=None, async_transport_factory=None,
+                 seed=None):
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections)
+        self.client = httpx.Client(
+            transport=_RetryingTransport(self, transport or httpx.HTTPTransport(limits=limits)),
+            timeout=timeout,
+        )
+        # One AsyncClient for every ChatGroq; its transport keeps a pool per loop
+        self.async_client = httpx.AsyncClient(
+            transport=_AsyncRetryingTransport(
+                self, async_transport_factory or (lambda: httpx.AsyncHTTPTransport(limits=limits))
+            ),
+            timeout=timeout,
+        )
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, but never sooner than Retry-After"""
+        with self._lock:
+            jittered = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(jittered, retry_after or 0.0)
+
+    def after_response(self, response):
+        """Update the limiter from a response; returns its Retry-After, if any"""
+        # Groq's remaining-requests header is the daily quota; tokens are per minute
+        remaining = response.headers.get("x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            try:
+                self.limiter.observe_remaining_tokens(float(remaining))
+            except ValueError:
+                pass
+        retry_after = _retry_after(response)
+        if response.status_code == 429:
+            with self._lock:
+                self.rate_limited += 1
+            if retry_after:
+                self.limiter.pause(retry_after)
+        return retry_after
+
+    def count_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def counters(self):
+        limiter = self.limiter
+        return {
+            "llm_retries_total": self.retries,
+            "llm_rate_limited_total": self.rate_limited,
+            "llm_throttled_total": limiter.throttled,
+            "llm_throttle_seconds_total": round(limiter.wait_seconds, 3),
+            "llm_busy_total": limiter.rejected,
+        }
+
+    def gauges(self):
+        return {"llm_queue_depth": self.limiter.waiting}
+
+    def close(self):
+        self.client.close()
+
+
+def client_from_env():
+    """LLMHTTPClient configured by DSA_GROQ_RPM / _TPM / _MAX_RETRIES / _MAX_CONNECTIONS"""
+    limiter = RateLimiter(
+        requests_per_minute=float(os.getenv("DSA_GROQ_RPM", "30")),
+        tokens_per_minute=float(os.getenv("DSA_GROQ_TPM", "12000")),
+        max_wait=float(os.getenv("DSA_LLM_QUEUE_TIMEOUT", "30")),
+    )
+    return LLMHTTPClient(
+        limiter=limiter,
+        max_retries=int(os.getenv("DSA_GROQ_MAX_RETRIES", "4")),
+        max_connections=int(os.getenv("DSA_GROQ_MAX_CONNECTIONS", "20")),
+    )
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_http_client():
+    """The process-wide LLMHTTPClient"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = client_from_env()
+        return _shared
+
+
+def shared_counters():
+    """Counters of the process-wide client, or nothing if it isn't in use"""
+    return _shared.counters() if _shared is not None else {}
+
+
+def shared_gauges():
+    return _shared.gauges() if _shared is not None else {}
@@ -0,0 +1,147 @@
+"""
+LLM providers for the answer step
+
+- "groq": the hosted Groq model (needs GROQ_API_KEY), sent through the
+  shared rate-limited connection pool in llm_client.py
+- "mock": a local stand-in with configurable latency, streaming speed and
+  error rate, for load tests and benchmarks on an offline box
+
+The mock answers from the prompt it is given: the first words of the
+retrieved context, or the notes' "not available" reply when the context
+is empty, so the whole retrieval, prompt and parse path still runs and
+the answers are deterministic.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+LLM_PROVIDERS = ("groq", "mock")
+NOT_IN_NOTES = "This information is not available in the provided notes."
+
+
+class MockLLMError(RuntimeError):
+    """A failure injected by MockChatModel's error rate"""
+
+
+class MockChatModel(BaseChatModel):
+    """Offline chat model that behaves like a remote one under load"""
+
+    latency: float = 0.5            # seconds before the first token
+    tokens_per_second: float = 50.0
+    error_rate: float = 0.0         # share of calls that raise MockLLMError
+    max_words: int = 60
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+    _rng_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context):
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self):
+        return "mock"
+
+    def _answer_tokens(self, messages):
+        """Words of the prompt's context, each with its trailing space"""
+        prompt = messages[-1].content
+        context = prompt.split("Context:", 1)[-1].split("User Question:", 1)[0]
+        words = context.split()[:self.max_words]
+        text = " ".join(words) if words else NOT_IN_NOTES
+        tokens = text.split(" ")
+        return [token + " " for token in tokens[:-1]] + tokens[-1:]
+
+    def _fails(self):
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    def _token_delay(self):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _check(self):
+        if self._fails():
+            raise MockLLMError(f"Simulated LLM error (error_rate={self.error_rate})")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._answer_tokens(messages)
+        time.sleep(self.latency)
+        self._check()
+        time.sleep(self._token_delay() * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._answer_tokens(messages)
+        await asyncio.sleep(self.latency)
+        self._check()
+        await asyncio.sleep(self._token_delay() * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._answer_tokens(messages)
+        time.sleep(self.latency)
+        self._check()
+        for token in tokens:
+            time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._answer_tokens(messages)
+        await asyncio.sleep(self.latency)
+        self._check()
+        for token in tokens:
+            await asyncio.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def mock_options_from_env():
+    """MockChatModel settings from DSA_MOCK_LATENCY/_TOKENS_PER_SECOND/_ERROR_RATE"""
+    options = {}
+    for name, field in (("DSA_MOCK_LATENCY", "latency"),
+                        ("DSA_MOCK_TOKENS_PER_SECOND", "tokens_per_second"),
+                        ("DSA_MOCK_ERROR_RATE", "error_rate")):
+        if os.getenv(name):
+            options[field] = float(os.environ[name])
+    return options
+
+
+def load_llm(provider, model_name, groq_api_key=None, http=None, base_url=None, **options):
+    """
+    Chat model for one of LLM_PROVIDERS
+
+    Groq requests go through `http` (an llm_client.LLMHTTPClient, default
+    the process-wide one), which does the rate limiting and retries;
+    `base_url` overrides the Groq API address (e.g. a local stub server).
+    """
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {provider!r}, expected one of {LLM_PROVIDERS}")
+    if provider == "mock":
+        return MockChatModel(**{**mock_options_from_env(), **options})
+
+    groq_api_key = groq_api_key or os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise ValueError("GROQ_API_KEY not found in environment variables")
+
+    from langchain_groq import ChatGroq
+
+    from llm_client import get_llm_http_client
+
+    http = http if http is not None else get_llm_http_client()
+    if base_url is not None:
+        options["base_url"] = base_url
+    return ChatGroq(
+        groq_api_key=groq_api_key,
+        model_name=model_name,
+        temperature=0,  # Deterministic responses, no creativity
+        http_client=http.client,
+        http_async_client=http.async_client,
+        max_retries=0,  # http retries with backoff, below the SDK
+        **options,
+    )
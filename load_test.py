@@ -0,0 +1,156 @@
+"""
+Load test: the full question path at concurrency, offline
+
+Runs DSAAssistant with the mock LLM (llm_providers.MockChatModel), so
+retrieval, prompt building, the LLM call and output parsing all run as in
+production but nothing goes over the network and no quota is spent.
+`--concurrency` clients each ask `--requests` questions from
+`benchmark_questions.json`, either streaming (`ask_stream` on threads,
+like Streamlit sessions) or with `aask` on one event loop. Reports
+throughput, errors, and p50/p95/p99 of total latency and time to first
+token; `--output` also writes them as JSON.
+
+Usage:
+    python load_test.py
+    python load_test.py --concurrency 32 --latency 0.8 --tokens-per-second 40 --error-rate 0.02
+    python load_test.py --mode async --embeddings hashing --output load.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark_retrieval import create_benchmark_embeddings, load_questions, percentile
+from dsa_assistant import DSAAssistant
+from embedding_backends import EMBEDDING_BACKENDS
+from llm_providers import MockChatModel
+
+
+def _stream_one(assistant, question):
+    start = time.perf_counter()
+    first_token = None
+    for chunk in assistant.ask_stream(question):
+        if isinstance(chunk, str) and first_token is None:
+            first_token = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return total, first_token if first_token is not None else total
+
+
+def run_stream(assistant, questions, concurrency, requests):
+    """Each client thread streams its questions one after another"""
+    def client(offset):
+        timings, errors = [], 0
+        for i in range(requests):
+            try:
+                timings.append(_stream_one(assistant, questions[(offset + i) % len(questions)]))
+            except Exception:
+                errors += 1
+        return timings, errors
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(client, range(concurrency)))
+
+
+def run_async(assistant, questions, concurrency, requests):
+    """Each client coroutine awaits its questions one after another"""
+    async def client(offset):
+        timings, errors = [], 0
+        for i in range(requests):
+            start = time.perf_counter()
+            try:
+                await assistant.aask(questions[(offset + i) % len(questions)])
+            except Exception:
+                errors += 1
+                continue
+            total = time.perf_counter() - start
+            timings.append((total, total))  # no streaming: first token == done
+        return timings, errors
+
+    async def clients():
+        return await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+
+    return asyncio.run(clients())
+
+
+def summarize(per_client, seconds):
+    """Throughput, error count and latency percentiles in milliseconds"""
+    timings = [t for client_timings, _ in per_client for t in client_timings]
+    errors = sum(e for _, e in per_client)
+    summary = {
+        "requests": len(timings) + errors,
+        "errors": errors,
+        "seconds": seconds,
+        "requests_per_s": (len(timings) + errors) / seconds,
+    }
+    for name, values in (("latency", [t for t, _ in timings]),
+                         ("first_token", [f for _, f in timings])):
+        for p in (50, 95, 99):
+            summary[f"{name}_p{p}_ms"] = percentile(values, p) * 1000 if values else None
+    return summary
+
+
+def format_percentiles(summary, name):
+    """"p50 / p95 / p99" of one latency, "n/a" where no request succeeded"""
+    return " / ".join(
+        "n/a" if summary[f"{name}_p{p}_ms"] is None else f"{summary[f'{name}_p{p}_ms']:.0f}"
+        for p in (50, 95, 99)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", default="dsa_notes.txt")
+    parser.add_argument("--embeddings", default="torch",
+                        choices=list(EMBEDDING_BACKENDS) + ["hashing"])
+    parser.add_argument("--mode", default="stream", choices=["stream", "async"])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=10, help="questions per client")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    llm = MockChatModel(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                        error_rate=args.error_rate)
+    directory = tempfile.mkdtemp(prefix="load_test_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            assistant = DSAAssistant(
+                notes_file=args.notes,
+                persist_directory=directory,
+                embeddings=create_benchmark_embeddings(args.embeddings),
+                llm=llm,
+                max_concurrency=args.concurrency,
+                ingest_workers=1,
+            )
+        questions = [question for question, _ in load_questions()]
+
+        print(f"🚦 {args.concurrency} clients x {args.requests} questions ({args.mode}), "
+              f"mock LLM: {args.latency}s latency, {args.tokens_per_second} tokens/s, "
+              f"{args.error_rate:.0%} errors")
+        run = run_stream if args.mode == "stream" else run_async
+        start = time.perf_counter()
+        per_client = run(assistant, questions, args.concurrency, args.requests)
+        summary = summarize(per_client, time.perf_counter() - start)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"⚡ {summary['requests']} requests in {summary['seconds']:.2f}s "
+          f"({summary['requests_per_s']:.1f}/s), {summary['errors']} errors")
+    print(f"⏱️  latency p50/p95/p99: {format_percentiles(summary, 'latency')} ms")
+    print(f"⏱️  first token p50/p95/p99: {format_percentiles(summary, 'first_token')} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(dict(summary, **vars(args)), f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Per-stage latency metrics for the RAG pipeline
+
+Every question is timed stage by stage:
+
+- embed: query embedding
+- search: vector / hybrid search (dense-only search embeds inside it)
+- rerank, expand: the optional cross-encoder and section expansion
+- context: deduplicating and packing the chunks into the token budget
+- prompt, llm, parse: the answer chain; `llm_first_token` is the time to
+  the first streamed token
+- total: the whole question
+
+`MetricsCallback` times the LangChain runs (prompt, LLM, parser and the
+whole chain) and reads token usage from the LLM response, falling back
+to an estimate for models that don't report it. The rest is timed with
+`PipelineMetrics.stage()`. Histograms and counters are exported in the
+Prometheus text format, over HTTP (`serve`) or to a file (`write`), and
+`breakdown()` gives recent percentiles for the admin view.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds; Prometheus client defaults plus room for slow LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGES = ("embed", "search", "rerank", "expand", "context", "prompt", "llm",
+          "llm_first_token", "parse", "total")
+PREFIX = "dsa_rag"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects it"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class PipelineMetrics:
+    """Stage histograms, counters and a window of recent timings"""
+
+    def __init__(self, recent=500):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._recent = {}
+        self._recent_size = recent
+        self._counters = {}   # (name, labels) -> value
+        self._collectors = {}  # key -> (collect, "counter" or "gauge")
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self._histograms:
+                self._histograms[stage] = Histogram()
+                self._recent[stage] = deque(maxlen=self._recent_size)
+            self._histograms[stage].observe(seconds)
+            self._recent[stage].append(seconds)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as one stage; an exception also counts as an error"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count("errors_total", stage=name)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def add_collector(self, collect, kind="counter", key=None):
+        """
+        `collect()` returns {counter or gauge name: value}, read at export time
+
+        Registering again under the same `key` (default: `collect` itself)
+        replaces the collector, so assistants sharing one PipelineMetrics
+        don't pile up copies. Values of the same name are summed.
+        """
+        with self._lock:
+            self._collectors[collect if key is None else key] = (collect, kind)
+
+    def _collected(self):
+        """{name: summed value} and {name: kind} from every collector"""
+        with self._lock:
+            collectors = list(self._collectors.values())
+        values, kinds = {}, {}
+        for collect, kind in collectors:
+            for name, value in collect().items():
+                values[name] = values.get(name, 0) + value
+                kinds[name] = kind
+        return values, kinds
+
+    def counters(self):
+        """Counter (and collected gauge) values by name, summed over labels"""
+        with self._lock:
+            totals = {}
+            for (name, _), value in self._counters.items():
+                totals[name] = totals.get(name, 0) + value
+        for name, value in self._collected()[0].items():
+            totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def breakdown(self):
+        """{stage: count, mean_ms, p50_ms, p95_ms} over the recent window"""
+        with self._lock:
+            recent = {stage: sorted(values) for stage, values in self._recent.items()}
+        result = {}
+        for stage in sorted(recent, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            values = recent[stage]
+            result[stage] = {
+                "count": len(values),
+                "mean_ms": round(1000 * sum(values) / len(values), 2),
+                "p50_ms": round(1000 * values[(len(values) - 1) // 2], 2),
+                "p95_ms": round(1000 * values[int(0.95 * (len(values) - 1))], 2),
+            }
+        return result
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = [f"# HELP {PREFIX}_stage_seconds Time spent in each pipeline stage",
+                 f"# TYPE {PREFIX}_stage_seconds histogram"]
+        with self._lock:
+            for stage, h in self._histograms.items():
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {h.sum}')
+                lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {h.count}')
+            counters = dict(self._counters)
+
+        collected, kinds = self._collected()
+        for name, value in collected.items():
+            counters[(name, ())] = counters.get((name, ()), 0) + value
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name in sorted(by_name):
+            lines.append(f"# TYPE {PREFIX}_{name} {kinds.get(name, 'counter')}")
+            for labels, value in sorted(by_name[name]):
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the Prometheus text to `path` atomically (textfile collector)"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def write_every(self, path, interval=15.0):
+        """Rewrite `path` every `interval` seconds from a daemon thread"""
+        def loop():
+            while True:
+                self.write(path)
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name="dsa-metrics-file", daemon=True).start()
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serve GET /metrics on a daemon thread; returns the server"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="dsa-metrics-http",
+                         daemon=True).start()
+        return server
+
+
+def _estimate(text):
+    from context_budget import estimate_tokens
+
+    return estimate_tokens(text)
+
+
+class MetricsCallback(BaseCallbackHandler):
+    """Times LangChain runs named after a stage and counts LLM tokens"""
+
+    run_inline = True  # time async runs on the event loop, not in an executor
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._runs = {}  # run_id -> (stage, start, prompt text)
+        self._streaming = set()  # LLM runs that already sent a token
+
+    def _start(self, run_id, stage, prompt=""):
+        with self._lock:
+            self._runs[run_id] = (stage, time.perf_counter(), prompt)
+
+    def _finish(self, run_id, error=False):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        stage, start, prompt = run
+        self.metrics.observe(stage, time.perf_counter() - start)
+        if error:
+            self.metrics.count("errors_total", stage=stage)
+        elif stage == "total":
+            self.metrics.count("requests_total")
+        return prompt
+
+    def on_chain_start(self, serialized, inputs, *, run_id, name=None, **kwargs):
+        if name in STAGES:
+            self._start(run_id, name)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = "\n".join(m.content for batch in messages for m in batch
+                           if isinstance(m.content, str))
+        self._start(run_id, "llm", prompt)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", "\n".join(prompts))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run[0] != "llm" or run_id in self._streaming:
+                return
+            self._streaming.add(run_id)
+        self.metrics.observe("llm_first_token", time.perf_counter() - run[1])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            self._streaming.discard(run_id)
+        prompt = self._finish(run_id)
+        if prompt is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        generations = response.generations[0] if response.generations else []
+        generation = generations[0] if generations else None
+        message_usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if prompt_tokens is None and message_usage:
+            prompt_tokens = message_usage.get("input_tokens")
+            completion_tokens = message_usage.get("output_tokens")
+        if prompt_tokens is None:
+            prompt_tokens = _estimate(prompt)
+            completion_tokens = _estimate(generation.text if generation else "")
+        self.metrics.count("prompt_tokens_total", prompt_tokens)
+        self.metrics.count("completion_tokens_total", completion_tokens or 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._streaming.discard(run_id)
+        self._finish(run_id, error=True)
@@ -0,0 +1,260 @@
+"""
+In-process NumPy vector store
+
+For a corpus the size of our notes, brute force beats an ANN index: all
+chunk vectors live in one contiguous, L2-normalized float32 matrix, and a
+query is a single matrix-vector product plus `argpartition` for the top k.
+The matrix is saved as a plain `.npy` file and memory-mapped on load, so
+startup is a file open rather than a database client boot.
+
+The class mirrors the parts of the Chroma wrapper that the rest of the
+code uses (`get`, `delete`, `delete_collection`, `add_texts`), so
+PersistentIndex and the retriever work with either backend. Inside
+`bulk()` adds and deletes are buffered and the matrix is rebuilt and
+saved once at the end, instead of once per batch.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first (works row-wise on 2-D)"""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    # argpartition is O(n); only the k survivors get fully sorted
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class _Snapshot:
+    """Immutable view of the index; readers grab one and never see a partial update"""
+
+    def __init__(self, matrix, ids, texts, metadatas):
+        self.matrix = matrix
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self._rows = None
+
+    def rows(self, ids):
+        """Row numbers of the given chunk IDs, skipping unknown ones"""
+        if self._rows is None:
+            # Built on first use; two threads racing here build the same dict
+            self._rows = {cid: i for i, cid in enumerate(self.ids)}
+        return [self._rows[cid] for cid in ids if cid in self._rows]
+
+
+class NumpyVectorStore(VectorStore):
+    """Brute-force cosine-similarity vector store backed by a .npy matrix"""
+
+    def __init__(self, embedding_function, persist_directory=None):
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self._write_lock = threading.Lock()
+        self._snapshot = self._load()
+        self._bulk_depth = 0
+        self._pending = []            # (vectors, ids, texts, metadatas) added in bulk
+        self._pending_deletes = set()
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def _load(self):
+        """Memory-map a saved index, or start empty"""
+        if self.persist_directory:
+            vectors_path = os.path.join(self.persist_directory, VECTORS_FILE)
+            chunks_path = os.path.join(self.persist_directory, CHUNKS_FILE)
+            if os.path.exists(vectors_path) and os.path.exists(chunks_path):
+                with open(chunks_path, 'r', encoding='utf-8') as f:
+                    chunks = json.load(f)
+                matrix = np.load(vectors_path, mmap_mode="r")
+                return _Snapshot(matrix, chunks["ids"], chunks["texts"], chunks["metadatas"])
+        return _Snapshot(np.zeros((0, 0), dtype=np.float32), [], [], [])
+
+    def _save(self, snapshot):
+        """Write the matrix and chunk table, replacing the old files atomically"""
+        if not self.persist_directory:
+            return
+        os.makedirs(self.persist_directory, exist_ok=True)
+        vectors_path = os.path.join(self.persist_directory, VECTORS_FILE)
+        chunks_path = os.path.join(self.persist_directory, CHUNKS_FILE)
+        with open(vectors_path + ".tmp", 'wb') as f:
+            np.save(f, np.ascontiguousarray(snapshot.matrix, dtype=np.float32))
+        with open(chunks_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                "ids": snapshot.ids,
+                "texts": snapshot.texts,
+                "metadatas": snapshot.metadatas,
+            }, f)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(chunks_path + ".tmp", chunks_path)
+
+    def __len__(self):
+        return len(self._snapshot.ids)
+
+    # -- Chroma-compatible maintenance API used by PersistentIndex --------
+
+    def get(self, ids=None, include=None, **kwargs):
+        snap = self._snapshot
+        rows = range(len(snap.ids)) if ids is None else snap.rows(ids)
+        return {
+            "ids": [snap.ids[i] for i in rows],
+            "documents": [snap.texts[i] for i in rows],
+            "metadatas": [snap.metadatas[i] for i in rows],
+        }
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(
+            texts, self.embedding_function.embed_documents(texts), metadatas, ids
+        )
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """Add chunks whose vectors were computed elsewhere"""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        if ids is None:
+            ids = [str(len(self) + i) for i in range(len(texts))]
+        vectors = _normalize(embeddings)
+
+        with self._write_lock:
+            self._pending.append((vectors, list(ids), texts, [dict(m or {}) for m in metadatas]))
+            if not self._bulk_depth:
+                self._apply()
+        return list(ids)
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return
+        with self._write_lock:
+            self._pending_deletes.update(ids)
+            if not self._bulk_depth:
+                self._apply()
+
+    def delete_collection(self):
+        with self._write_lock:
+            self._pending, self._pending_deletes = [], set()
+            empty = _Snapshot(np.zeros((0, 0), dtype=np.float32), [], [], [])
+            self._save(empty)
+            self._snapshot = empty
+
+    @contextmanager
+    def bulk(self):
+        """Buffer adds and deletes in the block; publish and save them once at the end"""
+        with self._write_lock:
+            self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            with self._write_lock:
+                self._bulk_depth -= 1
+                if not self._bulk_depth:
+                    self._apply()
+
+    def _apply(self):
+        """Fold the buffered changes into a new snapshot and save it. Hold the write lock."""
+        if not self._pending and not self._pending_deletes:
+            return
+        snap = self._snapshot
+        doomed = self._pending_deletes
+        keep = [i for i, cid in enumerate(snap.ids) if cid not in doomed]
+        ids = [snap.ids[i] for i in keep]
+        texts = [snap.texts[i] for i in keep]
+        metadatas = [snap.metadatas[i] for i in keep]
+        blocks = [snap.matrix[keep]] if keep else []
+        for vectors, batch_ids, batch_texts, batch_metadatas in self._pending:
+            rows = [i for i, cid in enumerate(batch_ids) if cid not in doomed]
+            blocks.append(vectors[rows])
+            ids += [batch_ids[i] for i in rows]
+            texts += [batch_texts[i] for i in rows]
+            metadatas += [batch_metadatas[i] for i in rows]
+        self._pending, self._pending_deletes = [], set()
+        matrix = (np.ascontiguousarray(np.concatenate(blocks), dtype=np.float32)
+                  if ids else np.zeros((0, 0), np.float32))
+        new = _Snapshot(matrix, ids, texts, metadatas)
+        self._save(new)
+        self._snapshot = new
+
+    # -- Search ------------------------------------------------------------
+
+    def _documents(self, snap, rows, scores=None):
+        docs = []
+        for n, i in enumerate(rows):
+            doc = Document(page_content=snap.texts[i], metadata=dict(snap.metadatas[i]))
+            docs.append(doc if scores is None else (doc, float(scores[n])))
+        return docs
+
+    def _candidates(self, snap, ids):
+        """The matrix rows to search: all of them, or only the given IDs"""
+        if ids is None:
+            return snap.matrix, None
+        rows = np.asarray(snap.rows(ids), dtype=np.int64)
+        return snap.matrix[rows], rows
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, ids=None):
+        """Top-k (document, cosine score) pairs, optionally among `ids` only"""
+        snap = self._snapshot
+        if not snap.ids:
+            return []
+        matrix, rows = self._candidates(snap, ids)
+        if not len(matrix):
+            return []
+        scores = matrix @ _normalize(embedding)
+        best = top_k(scores, k)
+        return self._documents(snap, best if rows is None else rows[best], scores[best])
+
+    def similarity_search_by_vector(self, embedding, k=4, ids=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, ids)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def search_many(self, embeddings, k=4, ids=None):
+        """Top-k documents for many query vectors with one matrix product"""
+        snap = self._snapshot
+        if not snap.ids:
+            return [[] for _ in embeddings]
+        matrix, rows = self._candidates(snap, ids)
+        if not len(matrix):
+            return [[] for _ in embeddings]
+        best = top_k(_normalize(embeddings) @ matrix.T, k)
+        return [self._documents(snap, row if rows is None else rows[row]) for row in best]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None,
+                   persist_directory=None, **kwargs):
+        store = cls(embedding, persist_directory=persist_directory)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
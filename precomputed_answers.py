@@ -0,0 +1,146 @@
+"""
+Precomputed answers for the canonical (sidebar) questions
+
+The example questions in the app's sidebar are asked far more often than
+anything else, so their answers are worked out once, in the background
+after startup (`DSAAssistant.warm_up`), and kept in an SQLite file next
+to the vector store. A click on one of them is then served straight from
+the store, without retrieval or an LLM call.
+
+An entry records the chunks the answer was written from and the prompt
+and model namespace. It is only served while every one of those chunks
+is still in the index (chunk IDs are content hashes, so an edited section
+drops them) and the namespace is unchanged; after `refresh()` the
+warm-up runs again and re-answers questions whose retrieval changed.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+# Sidebar label -> (question, topic); app.py builds its buttons from this
+EXAMPLE_TOPICS = {
+    "📊 Arrays": ("What is an array and how does it work?", "Arrays"),
+    "🔗 Linked Lists": ("How do I reverse a linked list?", "Linked Lists"),
+    "📚 Stacks": ("What is a stack and when should I use it?", "Stacks"),
+    "🚶 Queues": ("What's the difference between stack and queue?", ["Stacks", "Queues"]),
+    "🔍 Binary Search": ("Explain binary search in simple terms", "Binary Search"),
+    "📈 Big O": ("What is Big O notation?", "Big O"),
+    "🔄 Recursion": ("What is recursion and how does it work?", "Recursion"),
+    "🌲 Trees": ("What is a binary search tree?", "Trees"),
+    "🔢 Bubble Sort": ("How does bubble sort work?", "Bubble Sort"),
+    "⚡ Merge Sort": ("Explain merge sort step by step", "Merge Sort"),
+}
+
+
+def example_questions():
+    """(question, topic) pairs of the sidebar buttons"""
+    return list(EXAMPLE_TOPICS.values())
+
+
+def load_questions(path):
+    """(question, topic) pairs from a JSON list of strings or {question, topic}"""
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    return [
+        (item, None) if isinstance(item, str) else (item["question"], item.get("topic"))
+        for item in items
+    ]
+
+
+def question_key(question, topic=None):
+    """Store key: the normalized question and its topic labels"""
+    from answer_cache import normalize_question
+
+    topics = [topic] if isinstance(topic, str) else list(topic or [])
+    return json.dumps([normalize_question(question), topics])
+
+
+class PrecomputedAnswers:
+    """Answers to a few fixed questions, kept across restarts"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        if path is not None:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS precomputed "
+                    "(key TEXT PRIMARY KEY, entry TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                for key, entry in conn.execute("SELECT key, entry FROM precomputed"):
+                    self._entries[key] = json.loads(entry)
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self._local.conn = conn
+        return conn
+
+    def entry(self, key):
+        """The stored entry for a key, valid or not"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key, namespace, live_ids):
+        """
+        The entry for `key` if it was written under `namespace` from chunks
+        that are all still in `live_ids`, else None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if not self.is_valid(entry, namespace, live_ids):
+                self.stale += 1
+                return None
+            self.hits += 1
+            return entry
+
+    @staticmethod
+    def is_valid(entry, namespace, live_ids):
+        return (entry["namespace"] == namespace and bool(entry["chunk_ids"])
+                and all(cid in live_ids for cid in entry["chunk_ids"]))
+
+    def put(self, key, answer, docs, namespace, context=None):
+        """Store an answer with the documents it was written from"""
+        context = context or {}
+        entry = {
+            "answer": answer,
+            "namespace": namespace,
+            "chunk_ids": [doc.metadata.get("chunk_id") for doc in docs],
+            "sources": [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs],
+            "context_tokens": context.get("tokens"),
+            "saved_tokens": context.get("saved_tokens"),
+        }
+        with self._lock:
+            self._entries[key] = entry
+        if self.path is not None:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO precomputed (key, entry, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(entry), time.time()),
+                )
+        return entry
+
+    @staticmethod
+    def documents(entry):
+        """The entry's sources as LangChain documents"""
+        from langchain_core.documents import Document
+
+        return [Document(page_content=source["text"], metadata=source["metadata"])
+                for source in entry["sources"]]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "misses": self.misses, "stale": self.stale}
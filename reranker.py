@@ -0,0 +1,146 @@
+"""
+Optional cross-encoder rerank stage
+
+The retriever fetches a wider candidate set than we want to send to the
+LLM; a small CPU cross-encoder then scores every (question, chunk) pair
+in one batched forward pass and only the best few are kept.
+
+Scores are cached per (normalized question, chunk ID), so a repeated or
+rephrased-identically question costs nothing. The reranker also tracks
+its own speed (seconds per uncached pair, as a moving average) and
+skips itself, keeping the retriever's order, when scoring the uncached
+pairs would take longer than `latency_budget` seconds. Every
+`probe_every` skips it scores a single pair to refresh that estimate, so
+one slow call (a cold cache, a busy CPU) doesn't turn it off for good.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from answer_cache import doc_chunk_id, normalize_question
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def create_cross_encoder(model_name=RERANK_MODEL):
+    """Load a sentence-transformers cross-encoder on the CPU"""
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, device="cpu")
+
+
+class Reranker:
+    """Cross-encoder reranking with a score cache and a latency budget"""
+
+    def __init__(self, model=None, model_name=RERANK_MODEL, candidates=12,
+                 latency_budget=0.25, max_entries=4096, probe_every=8):
+        """
+        `model` is anything with a `predict(pairs, batch_size=...)` method
+        (a sentence-transformers CrossEncoder); it is loaded from
+        `model_name` on first use when not given. `candidates` is how many
+        chunks the retriever should fetch for reranking.
+        """
+        self._model = model
+        self.model_name = model_name
+        self.candidates = candidates
+        self.latency_budget = latency_budget
+        self.max_entries = max_entries
+        self.probe_every = probe_every
+        self._skips_since_probe = 0
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.seconds_per_pair = None
+        self.reranked = 0
+        self.skipped = 0
+        self.cached_pairs = 0
+        self.scored_pairs = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = create_cross_encoder(self.model_name)
+        return self._model
+
+    def _cached(self, key):
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def _remember(self, key, score):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def _score(self, pairs, keys, reset=False):
+        """
+        Score pairs in one forward pass, cache them and update the speed
+        estimate (`reset` replaces it instead of averaging)
+        """
+        model = self.model  # a first-use load is not scoring time
+        start = time.perf_counter()
+        scores = [float(score) for score in model.predict(pairs, batch_size=len(pairs))]
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        with self._lock:
+            self.seconds_per_pair = per_pair if reset or self.seconds_per_pair is None else (
+                0.7 * self.seconds_per_pair + 0.3 * per_pair
+            )
+            self.scored_pairs += len(pairs)
+        for key, score in zip(keys, scores):
+            self._remember(key, score)
+        return scores
+
+    def rerank(self, question, docs, k):
+        """The `k` best docs by cross-encoder score (or the first `k` if skipped)"""
+        if len(docs) <= 1:
+            return list(docs)[:k]
+        query = normalize_question(question)
+        keys = [(query, doc_chunk_id(doc)) for doc in docs]
+        scores = [self._cached(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            estimate = (self.seconds_per_pair or 0.0) * len(missing)
+            if estimate > self.latency_budget:
+                with self._lock:
+                    self.skipped += 1
+                    self._skips_since_probe += 1
+                    probe = self._skips_since_probe >= self.probe_every
+                    if probe:
+                        self._skips_since_probe = 0
+                if probe:
+                    # The estimate is stale while skipping: re-measure on one pair
+                    i = missing[0]
+                    self._score([(question, docs[i].page_content)], [keys[i]], reset=True)
+                return list(docs)[:k]
+
+            # One forward pass over every uncached pair
+            fresh = self._score([(question, docs[i].page_content) for i in missing],
+                                [keys[i] for i in missing])
+            for i, score in zip(missing, fresh):
+                scores[i] = score
+
+        with self._lock:
+            self.reranked += 1
+            self.cached_pairs += len(docs) - len(missing)
+        order = sorted(range(len(docs)), key=lambda i: -scores[i])
+        return [docs[i] for i in order[:k]]
+
+    def stats(self):
+        """Counters for the admin view"""
+        with self._lock:
+            return {
+                "reranked": self.reranked,
+                "skipped": self.skipped,
+                "scored_pairs": self.scored_pairs,
+                "cached_pairs": self.cached_pairs,
+                "ms_per_pair": round(self.seconds_per_pair * 1000, 2)
+                if self.seconds_per_pair is not None else None,
+            }
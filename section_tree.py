@@ -0,0 +1,125 @@
+"""
+Heading structure of the indexed notes
+
+Built from the chunk entries PersistentIndex keeps for every sync, in
+document order, so it always describes exactly what is in the vector
+store. It answers three questions with dictionary lookups instead of
+vector queries:
+
+- which chunks belong to a topic (a "## " section), to restrict a search
+- which chunks sit right before and after a hit under the same heading
+- which chunk opens the hit's parent heading
+"""
+
+import re
+
+
+def normalize_title(title):
+    """'### 2. Binary Search' / '🔍 Binary Search' -> 'binary search'"""
+    title = re.sub(r"[^\w\s]", " ", title.lower())
+    title = re.sub(r"^\s*\d+\s+", "", title)
+    return " ".join(title.split())
+
+
+class SectionTree:
+    """Topic, parent and sibling lookups over the chunk IDs of an index"""
+
+    def __init__(self, chunks=()):
+        """
+        `chunks` is an iterable of (chunk_id, info) in document order, where
+        info has the chunk's `source`, `heading_path`, `topic` and the
+        `headings` that start inside it
+        """
+        # (source, heading path) -> chunk IDs under exactly that heading
+        self._nodes = {}
+        # chunk ID -> (node key, position within the node)
+        self._where = {}
+        # topic -> chunk IDs, and every heading title -> topics it lives in
+        self._topics = {}
+        self._titles = {}
+
+        for cid, info in chunks:
+            key = (info.get("source"), info.get("heading_path") or "")
+            node = self._nodes.setdefault(key, [])
+            self._where[cid] = (key, len(node))
+            node.append(cid)
+
+            topic = info.get("topic")
+            if topic:
+                self._topics.setdefault(topic, []).append(cid)
+                for title in key[1].split(" > ") + info.get("headings", []):
+                    self._titles.setdefault(normalize_title(title), set()).add(topic)
+
+    def __len__(self):
+        return len(self._where)
+
+    def topics(self):
+        """Topic names in document order"""
+        return list(self._topics)
+
+    def resolve(self, labels):
+        """
+        Topics matching one label or a list of labels ("Binary Search",
+        "📚 Stacks"), or [] if none match. A label matches a topic whose
+        own title, or any heading inside it, is or contains the label.
+        """
+        if isinstance(labels, str):
+            labels = [labels]
+        found = []
+        for label in labels:
+            wanted = normalize_title(label)
+            matches = self._titles.get(wanted)
+            if not matches:
+                matches = set()
+                for title, topics in self._titles.items():
+                    if wanted and wanted in title:
+                        matches |= topics
+            for topic in self.topics():
+                if topic in matches and topic not in found:
+                    found.append(topic)
+        return found
+
+    def topic_chunks(self, topics):
+        """Chunk IDs of the given topics, in document order"""
+        if isinstance(topics, str):
+            topics = [topics]
+        ids = []
+        for topic in topics:
+            ids.extend(self._topics.get(topic, ()))
+        return ids
+
+    def siblings(self, cid):
+        """The chunks right before and after `cid` under the same heading"""
+        if cid not in self._where:
+            return []
+        key, position = self._where[cid]
+        node = self._nodes[key]
+        return [node[i] for i in (position - 1, position + 1) if 0 <= i < len(node)]
+
+    def parent(self, cid):
+        """The first chunk of the nearest enclosing heading, or None"""
+        if cid not in self._where:
+            return None
+        (source, path), _ = self._where[cid]
+        while " > " in path:
+            path = path.rsplit(" > ", 1)[0]
+            node = self._nodes.get((source, path))
+            if node:
+                return node[0]
+        return None
+
+    def related(self, cids, parents=True, siblings=True):
+        """Parent and sibling chunks of `cids` that aren't in `cids` themselves"""
+        seen = set(cids)
+        extra = []
+        for cid in cids:
+            candidates = []
+            if parents:
+                candidates.append(self.parent(cid))
+            if siblings:
+                candidates.extend(self.siblings(cid))
+            for other in candidates:
+                if other is not None and other not in seen:
+                    seen.add(other)
+                    extra.append(other)
+        return extra
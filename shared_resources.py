@@ -0,0 +1,268 @@
+"""
+Process-wide shared models and assistants
+
+Streamlit runs every browser session in the same Python process, so the
+embedding model, the Chroma client and the Groq client only need to be
+built once. Sessions get the shared DSAAssistant and must treat it as
+read-only: the chain and vector store are safe to call from many threads,
+but swapping attributes on it would affect every user.
+"""
+
+import os
+import sys
+import threading
+import time
+
+from answer_cache import AnswerCache
+from dsa_assistant import DSAAssistant, create_embeddings, create_llm, embedding_namespace
+from embedding_backends import backend_from_env
+from embedding_cache import CachedEmbeddings
+from metrics import PipelineMetrics
+from precomputed_answers import PrecomputedAnswers, example_questions, load_questions
+
+
+def _rss_bytes():
+    """Resident memory of this process, or None if we can't tell"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+class SharedResources:
+    """Builds heavy objects once per process and counts who reuses them"""
+
+    def __init__(self, embeddings_factory=create_embeddings, llm_factory=create_llm,
+                 assistant_factory=DSAAssistant,
+                 embedding_cache_dir=os.path.join("chroma_db", "embedding_cache"),
+                 session_ttl=float(os.getenv("DSA_SESSION_TTL", "600")), clock=time.monotonic):
+        self._embeddings_factory = embeddings_factory
+        self._llm_factory = llm_factory
+        self._assistant_factory = assistant_factory
+        self._embedding_cache_dir = embedding_cache_dir
+        self._lock = threading.RLock()
+        self._embeddings = None
+        self._llm = None
+        self._answer_caches = {}
+        self._precomputed = {}
+        self._metrics = None
+        self._assistants = {}
+        self._sessions = {}  # session_id -> last seen
+        self._session_ttl = session_ttl
+        self._clock = clock
+        self._build_rss_delta = 0
+        self._build_seconds = 0.0
+
+    def _timed_build(self, factory, *args, **kwargs):
+        """Call a factory and account for the memory and time it took"""
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        obj = factory(*args, **kwargs)
+        self._build_seconds += time.perf_counter() - start
+        rss_after = _rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            self._build_rss_delta += max(0, rss_after - rss_before)
+        return obj
+
+    def embeddings(self):
+        """
+        The one embedding model for this process, behind a vector cache
+
+        DSA_EMBEDDING_BACKEND ("torch", "onnx" or "onnx-int8"),
+        DSA_EMBEDDING_BATCH_SIZE and DSA_EMBEDDING_THREADS configure it.
+        """
+        with self._lock:
+            if self._embeddings is None:
+                options = backend_from_env()
+                self._embeddings = CachedEmbeddings(
+                    self._timed_build(self._embeddings_factory, **options),
+                    namespace=embedding_namespace(options.get("backend", "torch")),
+                    disk_path=self._embedding_cache_dir,
+                )
+            return self._embeddings
+
+    def llm(self):
+        """
+        The one Groq client for this process
+
+        Its requests share one connection pool and rate limiter
+        (llm_client.py): DSA_GROQ_RPM and DSA_GROQ_TPM are the per-minute
+        quotas, DSA_GROQ_MAX_RETRIES the retries of 429s and server errors.
+        """
+        with self._lock:
+            if self._llm is None:
+                self._llm = self._timed_build(self._llm_factory)
+            return self._llm
+
+    def metrics(self):
+        """
+        Pipeline metrics shared by every assistant in this process
+
+        Exported in the Prometheus text format on
+        http://127.0.0.1:$DSA_METRICS_PORT/metrics and/or to the file
+        DSA_METRICS_FILE (rewritten every 15 s), when those are set.
+        """
+        with self._lock:
+            if self._metrics is None:
+                self._metrics = PipelineMetrics()
+                if os.getenv("DSA_METRICS_PORT"):
+                    self._metrics.serve(int(os.environ["DSA_METRICS_PORT"]))
+                if os.getenv("DSA_METRICS_FILE"):
+                    self._metrics.write_every(os.environ["DSA_METRICS_FILE"])
+            return self._metrics
+
+    def answer_cache(self, persist_directory="./chroma_db"):
+        """
+        The answer cache kept next to a vector store, shared by all sessions
+
+        Answers persist in `answer_cache.sqlite`; set
+        DSA_SEMANTIC_CACHE_THRESHOLD (e.g. 0.95) to also reuse answers for
+        near-identical questions.
+        """
+        key = os.path.abspath(persist_directory)
+        with self._lock:
+            if key not in self._answer_caches:
+                threshold = os.getenv("DSA_SEMANTIC_CACHE_THRESHOLD")
+                os.makedirs(persist_directory, exist_ok=True)
+                self._answer_caches[key] = AnswerCache(
+                    path=os.path.join(persist_directory, "answer_cache.sqlite"),
+                    semantic_threshold=float(threshold) if threshold else None,
+                    embeddings=self.embeddings() if threshold else None,
+                )
+            return self._answer_caches[key]
+
+    def precomputed_answers(self, persist_directory="./chroma_db"):
+        """The precomputed-answer store kept next to a vector store"""
+        key = os.path.abspath(persist_directory)
+        with self._lock:
+            if key not in self._precomputed:
+                os.makedirs(persist_directory, exist_ok=True)
+                self._precomputed[key] = PrecomputedAnswers(
+                    os.path.join(persist_directory, "precomputed_answers.sqlite")
+                )
+            return self._precomputed[key]
+
+    def warmup_questions(self):
+        """
+        Questions to precompute: the sidebar examples, or the JSON list in
+        DSA_WARMUP_QUESTIONS; DSA_WARMUP=0 turns the warm-up off
+        """
+        if os.getenv("DSA_WARMUP", "1") == "0":
+            return []
+        if os.getenv("DSA_WARMUP_QUESTIONS"):
+            return load_questions(os.environ["DSA_WARMUP_QUESTIONS"])
+        return example_questions()
+
+    def assistant(self, notes_file="dsa_notes.txt", persist_directory="./chroma_db",
+                  session_id=None):
+        """
+        Return the shared assistant for these notes, building it on first use.
+
+        The notes are checked for edits every DSA_NOTES_WATCH_INTERVAL
+        seconds (default 2, 0 disables) and changed sections are reloaded
+        without a restart. DSA_RERANK=1 adds the cross-encoder rerank stage
+        (DSA_RERANK_BUDGET_MS caps its latency, default 250). The sidebar
+        questions are answered in the background and then served from the
+        precomputed store (see `warmup_questions`). Pass `session_id` so
+        the session shows up in `stats()` (see `touch_session`).
+        """
+        sources = [notes_file] if isinstance(notes_file, str) else list(notes_file)
+        key = (tuple(os.path.abspath(s) for s in sources), os.path.abspath(persist_directory))
+        with self._lock:
+            if key not in self._assistants:
+                watch_interval = float(os.getenv("DSA_NOTES_WATCH_INTERVAL", "2"))
+                reranker = None
+                if os.getenv("DSA_RERANK") == "1":
+                    from reranker import Reranker
+                    budget = float(os.getenv("DSA_RERANK_BUDGET_MS", "250")) / 1000
+                    reranker = Reranker(latency_budget=budget)
+                self._assistants[key] = self._timed_build(
+                    self._assistant_factory,
+                    notes_file=notes_file,
+                    persist_directory=persist_directory,
+                    embeddings=self.embeddings(),
+                    llm=self.llm(),
+                    answer_cache=self.answer_cache(persist_directory),
+                    watch_interval=watch_interval or None,
+                    reranker=reranker,
+                    metrics=self.metrics(),
+                    precomputed=self.precomputed_answers(persist_directory),
+                    warmup_questions=self.warmup_questions(),
+                )
+            if session_id is not None:
+                self._sessions[session_id] = self._clock()
+            return self._assistants[key]
+
+    def touch_session(self, session_id):
+        """
+        Mark a session as active (call on every rerun); sessions not seen
+        for `session_ttl` seconds (DSA_SESSION_TTL, default 600) no
+        longer count as sharing the assistant
+        """
+        with self._lock:
+            self._sessions[session_id] = self._clock()
+
+    def release_session(self, session_id):
+        """Forget a session (the shared objects stay loaded)"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _active_sessions(self):
+        """Drop sessions idle for longer than the TTL; returns how many remain"""
+        cutoff = self._clock() - self._session_ttl
+        for session_id, seen in list(self._sessions.items()):
+            if seen < cutoff:
+                del self._sessions[session_id]
+        return len(self._sessions)
+
+    def stats(self):
+        """Memory footprint, reuse and cache counters for the admin view"""
+        with self._lock:
+            rss = _rss_bytes()
+            cache_stats = [cache.stats() for cache in self._answer_caches.values()]
+            embedding_stats = self._embeddings.stats() if self._embeddings else {}
+            precomputed_stats = [store.stats() for store in self._precomputed.values()]
+            metrics = self._metrics
+            counters = metrics.counters() if metrics else {}
+            return {
+                "embedding_cache_hits": embedding_stats.get("hits", 0),
+                "embedding_cache_misses": embedding_stats.get("misses", 0),
+                "cache_hits": sum(c["hits"] for c in cache_stats),
+                "cache_misses": sum(c["misses"] for c in cache_stats),
+                "precomputed_answers": sum(p["entries"] for p in precomputed_stats),
+                "precomputed_hits": sum(p["hits"] for p in precomputed_stats),
+                "assistants": len(self._assistants),
+                "sessions": self._active_sessions(),
+                "build_seconds": round(self._build_seconds, 3),
+                "build_memory_mb": round(self._build_rss_delta / 2**20, 1),
+                "process_memory_mb": round(rss / 2**20, 1) if rss is not None else None,
+                "prompt_tokens": counters.get("prompt_tokens_total", 0),
+                "completion_tokens": counters.get("completion_tokens_total", 0),
+                "errors": counters.get("errors_total", 0),
+                "llm_queue_depth": counters.get("llm_queue_depth", 0),
+                "llm_retries": counters.get("llm_retries_total", 0),
+                "llm_rate_limited": counters.get("llm_rate_limited_total", 0),
+                "stages": metrics.breakdown() if metrics else {},
+            }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_resources():
+    """The process-wide SharedResources instance"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedResources()
+        return _shared
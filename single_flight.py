@@ -0,0 +1,135 @@
+"""
+Single-flight: one run per distinct in-flight request
+
+When a class clicks the same example question at once, every session
+would otherwise run its own retrieval and LLM call. `SingleFlight` lets
+the first caller for a key do the work while concurrent callers with the
+same key wait for, and share, its result:
+
+- `call(key, fn)`: blocking calls (threads)
+- `stream(key, make_iter)`: streams; the producer runs on its own thread
+  and every caller replays the items from the start, so a caller that
+  joins late or stops reading early doesn't affect the others
+- `acall(key, make_coro)`: coroutines on one event loop
+
+Errors are shared too. A key is forgotten as soon as its run finishes,
+so later requests start fresh (and can still hit the answer cache).
+"""
+
+import asyncio
+import threading
+import weakref
+
+
+class _Flight:
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Shares one run of a call, stream or coroutine among identical requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._tasks = weakref.WeakKeyDictionary()  # event loop -> {key: task}
+        self.coalesced = 0
+
+    def _join(self, key):
+        """(flight, True) for the first caller of a key, (flight, False) after"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _finish(self, key, flight, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            flight.done = True
+            flight.error = error
+            flight.cond.notify_all()
+
+    def call(self, key, fn):
+        """fn(), or the result of the identical call already running"""
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, flight, e)
+                raise
+            flight.items.append(result)
+            self._finish(key, flight)
+            return result
+
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.done)
+        if flight.error is not None:
+            raise flight.error
+        return flight.items[0]
+
+    def stream(self, key, make_iter):
+        """Iterator over make_iter()'s items, shared with identical streams"""
+        flight, leader = self._join(key)
+        if leader:
+            threading.Thread(
+                target=self._produce, args=(key, flight, make_iter),
+                name="dsa-single-flight", daemon=True,
+            ).start()
+        return self._replay(flight)
+
+    def _produce(self, key, flight, make_iter):
+        try:
+            for item in make_iter():
+                with flight.cond:
+                    flight.items.append(item)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            self._finish(key, flight, e)
+        else:
+            self._finish(key, flight)
+
+    @staticmethod
+    def _replay(flight):
+        seen = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: len(flight.items) > seen or flight.done)
+                items = flight.items[seen:]
+                done, error = flight.done, flight.error
+            yield from items
+            seen += len(items)
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    async def acall(self, key, make_coro):
+        """await make_coro(), or the identical coroutine already running"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            if task is None:
+                task = loop.create_task(make_coro())
+                tasks[key] = task
+
+                def forget(done):
+                    if tasks.get(key) is done:
+                        del tasks[key]
+                    if not done.cancelled():
+                        done.exception()  # retrieved, even if every caller left
+
+                task.add_done_callback(forget)
+            else:
+                self.coalesced += 1
+        # A caller that times out or is cancelled leaves the run to the others
+        return await asyncio.shield(task)
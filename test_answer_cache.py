@@ -0,0 +1,83 @@
+"""
+Offline tests for the LLM answer cache
+"""
+
+import time
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from answer_cache import AnswerCache
+
+DOCS = [Document(page_content="A stack is LIFO.", metadata={"chunk_id": "c1"})]
+OTHER_DOCS = [Document(page_content="A queue is FIFO.", metadata={"chunk_id": "c2"})]
+
+
+def test_exact_hit_needs_same_question_chunks_and_namespace():
+    cache = AnswerCache()
+    cache.put("What is a stack?", DOCS, "prompt-v1", "LIFO!")
+
+    assert cache.get("  what is a STACK ", DOCS, "prompt-v1") == "LIFO!"
+    assert cache.get("What is a stack?", OTHER_DOCS, "prompt-v1") is None
+    assert cache.get("What is a stack?", DOCS, "prompt-v2") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_and_ttl_eviction():
+    cache = AnswerCache(max_entries=2, ttl=0.05)
+    cache.put("a", DOCS, "ns", "A")
+    cache.put("b", DOCS, "ns", "B")
+    cache.get("a", DOCS, "ns")
+    cache.put("c", DOCS, "ns", "C")
+
+    assert cache.get("b", DOCS, "ns") is None
+    assert cache.get("a", DOCS, "ns") == "A"
+
+    time.sleep(0.06)
+    assert cache.get("a", DOCS, "ns") is None
+
+
+def test_disk_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    AnswerCache(path=path).put("What is a stack?", DOCS, "ns", "LIFO!")
+
+    cache = AnswerCache(path=path)
+    assert cache.get("What is a stack?", DOCS, "ns") == "LIFO!"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_backend_prunes_expired_and_oldest_rows(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    cache = AnswerCache(path=path, ttl=60, max_disk_entries=3)
+    cache.disk._connect().execute(
+        "INSERT INTO answers (key, answer, created) VALUES ('old', 'stale', ?)",
+        (time.time() - 120,),
+    )
+    for i in range(5):
+        cache.put(f"Question {i}?", DOCS, "ns", f"answer {i}")
+        time.sleep(0.01)
+
+    assert len(cache.disk) == 3
+    fresh = AnswerCache(path=path, ttl=60)
+    assert fresh.get("Question 4?", DOCS, "ns") == "answer 4"
+    assert fresh.get("Question 0?", DOCS, "ns") is None
+
+
+class SameVector(DeterministicFakeEmbedding):
+    """Every question embeds to the same vector, so they are all 'similar'"""
+
+    def embed_query(self, text):
+        return [1.0] * self.size
+
+
+def test_semantic_tier_is_opt_in():
+    exact = AnswerCache()
+    exact.put("What is a stack?", DOCS, "ns", "LIFO!")
+    assert exact.get("Explain stacks", DOCS, "ns") is None
+
+    semantic = AnswerCache(semantic_threshold=0.9, embeddings=SameVector(size=4))
+    semantic.put("What is a stack?", DOCS, "ns", "LIFO!")
+    assert semantic.get("Explain stacks", DOCS, "ns") == "LIFO!"
+    assert semantic.get("Explain stacks", OTHER_DOCS, "ns") is None
+    assert semantic.stats()["semantic_hits"] == 1
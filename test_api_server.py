@@ -0,0 +1,123 @@
+"""
+Tests for the HTTP/JSON service, on fake embeddings and the mock LLM
+"""
+
+import asyncio
+import json
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from starlette.testclient import TestClient
+
+from api_server import Admission, Rejected, create_app
+from dsa_assistant import DSAAssistant
+from llm_client import LLMBusy
+from llm_providers import MockChatModel
+
+NOTES = "\n".join(f"## {topic}\n{text * 12}" for topic, text in {
+    "Stacks": "A stack is Last In, First Out (LIFO). ",
+    "Queues": "A queue is First In, First Out (FIFO). ",
+}.items())
+
+
+@pytest.fixture
+def client(tmp_path):
+    notes = tmp_path / "notes.txt"
+    notes.write_text(NOTES)
+
+    def factory():
+        return DSAAssistant(notes_file=str(notes), persist_directory=str(tmp_path / "db"),
+                            embeddings=DeterministicFakeEmbedding(size=16),
+                            llm=MockChatModel(latency=0, tokens_per_second=0), k=1)
+
+    with TestClient(create_app(factory)) as client:
+        yield client
+
+
+def test_ask_and_batch(client):
+    answer = client.post("/ask", json={"question": "What is a queue?", "topic": "Queues"})
+    batch = client.post("/ask/batch", json={"questions": ["What is a stack?", "LIFO?"]})
+
+    assert answer.status_code == 200
+    assert "FIFO" in answer.json()["answer"]
+    assert answer.json()["sources"][0]["topic"] == "Queues"
+    assert [len(r["sources"]) for r in batch.json()["results"]] == [1, 1]
+
+
+def test_stream_sends_tokens_then_summary(client):
+    response = client.post("/ask/stream", json={"question": "What is a stack?",
+                                               "topic": "Stacks"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "".join(line.get("token", "") for line in lines[:-1]).startswith("## Stacks")
+    assert lines[-1]["done"] is True
+    assert lines[-1]["sources"][0]["topic"] == "Stacks"
+
+
+def test_bad_requests_and_health(client):
+    assert client.post("/ask", json={"question": " "}).status_code == 400
+    assert client.post("/ask/batch", json={"questions": "x"}).status_code == 400
+    assert client.get("/healthz").json()["status"] == "ok"
+    client.post("/ask", json={"question": "What is a stack?"})
+    assert "dsa_rag_stage_seconds" in client.get("/metrics").text
+
+
+def test_llm_rate_limit_is_503_with_retry_after(client, monkeypatch):
+    async def busy(*args, **kwargs):
+        raise LLMBusy("no quota")
+
+    monkeypatch.setattr(client.app.state.assistant, "aask", busy)
+    response = client.post("/ask", json={"question": "What is a stack?"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_stream_slot_is_released_when_the_client_leaves_before_the_body(client):
+    app = client.app
+    body = json.dumps({"question": "What is a stack?"}).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"},
+             "http_version": "1.1", "method": "POST", "scheme": "http", "path": "/ask/stream",
+             "raw_path": b"/ask/stream", "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json")],
+             "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            raise OSError("client went away")
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            client.portal.call(app, scope, receive, send)
+
+    assert app.state.admission.in_flight == 0
+    assert client.post("/ask", json={"question": "What is a stack?"}).status_code == 200
+
+
+def test_admission_queues_then_rejects_and_drains():
+    async def scenario():
+        admission = Admission(max_in_flight=1, max_queue=1, queue_timeout=5)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected):
+            await admission.acquire()  # one running, one queued: full
+
+        admission.release()
+        await waiter
+        assert (admission.in_flight, admission.queued) == (1, 0)
+
+        drain = asyncio.create_task(admission.drain(timeout=5))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected):
+            await admission.acquire()  # draining
+        assert not drain.done()
+        admission.release()
+        await drain
+        return admission.rejected
+
+    assert asyncio.run(scenario()) == 2
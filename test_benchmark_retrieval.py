@@ -0,0 +1,41 @@
+"""
+Tests for the offline retrieval benchmark
+"""
+
+from langchain_core.documents import Document
+
+from benchmark_retrieval import (
+    HashingEmbeddings, first_hit_rank, load_questions, percentile, run_config,
+)
+
+
+def test_first_hit_rank_matches_heading_path_or_inner_heading():
+    docs = [
+        Document(page_content="FIFO", metadata={"heading_path": "Notes > Queues"}),
+        Document(page_content="### 4. Merge Sort\nDivide and conquer",
+                 metadata={"heading_path": "Notes > Sorting Algorithms"}),
+    ]
+
+    assert first_hit_rank(docs, "Merge Sort") == 2
+    assert first_hit_rank(docs, "Queues") == 1
+    assert first_hit_rank(docs, "Stacks") is None
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 95) == 7
+
+
+def test_run_config_reports_quality_and_latency_offline():
+    questions = load_questions()
+
+    result = run_config(HashingEmbeddings(), "dsa_notes.txt", questions, chunk_size=1000,
+                        k=3, backend="numpy", retrieval="hybrid", rounds=1)
+
+    assert result["recall_at_k"] >= 0.9
+    assert 0 < result["mrr"] <= result["recall_at_k"]
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+    assert result["embeddings_per_s"] > 0
@@ -0,0 +1,51 @@
+"""
+Offline tests for context assembly within a token budget
+"""
+
+from langchain_core.documents import Document
+
+from context_budget import ContextBudget, estimate_tokens, split_spans, trim_overlap
+
+TEXT = (
+    "A stack is Last In, First Out. Push adds an item to the top of the stack. "
+    "Pop removes the item from the top of the stack. Peek looks at the top item "
+    "without removing it. Stacks are used for undo, for matching brackets and for "
+    "function calls in recursion."
+)
+
+
+def test_overlap_between_adjacent_chunks_is_sent_once():
+    first, second = TEXT[:180], TEXT[120:]
+
+    assert trim_overlap(first, second) == TEXT[180:].lstrip()
+    assert trim_overlap(second[::-1], first[::-1])[::-1] == TEXT[:120].rstrip()
+
+    context = ContextBudget(max_tokens=1000).assemble(
+        "stack", [Document(page_content=second), Document(page_content=first)]
+    )
+    assert context["text"].count("Pop removes") == 1
+    assert context["saved_tokens"] > 0
+
+
+def test_near_duplicate_sentences_are_dropped():
+    docs = [
+        Document(page_content="Binary search halves the sorted array every step.\n- Time: O(log n)"),
+        Document(page_content="Binary search halves the sorted array at every step!\n- Time: O(log n)"),
+    ]
+
+    context = ContextBudget().assemble("binary search", docs)
+
+    assert context["text"].count("halves") == 1
+    assert context["text"].count("Time: O(log n)") == 2  # short spans are kept
+
+
+def test_budget_keeps_the_spans_that_match_the_question():
+    filler = "Trees have a root node and child nodes. " * 5
+    docs = [Document(page_content=filler + "\nIn-order traversal visits left, root, right.")]
+
+    context = ContextBudget(max_tokens=15).assemble("in-order traversal", docs)
+
+    assert context["tokens"] <= 15
+    assert "traversal" in context["text"]
+    assert split_spans("### 1. Bubble Sort\nOne. Two.") == ["### 1. Bubble Sort", "One.", "Two."]
+    assert estimate_tokens("O(log n)") == 5
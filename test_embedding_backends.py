@@ -0,0 +1,68 @@
+"""
+Tests for the ONNX embedding path, with a fake ONNX Runtime session
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+from embedding_backends import OnnxEmbeddings, load_embeddings, onnx_file
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "stack": 2, "queue": 3, "heap": 4, "tree": 5}
+
+
+def make_tokenizer():
+    tokenizer = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    return tokenizer
+
+
+class FakeSession:
+    """Token embeddings are one-hot token IDs; padding gets a large vector"""
+
+    def __init__(self, inputs=("input_ids", "attention_mask", "token_type_ids")):
+        self.inputs = inputs
+        self.feeds = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=name) for name in self.inputs]
+
+    def run(self, outputs, feed):
+        self.feeds.append(feed)
+        tokens = np.eye(len(VOCAB), dtype=np.float32)[feed["input_ids"]]
+        tokens[feed["input_ids"] == 0] = 100.0
+        return [tokens]
+
+
+def test_mean_pooling_ignores_padding_and_normalizes():
+    embeddings = OnnxEmbeddings("fake", session=FakeSession(), tokenizer=make_tokenizer())
+
+    alone = embeddings.embed_query("stack queue")
+    batched = embeddings.embed_documents(["stack queue", "heap tree heap tree stack"])[0]
+
+    assert np.allclose(alone, batched)
+    assert np.isclose(np.linalg.norm(alone), 1.0)
+    assert np.allclose(alone, np.array([0, 0, 1, 1, 0, 0]) / np.sqrt(2))
+
+
+def test_batches_and_feeds_only_the_graphs_inputs():
+    session = FakeSession(inputs=("input_ids", "attention_mask"))
+    embeddings = OnnxEmbeddings("fake", batch_size=2, session=session,
+                                tokenizer=make_tokenizer())
+
+    vectors = embeddings.embed_documents(["stack", "queue", "heap", "tree", "stack\nheap"])
+
+    assert len(vectors) == 5
+    assert [len(feed["input_ids"]) for feed in session.feeds] == [2, 2, 1]
+    assert all(set(feed) == {"input_ids", "attention_mask"} for feed in session.feeds)
+
+
+def test_backend_choice():
+    assert onnx_file("onnx") == "onnx/model.onnx"
+    assert "int8" in onnx_file("onnx-int8")
+    with pytest.raises(ValueError):
+        load_embeddings("fake", backend="tensorflow")
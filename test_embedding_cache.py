@@ -0,0 +1,117 @@
+"""
+Offline tests for the caching embeddings wrapper
+"""
+
+import os
+import threading
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from embedding_cache import CachedEmbeddings, MmapVectorStore, _digest
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that count the texts they really embed"""
+    calls: int = 0
+    texts: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts += 1
+        return super().embed_query(text)
+
+
+def test_repeated_query_skips_the_model():
+    model = CountingEmbeddings(size=8)
+    cached = CachedEmbeddings(model, namespace="fake")
+
+    first = cached.embed_query("What is a stack?")
+    second = cached.embed_query("What is a stack?")
+
+    assert first == second
+    assert model.calls == 1
+    assert cached.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_documents_embed_only_misses_in_one_batch():
+    model = CountingEmbeddings(size=8)
+    cached = CachedEmbeddings(model, namespace="fake")
+    cached.embed_documents(["a", "b"])
+
+    vectors = cached.embed_documents(["a", "c", "b", "d"])
+
+    assert len(vectors) == 4
+    assert model.calls == 2
+    assert model.texts == 4
+
+
+def test_memory_tier_is_bounded():
+    cached = CachedEmbeddings(CountingEmbeddings(size=8), namespace="fake", max_entries=2)
+    for text in ["a", "b", "c"]:
+        cached.embed_query(text)
+
+    assert cached.stats()["entries"] == 2
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    writer_model = CountingEmbeddings(size=8)
+    writer = CachedEmbeddings(writer_model, namespace="fake", disk_path=str(tmp_path))
+    vector = writer.embed_query("What is a queue?")
+
+    # A second "worker" with an empty memory tier reads the mapped files
+    reader_model = CountingEmbeddings(size=8)
+    reader = CachedEmbeddings(reader_model, namespace="fake", disk_path=str(tmp_path))
+
+    assert reader.embed_query("What is a queue?") == vector
+    assert reader_model.calls == 0
+
+
+def test_namespace_separates_models(tmp_path):
+    CachedEmbeddings(CountingEmbeddings(size=8), namespace="a",
+                     disk_path=str(tmp_path)).embed_query("x")
+    model = CountingEmbeddings(size=8)
+    CachedEmbeddings(model, namespace="b", disk_path=str(tmp_path)).embed_query("x")
+
+    assert model.calls == 1
+
+
+def test_store_created_by_another_process_is_mapped_not_replaced(tmp_path):
+    path = str(tmp_path)
+    creator = MmapVectorStore(path, slots=64)
+    waiter = MmapVectorStore(path, slots=64)
+    # The creator holds the lock, as if it were halfway through writing the files
+    lock = os.path.join(path, "create.lock")
+    open(lock, "w").close()
+
+    def create():
+        time.sleep(0.1)
+        os.remove(lock)
+        creator.put(_digest("fake", "query", "a"), [1.0] * 4)
+
+    thread = threading.Thread(target=create)
+    thread.start()
+    waiter.put(_digest("fake", "query", "b"), [2.0] * 4)
+    thread.join()
+
+    assert list(creator.get(_digest("fake", "query", "b"))) == [2.0] * 4
+    assert list(waiter.get(_digest("fake", "query", "a"))) == [1.0] * 4
+    assert not os.path.exists(lock)
+
+
+def test_stale_create_lock_is_cleared(tmp_path):
+    lock = os.path.join(str(tmp_path), "create.lock")
+    open(lock, "w").close()
+    os.utime(lock, (time.time() - 60, time.time() - 60))
+    store = MmapVectorStore(str(tmp_path), slots=8, create_timeout=0.05)
+    key = _digest("fake", "query", "a")
+
+    store.put(key, [1.0] * 4)
+    assert store.get(key) is None
+    store.put(key, [1.0] * 4)
+    assert list(store.get(key)) == [1.0] * 4
@@ -0,0 +1,170 @@
+"""
+Offline tests for multi-file, multi-format ingestion
+"""
+
+from concurrent.futures import Future
+
+import pytest
+
+import ingestion
+from dsa_assistant import SPLITTER_SETTINGS
+from ingestion import (
+    discover_files, iter_chunks, latex_to_markdown, split_with_metadata, stream_split,
+)
+
+LATEX = r"""
+\documentclass{article}
+\begin{document}
+\section{Sorting}
+\subsection{Bubble Sort}
+Repeatedly swap \textbf{adjacent} items. % a comment
+\begin{lstlisting}[language=Python]
+# not a heading
+for i in range(n): pass
+\end{lstlisting}
+\end{document}
+"""
+
+
+def make_corpus(root):
+    (root / "basics").mkdir()
+    (root / "basics" / "arrays.md").write_text("## Arrays\n\n### Access\nO(1) by index.\n")
+    (root / "basics" / "stacks.txt").write_text("## Stacks\n\nLast In, First Out.\n")
+    (root / "sorting.tex").write_text(LATEX)
+    (root / "ignored.pdf").write_text("binary")
+
+
+def test_discover_files_expands_directories_and_globs(tmp_path):
+    make_corpus(tmp_path)
+
+    by_dir = discover_files([str(tmp_path)])
+    by_glob = discover_files([str(tmp_path / "**" / "*.md"), str(tmp_path / "sorting.tex")])
+
+    assert [p.rsplit("/", 1)[-1] for p in by_dir] == ["sorting.tex", "arrays.md", "stacks.txt"]
+    assert [p.rsplit("/", 1)[-1] for p in by_glob] == ["arrays.md", "sorting.tex"]
+    with pytest.raises(FileNotFoundError):
+        discover_files([str(tmp_path / "missing.txt")])
+
+
+def test_latex_becomes_markdown_headings_with_code_kept():
+    text = latex_to_markdown(LATEX)
+
+    assert "## Sorting" in text
+    assert "### Bubble Sort" in text
+    assert "Repeatedly swap adjacent items." in text
+    assert "# not a heading" in text
+    assert "comment" not in text
+
+
+def test_chunks_carry_source_and_heading_path():
+    notes = "## Arrays\n" + "Arrays hold items. " * 60 + "\n### Access\n" + "Index in O(1). " * 60
+    chunks = split_with_metadata(notes, "notes.md", SPLITTER_SETTINGS)
+
+    assert chunks[0][1]["source"] == "notes.md"
+    assert chunks[0][1]["heading_path"] == "Arrays"
+    assert chunks[-1][1]["heading_path"] == "Arrays > Access"
+    # "### " starts its own section, but the topic is still the "## " heading
+    assert chunks[0][1]["section_id"] != chunks[-1][1]["section_id"]
+    assert chunks[-1][1]["topic"] == "Arrays"
+
+
+def test_code_comments_are_not_headings():
+    notes = "## Sorting\n" + "Swap neighbours. " * 70 + "\n```\n# not a heading\n" + "x = 1\n" * 200 + "```\n"
+    chunks = split_with_metadata(notes, "sorting.md", SPLITTER_SETTINGS)
+
+    assert len(chunks) > 2
+    assert all(m["heading_path"] == "Sorting" for _, m in chunks)
+
+
+def test_process_pool_gives_same_chunks_in_file_order(tmp_path):
+    make_corpus(tmp_path)
+
+    serial = list(iter_chunks([str(tmp_path)], SPLITTER_SETTINGS, workers=1))
+    parallel = list(iter_chunks([str(tmp_path)], SPLITTER_SETTINGS, workers=2))
+
+    assert parallel == serial
+    assert list(dict.fromkeys(m["source"].rsplit("/", 1)[-1] for _, m in serial)) == [
+        "sorting.tex", "arrays.md", "stacks.txt"
+    ]
+
+
+pools = []
+
+
+class RecordingPool:
+    """In-process stand-in for ProcessPoolExecutor that counts submissions"""
+
+    def __init__(self, max_workers, mp_context=None):
+        self.submitted = []
+        pools.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        self.submitted.append(args[0])
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_process_pool_keeps_a_bounded_window_of_files(tmp_path, monkeypatch):
+    for i in range(10):
+        (tmp_path / f"notes{i}.md").write_text(f"## Topic {i}\n\nFact {i}.\n")
+    monkeypatch.setattr(ingestion, "ProcessPoolExecutor", RecordingPool)
+    pools.clear()
+
+    chunks = iter_chunks([str(tmp_path)], SPLITTER_SETTINGS, workers=2)
+    first = next(chunks)
+
+    assert first[1]["topic"] == "Topic 0"
+    assert len(pools[0].submitted) == 5  # 2 per worker, plus the refill
+    rest = list(chunks)
+    assert len(pools[0].submitted) == 10
+    assert [m["topic"] for _, m in [first] + rest] == [f"Topic {i}" for i in range(10)]
+
+
+def large_notes(sections=40):
+    # Every section is longer than chunk_size, so a whole-file split never
+    # merges text across a "## " boundary and streaming must match it exactly
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Topic {i}\n\n### Detail\n" + f"Fact {i} about this topic. " * 60)
+    return "\n".join(parts) + "\n"
+
+
+def test_stream_split_matches_whole_file_split(tmp_path):
+    notes = tmp_path / "big.md"
+    notes.write_text(large_notes())
+
+    streamed = list(stream_split(str(notes), SPLITTER_SETTINGS, block_chars=4096))
+    whole = split_with_metadata(notes.read_text(), str(notes), SPLITTER_SETTINGS)
+
+    assert streamed == whole
+    assert streamed[-1][1]["heading_path"] == "Topic 39 > Detail"
+
+
+def test_stream_split_does_not_cut_inside_code_fences(tmp_path):
+    notes = tmp_path / "code.md"
+    notes.write_text("## Code\n```\n" + "# comment\nx = 1\n" * 500 + "```\n## After\nDone.\n")
+
+    chunks = list(stream_split(str(notes), SPLITTER_SETTINGS, block_chars=1024))
+
+    assert {m["heading_path"] for _, m in chunks} == {"Code", "After"}
+
+
+def test_large_files_are_streamed(tmp_path, monkeypatch):
+    notes = tmp_path / "big.md"
+    notes.write_text(large_notes(5))
+    streamed = []
+    original = ingestion.stream_split
+    monkeypatch.setattr(ingestion, "STREAM_THRESHOLD_BYTES", 1024)
+    monkeypatch.setattr(ingestion, "stream_split", lambda *a: streamed.append(a[0]) or original(*a))
+
+    chunks = list(iter_chunks([str(notes)], SPLITTER_SETTINGS))
+
+    assert streamed == [str(notes)]
+    assert chunks == split_with_metadata(notes.read_text(), str(notes), SPLITTER_SETTINGS)
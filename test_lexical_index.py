@@ -0,0 +1,47 @@
+"""
+Offline tests for the BM25 index and rank fusion
+"""
+
+from lexical_index import BM25Index, rrf_fuse, tokenize
+
+CHUNKS = {
+    "bubble": "Bubble sort repeatedly swaps adjacent items. Time: O(n^2).",
+    "binary": "Binary search halves the sorted array each step. Time: O(log n).",
+    "stack": "A stack is Last In, First Out (LIFO).",
+}
+
+
+def make_index():
+    index = BM25Index()
+    for cid, text in CHUNKS.items():
+        index.add(cid, text)
+    return index
+
+
+def test_exact_terms_rank_first():
+    index = make_index()
+
+    assert tokenize("What is O(log n)?") == ["o", "log", "n"]
+    assert index.search("how does bubble sort work", k=1)[0][0] == "bubble"
+    assert index.search("O(log n)", k=1)[0][0] == "binary"
+    assert index.search("graphs") == []
+
+
+def test_remove_and_restrict():
+    index = make_index()
+
+    index.remove("bubble")
+    index.add("bubble", "Bubble sort, rewritten.")
+
+    assert len(index) == 3
+    assert [cid for cid, _ in index.search("rewritten sort")] == ["bubble"]
+    assert [cid for cid, _ in index.search("swaps adjacent")] == []
+    assert [cid for cid, _ in index.search("time", ids=["binary"])] == ["binary"]
+
+
+def test_rrf_rewards_agreement():
+    dense = ["a", "b", "c", "d"]
+    lexical = ["d", "b"]
+
+    assert rrf_fuse([dense, lexical]) == ["b", "d", "a", "c"]
+    assert rrf_fuse([dense, lexical], k=1) == ["b"]
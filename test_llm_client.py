@@ -0,0 +1,209 @@
+"""
+Tests for the rate-limited LLM HTTP client, against a local stub Groq server
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_client import LLMBusy, LLMHTTPClient, RateLimiter, is_rate_limit_error
+from llm_providers import load_llm
+from metrics import PipelineMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_requests_wait_for_the_per_minute_request_quota():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=10**6, clock=clock)
+
+    waits = [limiter.acquire(sleep=clock.sleep) for _ in range(3)]
+
+    assert waits == [0.0, 0.0, pytest.approx(30.0)]
+    assert limiter.throttled == 1
+    assert limiter.waiting == 0
+
+
+def test_token_quota_and_server_reports_limit_requests():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=600, clock=clock)
+
+    assert limiter.acquire(500, sleep=clock.sleep) == 0.0
+    assert limiter.acquire(200, sleep=clock.sleep) == pytest.approx(10.0)
+    limiter.observe_remaining_tokens(0)
+    assert limiter.acquire(60, sleep=clock.sleep) == pytest.approx(6.0)
+
+
+def test_waits_longer_than_max_wait_are_refused():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=10**6, max_wait=5,
+                          clock=clock)
+    limiter.acquire(sleep=clock.sleep)
+
+    with pytest.raises(LLMBusy) as error:
+        limiter.acquire(sleep=clock.sleep)
+
+    assert is_rate_limit_error(error.value)
+    assert limiter.rejected == 1
+
+
+def test_pause_holds_every_caller():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=10**6, clock=clock)
+
+    limiter.pause(3)
+
+    assert limiter.acquire(sleep=clock.sleep) == pytest.approx(3.0)
+
+
+def completion(content):
+    return {
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "stub",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+    }
+
+
+def chunk(content, finish_reason=None):
+    return {
+        "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+        "choices": [{"index": 0, "finish_reason": finish_reason,
+                     "delta": {"role": "assistant", "content": content}}],
+    }
+
+
+@pytest.fixture
+def stub_groq():
+    """Groq-compatible server that fails the first `failures` requests"""
+    state = {"failures": [], "requests": 0, "peers": set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connections can be reused
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            state["requests"] += 1
+            state["peers"].add(self.client_address)
+            if state["failures"]:
+                status = state["failures"].pop(0)
+                self._send(status, {"error": {"message": "slow down"}},
+                           {"Retry-After": "0"} if status == 429 else {})
+            elif body.get("stream"):
+                events = "".join(f"data: {json.dumps(c)}\n\n" for c in
+                                 (chunk("Hello "), chunk("there", "stop")))
+                self._send(200, events + "data: [DONE]\n\n", {}, "text/event-stream")
+            else:
+                self._send(200, completion("A stack is LIFO."),
+                           {"x-ratelimit-remaining-tokens": "11000"})
+
+        def _send(self, status, payload, headers, content_type="application/json"):
+            data = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+
+
+def stub_llm(stub, **client_options):
+    http = LLMHTTPClient(limiter=RateLimiter(6000, 10**7), base_delay=0.01, seed=0,
+                         **client_options)
+    return load_llm("groq", "stub", groq_api_key="test", http=http, base_url=stub["url"]), http
+
+
+def test_429s_are_retried_over_one_reused_connection(stub_groq):
+    stub_groq["failures"] = [429, 503]
+    llm, http = stub_llm(stub_groq)
+
+    assert llm.invoke("What is a stack?").content == "A stack is LIFO."
+    assert llm.invoke("What is a queue?").content == "A stack is LIFO."
+
+    assert stub_groq["requests"] == 4
+    assert len(stub_groq["peers"]) == 1
+    assert http.counters()["llm_retries_total"] == 2
+    assert http.counters()["llm_rate_limited_total"] == 1
+
+
+def test_streams_and_async_calls_are_retried_too(stub_groq):
+    stub_groq["failures"] = [429]
+    llm, http = stub_llm(stub_groq)
+
+    tokens = [c.content for c in llm.stream("Hi")]
+    stub_groq["failures"] = [502]
+    answer = asyncio.run(llm.ainvoke("Hi"))
+
+    assert "".join(tokens) == "Hello there"
+    assert answer.content == "A stack is LIFO."
+    assert http.retries == 2
+
+
+def test_async_calls_work_from_several_event_loops(stub_groq):
+    llm, http = stub_llm(stub_groq)
+
+    # Each asyncio.run is a new loop, like repeated abatch calls from a script
+    answers = [asyncio.run(llm.ainvoke("Hi")).content for _ in range(3)]
+
+    assert answers == ["A stack is LIFO."] * 3
+    assert http.retries == 0
+
+
+def test_rate_limit_survives_retries_as_a_429_error(stub_groq):
+    stub_groq["failures"] = [429] * 3
+    llm, http = stub_llm(stub_groq, max_retries=2)
+
+    with pytest.raises(Exception) as error:
+        llm.invoke("Hi")
+
+    assert is_rate_limit_error(error.value)
+    assert stub_groq["requests"] == 3
+
+
+
+def test_llm_busy_is_recognised_through_the_sdk_wrapper(stub_groq):
+    limiter = RateLimiter(requests_per_minute=1, max_wait=0)
+    limiter.acquire()  # the bucket is now empty
+    http = LLMHTTPClient(limiter=limiter, max_retries=0)
+    llm = load_llm("groq", "stub", groq_api_key="test", http=http, base_url=stub_groq["url"])
+
+    with pytest.raises(Exception) as error:
+        llm.invoke("What is a stack?")
+
+    assert not isinstance(error.value, LLMBusy)
+    assert is_rate_limit_error(error.value)
+    assert stub_groq["requests"] == 0
+    assert not is_rate_limit_error(RuntimeError("boom"))
+
+def test_queue_depth_is_exported_as_a_gauge():
+    http = LLMHTTPClient()
+    metrics = PipelineMetrics()
+    metrics.add_collector(http.counters)
+    metrics.add_collector(http.gauges, kind="gauge")
+
+    text = metrics.to_prometheus()
+
+    assert "# TYPE dsa_rag_llm_queue_depth gauge\ndsa_rag_llm_queue_depth 0" in text
+    assert "# TYPE dsa_rag_llm_retries_total counter" in text
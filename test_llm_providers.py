@@ -0,0 +1,73 @@
+"""
+Tests for the LLM providers and the offline mock model
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import HumanMessage
+
+from dsa_assistant import DSAAssistant
+from llm_providers import NOT_IN_NOTES, MockChatModel, MockLLMError, load_llm
+
+PROMPT = "Context:\nA stack is Last In, First Out.\n\nUser Question:\nWhat is a stack?\n\nAnswer:"
+
+
+def test_mock_streams_the_context_at_the_configured_speed():
+    llm = MockChatModel(latency=0.05, tokens_per_second=100)
+
+    start = time.perf_counter()
+    chunks = [c.content for c in llm.stream([HumanMessage(content=PROMPT)]) if c.content]
+    elapsed = time.perf_counter() - start
+
+    assert "".join(chunks) == "A stack is Last In, First Out."
+    assert len(chunks) == 7
+    assert elapsed >= 0.05 + 7 / 100
+
+
+def test_mock_answers_async_and_without_context():
+    llm = MockChatModel(latency=0, tokens_per_second=0)
+    empty = "Context:\n\nUser Question:\nWhat is a heap?\n\nAnswer:"
+
+    message = asyncio.run(llm.ainvoke([HumanMessage(content=empty)]))
+
+    assert message.content == NOT_IN_NOTES
+
+
+def test_mock_error_rate_is_seeded():
+    flaky = [MockChatModel(latency=0, tokens_per_second=0, error_rate=0.5, seed=7)
+             for _ in range(2)]
+    outcomes = []
+    for llm in flaky:
+        runs = []
+        for _ in range(20):
+            try:
+                llm.invoke(PROMPT)
+                runs.append(True)
+            except MockLLMError:
+                runs.append(False)
+        outcomes.append(runs)
+
+    assert outcomes[0] == outcomes[1]
+    assert 0 < outcomes[0].count(False) < 20
+
+
+def test_mock_provider_needs_no_api_key(tmp_path, monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    monkeypatch.setenv("DSA_MOCK_LATENCY", "0")
+    monkeypatch.setenv("DSA_MOCK_TOKENS_PER_SECOND", "0")
+    notes = tmp_path / "notes.txt"
+    notes.write_text("## Stacks\n" + "A stack is Last In, First Out (LIFO). " * 12)
+
+    assistant = DSAAssistant(notes_file=str(notes), persist_directory=str(tmp_path / "db"),
+                             embeddings=DeterministicFakeEmbedding(size=16),
+                             llm_provider="mock")
+    answer, sources = assistant.ask("What is a stack?")
+
+    assert isinstance(assistant.llm, MockChatModel)
+    assert "A stack is Last In" in answer
+    assert sources
+    with pytest.raises(ValueError):
+        load_llm("openai", "some-model")
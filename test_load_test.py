@@ -0,0 +1,29 @@
+"""
+Tests for the offline load test's reporting
+"""
+
+from load_test import format_percentiles, run_stream, summarize
+
+
+class FailingAssistant:
+    """Every question fails before its first token"""
+
+    def ask_stream(self, question):
+        raise RuntimeError("LLM down")
+        yield
+
+
+def test_summary_of_a_run_where_every_request_errors():
+    per_client = run_stream(FailingAssistant(), ["What is a stack?"], concurrency=2, requests=3)
+    summary = summarize(per_client, seconds=1.5)
+
+    assert (summary["requests"], summary["errors"]) == (6, 6)
+    assert summary["latency_p95_ms"] is None
+    assert format_percentiles(summary, "latency") == "n/a / n/a / n/a"
+    assert format_percentiles(summary, "first_token") == "n/a / n/a / n/a"
+
+
+def test_percentiles_are_whole_milliseconds():
+    summary = summarize([([(0.25, 0.1)], 0)], seconds=1.0)
+
+    assert format_percentiles(summary, "latency") == "250 / 250 / 250"
@@ -0,0 +1,71 @@
+"""
+Tests for the pipeline metrics and their Prometheus export
+"""
+
+import urllib.request
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import ChatPromptTemplate
+
+from metrics import MetricsCallback, PipelineMetrics
+
+
+def test_histogram_buckets_and_counters_in_prometheus_text():
+    metrics = PipelineMetrics()
+    metrics.observe("search", 0.003)
+    metrics.observe("search", 0.2)
+    metrics.count("errors_total", stage="llm")
+    metrics.add_collector(lambda: {"embedding_cache_hits_total": 4})
+
+    text = metrics.to_prometheus()
+
+    assert 'dsa_rag_stage_seconds_bucket{stage="search",le="0.005"} 1' in text
+    assert 'dsa_rag_stage_seconds_bucket{stage="search",le="0.25"} 2' in text
+    assert 'dsa_rag_stage_seconds_bucket{stage="search",le="+Inf"} 2' in text
+    assert 'dsa_rag_stage_seconds_count{stage="search"} 2' in text
+    assert 'dsa_rag_errors_total{stage="llm"} 1' in text
+    assert "dsa_rag_embedding_cache_hits_total 4" in text
+
+
+def test_stage_times_blocks_and_counts_errors():
+    metrics = PipelineMetrics()
+
+    with metrics.stage("embed"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.stage("embed"):
+            raise RuntimeError("model crashed")
+
+    assert metrics.breakdown()["embed"]["count"] == 2
+    assert metrics.counters()["errors_total"] == 1
+
+
+def test_callback_times_named_runs_and_counts_tokens():
+    metrics = PipelineMetrics()
+    chain = (
+        ChatPromptTemplate.from_template("Say {word}").with_config(run_name="prompt")
+        | FakeListChatModel(responses=["hello there"])
+    )
+
+    chain.invoke({"word": "hello"}, config={"callbacks": [MetricsCallback(metrics)]})
+
+    assert set(metrics.breakdown()) == {"prompt", "llm"}
+    counters = metrics.counters()
+    assert counters["prompt_tokens_total"] == 2
+    assert counters["completion_tokens_total"] == 2
+
+
+def test_serves_metrics_over_http(tmp_path):
+    metrics = PipelineMetrics()
+    metrics.observe("total", 1.5)
+    server = metrics.serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+    finally:
+        server.shutdown()
+    metrics.write(tmp_path / "dsa.prom")
+
+    assert 'dsa_rag_stage_seconds_sum{stage="total"} 1.5' in body
+    assert (tmp_path / "dsa.prom").read_text() == body
@@ -0,0 +1,75 @@
+"""
+Offline tests for the NumPy brute-force vector backend
+"""
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from numpy_store import NumpyVectorStore, top_k
+from vector_index import PersistentIndex
+
+TEXTS = [f"chunk number {i}" for i in range(50)]
+
+
+def test_top_k_matches_full_sort():
+    scores = np.random.default_rng(0).standard_normal((3, 200)).astype(np.float32)
+
+    rows = top_k(scores, 5)
+
+    assert rows.tolist() == np.argsort(-scores, axis=1)[:, :5].tolist()
+
+
+def test_search_returns_most_cosine_similar_chunks(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = NumpyVectorStore.from_texts(TEXTS, embeddings, persist_directory=str(tmp_path))
+
+    query = embeddings.embed_query("what is chunk 7")
+    docs = store.similarity_search_by_vector(query, k=4)
+
+    matrix = np.array(embeddings.embed_documents(TEXTS))
+    cosine = matrix @ query / np.linalg.norm(matrix, axis=1) / np.linalg.norm(query)
+    expected = [TEXTS[i] for i in np.argsort(-cosine)[:4]]
+    assert [d.page_content for d in docs] == expected
+    assert [d.page_content for d in store.search_many([query], k=4)[0]] == expected
+
+
+def test_saved_index_is_memory_mapped_on_load(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    NumpyVectorStore.from_texts(TEXTS, embeddings, persist_directory=str(tmp_path))
+
+    store = NumpyVectorStore(embeddings, persist_directory=str(tmp_path))
+
+    assert len(store) == len(TEXTS)
+    assert isinstance(store._snapshot.matrix, np.memmap)
+    assert store.as_retriever(search_kwargs={"k": 3}).invoke("chunk number 3")
+
+
+def test_persistent_index_syncs_numpy_backend(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    settings = {"embedding_model": "fake"}
+    PersistentIndex(embeddings, settings, str(tmp_path), backend="numpy").sync(["a", "b", "c"])
+
+    store, stats = PersistentIndex(
+        embeddings, settings, str(tmp_path), backend="numpy"
+    ).sync(["a", "b", "d"])
+
+    assert stats == {"added": 1, "removed": 1, "kept": 2}
+    assert sorted(store.get()["documents"]) == ["a", "b", "d"]
+
+
+def test_bulk_changes_are_saved_once_at_the_end(tmp_path, monkeypatch):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = NumpyVectorStore(embeddings, persist_directory=str(tmp_path))
+    saves = []
+    save = store._save
+    monkeypatch.setattr(store, "_save", lambda snap: saves.append(save(snap)))
+
+    with store.bulk():
+        for i in range(0, len(TEXTS), 5):
+            store.add_texts(TEXTS[i:i + 5], ids=[f"c{j}" for j in range(i, i + 5)])
+        store.delete(ids=["c0", "c5"])
+        assert len(store) == 0  # readers keep the old snapshot until the end
+
+    assert len(saves) == 1
+    reloaded = NumpyVectorStore(embeddings, persist_directory=str(tmp_path))
+    assert reloaded.get()["ids"] == [f"c{i}" for i in range(len(TEXTS)) if i not in (0, 5)]
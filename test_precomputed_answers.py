@@ -0,0 +1,54 @@
+"""
+Tests for the precomputed-answer store
+"""
+
+import json
+
+from langchain_core.documents import Document
+
+from precomputed_answers import (
+    EXAMPLE_TOPICS, PrecomputedAnswers, example_questions, load_questions, question_key
+)
+
+DOCS = [Document(page_content="A stack is LIFO.", metadata={"chunk_id": "c1", "topic": "Stacks"}),
+        Document(page_content="Push and pop.", metadata={"chunk_id": "c2", "topic": "Stacks"})]
+
+
+def test_entry_is_served_only_while_its_chunks_and_namespace_match():
+    store = PrecomputedAnswers()
+    key = question_key("What is a stack?", "Stacks")
+    store.put(key, "LIFO", DOCS, "ns", {"tokens": 9, "saved_tokens": 1})
+
+    assert store.get(key, "ns", {"c1", "c2", "c3"})["answer"] == "LIFO"
+    assert store.get(key, "other prompt", {"c1", "c2"}) is None
+    assert store.get(key, "ns", {"c1"}) is None
+    assert store.get(question_key("What is a queue?"), "ns", {"c1", "c2"}) is None
+    assert store.stats() == {"entries": 1, "hits": 1, "misses": 1, "stale": 2}
+
+
+def test_key_ignores_case_and_punctuation_but_not_topic():
+    assert question_key("What is a stack?", "Stacks") == question_key("what is a stack", "Stacks")
+    assert question_key("What is a stack?", "Stacks") != question_key("What is a stack?")
+
+
+def test_entries_persist_with_their_sources(tmp_path):
+    path = str(tmp_path / "precomputed.sqlite")
+    key = question_key("What is a stack?", ["Stacks"])
+    PrecomputedAnswers(path).put(key, "LIFO", DOCS, "ns")
+
+    entry = PrecomputedAnswers(path).get(key, "ns", {"c1", "c2"})
+
+    docs = PrecomputedAnswers.documents(entry)
+    assert entry["answer"] == "LIFO"
+    assert [d.page_content for d in docs] == [d.page_content for d in DOCS]
+    assert docs[0].metadata["topic"] == "Stacks"
+
+
+def test_questions_come_from_the_sidebar_or_a_json_file(tmp_path):
+    path = tmp_path / "questions.json"
+    path.write_text(json.dumps(["What is a heap?",
+                                {"question": "What is a stack?", "topic": "Stacks"}]))
+
+    assert load_questions(str(path)) == [("What is a heap?", None),
+                                         ("What is a stack?", "Stacks")]
+    assert example_questions()[0] == EXAMPLE_TOPICS["📊 Arrays"]
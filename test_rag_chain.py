@@ -0,0 +1,558 @@
+"""
+Offline tests for the RAG chain built by DSAAssistant
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from answer_cache import AnswerCache
+from dsa_assistant import DSAAssistant
+from metrics import PipelineMetrics
+
+TOPICS = {
+    "Arrays": "An array stores items next to each other in memory. ",
+    "Stacks": "A stack is Last In, First Out (LIFO). ",
+    "Queues": "A queue is First In, First Out (FIFO). ",
+    "Recursion": "A recursive function calls itself and needs a base case. ",
+}
+
+# Each section is long enough to become its own chunk
+NOTES = "\n".join(f"## {topic}\n{text * 12}" for topic, text in TOPICS.items())
+
+# A topic with a subsection long enough to split into several chunks
+NESTED_NOTES = (
+    "## Sorting\n" + "Sorting puts items in order. " * 20
+    + "\n### Merge Sort\n" + "Split the list, sort halves, merge them. " * 60
+)
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that count embedding calls"""
+    queries: int = 0
+    batches: int = 0
+    documents: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        self.batches += 1
+        self.documents += len(texts)
+        return super().embed_documents(texts)
+
+
+class PromptRecorder(BaseCallbackHandler):
+    """Record the prompt text sent to the chat model"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.prompts.append(messages[0][0].content)
+
+
+def make_assistant(tmp_path, responses=("A stack is LIFO.",), llm=None, notes=NOTES, **kwargs):
+    """Build an assistant around fake embeddings and a fake LLM, no network"""
+    notes_file = tmp_path / "notes.txt"
+    notes_file.write_text(notes, encoding="utf-8")
+    embeddings = CountingEmbeddings(size=16)
+    assistant = DSAAssistant(
+        notes_file=str(notes_file),
+        persist_directory=str(tmp_path / "chroma_db"),
+        embeddings=embeddings,
+        llm=llm if llm is not None else FakeListChatModel(responses=list(responses)),
+        **kwargs,
+    )
+    return assistant, embeddings
+
+
+def test_ask_retrieves_once(tmp_path):
+    assistant, embeddings = make_assistant(tmp_path)
+
+    answer, sources = assistant.ask("What is a stack?")
+
+    assert answer == "A stack is LIFO."
+    assert len(sources) == 3
+    assert embeddings.queries == 1
+
+
+def test_sources_are_the_prompt_context(tmp_path):
+    assistant, _ = make_assistant(tmp_path)
+    rag_chain, _ = assistant.qa_chain
+    recorder = PromptRecorder()
+
+    result = rag_chain.invoke("What is a queue?", config={"callbacks": [recorder]})
+
+    assert len(recorder.prompts) == 1
+    assert result["context"]["text"] in recorder.prompts[0]
+    for line in result["context"]["text"].splitlines():
+        assert any(line in doc.page_content for doc in result["docs"])
+
+
+def test_ask_stream_yields_tokens_then_sources(tmp_path):
+    assistant, embeddings = make_assistant(tmp_path, responses=("Queues are FIFO.",))
+
+    chunks = list(assistant.ask_stream("What is a queue?"))
+    tokens, result = chunks[:-1], chunks[-1]
+
+    assert len(tokens) > 1
+    assert all(isinstance(t, str) for t in tokens)
+    assert "".join(tokens) == "Queues are FIFO."
+    assert len(result["sources"]) == 3
+    assert 0 <= result["time_to_first_token"] <= result["total_time"]
+    assert embeddings.queries == 1
+
+
+class SlowChatModel(BaseChatModel):
+    """Async fake chat model that records how many calls overlap"""
+    delay: float = 0.05
+    in_flight: int = 0
+    peak: int = 0
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+def test_abatch_overlaps_calls_up_to_the_limit(tmp_path):
+    assistant, _ = make_assistant(tmp_path, llm=SlowChatModel(), max_concurrency=4)
+
+    results = asyncio.run(assistant.abatch([f"question {i}" for i in range(12)]))
+
+    assert [answer for answer, _ in results] == ["ok"] * 12
+    assert assistant.llm.peak == 4
+
+
+def test_aask_timeout_is_reported_per_item(tmp_path):
+    assistant, _ = make_assistant(tmp_path, llm=SlowChatModel(delay=1.0))
+
+    results = asyncio.run(assistant.abatch(["a", "b"], timeout=0.05))
+
+    assert all(isinstance(r, TimeoutError) for r in results)
+
+
+class EchoChatModel(BaseChatModel):
+    """Fake chat model that answers with the question, or fails on 'boom'"""
+
+    @property
+    def _llm_type(self):
+        return "echo-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        question = messages[0].content.split("User Question:")[1].split("Answer:")[0].strip()
+        if "boom" in question:
+            raise RuntimeError("upstream error")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=question))])
+
+
+def test_ask_many_batches_embedding_and_keeps_order(tmp_path):
+    assistant, embeddings = make_assistant(tmp_path, llm=EchoChatModel())
+    questions = [f"question {i}" for i in range(10)] + ["boom"]
+    embeddings.batches = 0
+
+    results = assistant.ask_many(questions)
+
+    assert embeddings.batches == 1
+    assert embeddings.queries == 0
+    assert [answer for answer, _ in results[:-1]] == questions[:-1]
+    assert all(len(docs) == 3 for _, docs in results[:-1])
+    assert isinstance(results[-1], RuntimeError)
+
+
+@pytest.mark.parametrize("expand_context", [False, True])
+def test_ask_many_matches_single_question_retrieval(tmp_path, expand_context):
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), notes=NESTED_NOTES, k=1,
+                                  expand_context=expand_context)
+
+    [(_, batch_docs)] = assistant.ask_many(["How does merge sort merge?"])
+    batch_stages = set(assistant.metrics.breakdown())
+    _, single_docs = assistant.ask("How does merge sort merge?")
+
+    assert [d.page_content for d in batch_docs] == [d.page_content for d in single_docs]
+    assert (len(batch_docs) > 1) == expand_context
+    assert {"embed", "search"} <= batch_stages
+
+
+def test_answer_cache_skips_llm_and_still_streams(tmp_path):
+    llm = FakeListChatModel(responses=["first", "second"])
+    cache = AnswerCache()
+    assistant, _ = make_assistant(tmp_path, llm=llm, answer_cache=cache)
+
+    answer, _ = assistant.ask("What is a stack?")
+    streamed = [c for c in assistant.ask_stream("What is a stack?") if isinstance(c, str)]
+    async_answer, _ = asyncio.run(assistant.aask("What is a stack?"))
+
+    assert answer == "first"
+    assert "".join(streamed) == "first"
+    assert async_answer == "first"
+    assert cache.stats()["hits"] == 2
+    assert assistant.ask("What is a queue?")[0] == "second"
+
+
+def test_repeated_question_is_not_reembedded(tmp_path):
+    assistant, embeddings = make_assistant(tmp_path, responses=("one", "two"))
+
+    assistant.ask("What is a stack?")
+    assistant.ask("What is a stack?")
+
+    assert embeddings.queries == 1
+
+
+def test_numpy_backend_answers_through_the_same_chain(tmp_path):
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), vector_backend="numpy")
+
+    answer, sources = assistant.ask("What is a stack?")
+    [(_, batch_sources)] = assistant.ask_many(["What is a stack?"])
+
+    assert answer == "What is a stack?"
+    assert len(sources) == 3
+    assert [d.page_content for d in batch_sources] == [d.page_content for d in sources]
+
+
+def test_background_init_answers_after_loading(tmp_path):
+    assistant, _ = make_assistant(tmp_path, background_init=True)
+
+    answer, sources = assistant.ask("What is a stack?")
+
+    assert assistant.is_ready()
+    assert answer == "A stack is LIFO."
+    assert len(sources) == 3
+
+
+def test_background_init_error_surfaces_on_first_question(tmp_path):
+    assistant = DSAAssistant(
+        notes_file=str(tmp_path / "missing.txt"),
+        persist_directory=str(tmp_path / "chroma_db"),
+        embeddings=CountingEmbeddings(size=16),
+        llm=FakeListChatModel(responses=["unused"]),
+        background_init=True,
+    )
+
+    with pytest.raises(FileNotFoundError):
+        assistant.ask("What is a stack?")
+
+
+def edit_notes(tmp_path, old, new):
+    notes_file = tmp_path / "notes.txt"
+    notes_file.write_text(notes_file.read_text(encoding="utf-8").replace(old, new),
+                          encoding="utf-8")
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_refresh_reembeds_only_the_edited_section(tmp_path, backend):
+    assistant, embeddings = make_assistant(tmp_path, llm=EchoChatModel(), vector_backend=backend)
+    embeddings.documents = 0
+
+    edit_notes(tmp_path, "(LIFO)", "(LIFO order)")
+    stats = assistant.refresh()
+
+    assert stats["sections_changed"] == 1
+    assert (stats["added"], stats["removed"], stats["kept"]) == (1, 1, 3)
+    assert embeddings.documents == 1
+    texts = [doc.page_content for doc in assistant.vectorstore.similarity_search("stack", k=4)]
+    assert any("LIFO order" in text for text in texts)
+    assert not any("(LIFO)" in text for text in texts)
+    [(cid, _)] = assistant.index.lexical.search("order")
+    assert "LIFO order" in assistant.index.vectorstore.get(ids=[cid])["documents"][0]
+    assert assistant.refresh()["sections_changed"] == 0
+
+
+def test_refresh_diffs_subsections_separately(tmp_path):
+    assistant, embeddings = make_assistant(tmp_path, llm=EchoChatModel(), notes=NESTED_NOTES)
+    embeddings.documents = 0
+
+    edit_notes(tmp_path, "merge them. Split", "merge them back. Split")
+    stats = assistant.refresh()
+
+    # Only the "### Merge Sort" section changed; its "## Sorting" intro is kept
+    assert stats["sections_changed"] == 1
+    assert stats["kept"] >= 1
+    metadatas = assistant.index.vectorstore.get()["metadatas"]
+    assert {m["topic"] for m in metadatas} == {"Sorting"}
+
+
+class GatedChatModel(BaseChatModel):
+    """Fake chat model that waits for the test to open a gate"""
+    gate: threading.Event
+    started: threading.Event
+
+    @property
+    def _llm_type(self):
+        return "gated-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.started.set()
+        self.gate.wait(5)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+def test_question_in_flight_keeps_its_snapshot(tmp_path, monkeypatch):
+    llm = GatedChatModel(gate=threading.Event(), started=threading.Event())
+    assistant, _ = make_assistant(tmp_path, llm=llm, k=4)
+    results = []
+    worker = threading.Thread(target=lambda: results.append(assistant.ask("What is a stack?")))
+
+    worker.start()
+    assert llm.started.wait(5)
+    edit_notes(tmp_path, "(LIFO)", "(LIFO order)")
+    assistant.refresh()
+    llm.gate.set()
+    worker.join(5)
+
+    [(_, old_sources)] = results
+    assert any("(LIFO)" in doc.page_content for doc in old_sources)
+    _, new_sources = assistant.ask("What is a stack?")
+    assert any("LIFO order" in doc.page_content for doc in new_sources)
+
+
+def test_watch_applies_edits_while_running(tmp_path):
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), watch_interval=0.05)
+    try:
+        edit_notes(tmp_path, "(FIFO)", "(FIFO order)")
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            texts = [d.page_content for d in assistant.vectorstore.similarity_search("queue", k=4)]
+            if any("FIFO order" in text for text in texts):
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("edited section never reached the index")
+    finally:
+        assistant.stop_watching()
+
+
+class FlakyEmbeddings(CountingEmbeddings):
+    """Fails the next `failures` document embedding calls"""
+    failures: int = 0
+
+    def embed_documents(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("embedding service unavailable")
+        return super().embed_documents(texts)
+
+
+def test_watch_retries_an_edit_whose_refresh_failed(tmp_path):
+    notes_file = tmp_path / "notes.txt"
+    notes_file.write_text(NOTES, encoding="utf-8")
+    embeddings = FlakyEmbeddings(size=16)
+    assistant = DSAAssistant(notes_file=str(notes_file),
+                             persist_directory=str(tmp_path / "chroma_db"),
+                             embeddings=embeddings, llm=EchoChatModel(), watch_interval=0.05)
+    try:
+        embeddings.failures = 1
+        edit_notes(tmp_path, "(FIFO)", "(FIFO order)")
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            texts = [d.page_content for d in assistant.vectorstore.similarity_search("queue", k=4)]
+            if any("FIFO order" in text for text in texts):
+                break
+            time.sleep(0.05)
+        else:
+            pytest.fail("edit was dropped after one failed refresh")
+        assert embeddings.failures == 0
+    finally:
+        assistant.stop_watching()
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_topic_restricts_the_search(tmp_path, backend):
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), vector_backend=backend)
+
+    _, sources = assistant.ask("What is a queue?", topic="📚 Stacks")
+    _, both = assistant.ask("Stack or queue?", topic=["Stacks", "Queues"])
+    _, unknown = assistant.ask("What is a queue?", topic="Graphs")
+
+    assert assistant.topics() == list(TOPICS)
+    assert [doc.metadata["topic"] for doc in sources] == ["Stacks"]
+    assert {doc.metadata["topic"] for doc in both} == {"Stacks", "Queues"}
+    assert len(unknown) == 3
+
+
+def test_expand_context_adds_neighbours_and_parent(tmp_path):
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), notes=NESTED_NOTES,
+                                  k=1, expand_context=True)
+
+    _, sources = assistant.ask("How does merge sort merge?", topic="Merge Sort")
+
+    paths = [doc.metadata["heading_path"] for doc in sources]
+    assert paths[0] == "Sorting > Merge Sort"
+    assert "Sorting" in paths[1:]
+    assert paths.count("Sorting > Merge Sort") >= 2
+
+
+def test_hybrid_retrieval_finds_exact_terms(tmp_path):
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), k=1)
+    (tmp_path / "dense").mkdir()
+    dense, _ = make_assistant(tmp_path / "dense", llm=EchoChatModel(), k=1, retrieval="dense")
+
+    _, sources = assistant.ask("LIFO")
+    [(_, batch_sources)] = assistant.ask_many(["LIFO"])
+
+    assert [doc.metadata["topic"] for doc in sources] == ["Stacks"]
+    assert [doc.page_content for doc in batch_sources] == [doc.page_content for doc in sources]
+    assert dense.index.lexical is None
+
+
+def test_context_budget_trims_overlap_and_reports_savings(tmp_path):
+    notes = "## Hashing\n" + "".join(f"Hash tables map key {i} to a bucket. " for i in range(120))
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), notes=notes,
+                                  k=3, context_tokens=150)
+
+    chunks = list(assistant.ask_stream("How do hash tables map keys?"))
+    result = chunks[-1]
+    rag_chain, _ = assistant.qa_chain
+    context = rag_chain.invoke("How do hash tables map keys?")["context"]
+
+    assert context["original_tokens"] > 3 * 150
+    assert context["tokens"] <= 150
+    assert result["context_tokens"] == context["tokens"]
+    assert result["saved_tokens"] == context["original_tokens"] - context["tokens"]
+
+
+def test_reranker_picks_k_of_a_wider_candidate_set(tmp_path):
+    from reranker import Reranker
+
+    class PreferQueues:
+        def __init__(self):
+            self.batches = []
+
+        def predict(self, pairs, batch_size=32):
+            self.batches.append(len(pairs))
+            return [float("FIFO" in text) for _, text in pairs]
+
+    scorer = PreferQueues()
+    assistant, _ = make_assistant(tmp_path, llm=EchoChatModel(), k=1,
+                                  reranker=Reranker(model=scorer, candidates=4))
+
+    _, sources = assistant.ask("Tell me about arrays")
+    [(_, batch_sources)] = assistant.ask_many(["Tell me about arrays"])
+
+    assert [doc.metadata["topic"] for doc in sources] == ["Queues"]
+    assert [doc.metadata["topic"] for doc in batch_sources] == ["Queues"]
+    # All four sections scored in one pass, then served from the score cache
+    assert scorer.batches == [4]
+
+
+def test_metrics_time_each_stage_and_count_cache_hits(tmp_path):
+    assistant, _ = make_assistant(tmp_path, responses=("A stack is LIFO.",),
+                                  answer_cache=AnswerCache())
+
+    assistant.ask("What is a stack?")
+    assistant.ask("What is a stack?")
+
+    stages = assistant.metrics.breakdown()
+    counters = assistant.metrics.counters()
+    assert {"embed", "search", "context", "prompt", "llm", "parse", "total"} <= set(stages)
+    assert stages["llm"]["count"] == 1
+    assert stages["total"]["count"] == 2
+    assert counters["answer_cache_hits_total"] == 1
+    assert counters["prompt_tokens_total"] > 0
+
+
+def test_assistants_sharing_metrics_sum_their_collectors(tmp_path):
+    metrics = PipelineMetrics()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    first, _ = make_assistant(tmp_path / "a", llm=EchoChatModel(), metrics=metrics)
+    registered = len(metrics._collectors)
+    second, _ = make_assistant(tmp_path / "b", llm=EchoChatModel(), metrics=metrics)
+
+    first.ask("What is a stack?")
+    second.ask("What is a queue?")
+    second.ask("What is a tree?")
+
+    misses = first.embeddings.misses + second.embeddings.misses
+    assert first.embeddings.misses and second.embeddings.misses
+    assert metrics.counters()["embedding_cache_misses_total"] == misses
+    assert f"dsa_rag_embedding_cache_misses_total {misses}\n" in metrics.to_prometheus()
+    # The process-wide LLM client collectors are registered once, not per assistant
+    assert len(metrics._collectors) == 2 * registered - 2
+
+
+def test_identical_concurrent_streams_share_one_llm_call(tmp_path):
+    llm = GatedChatModel(gate=threading.Event(), started=threading.Event())
+    assistant, _ = make_assistant(tmp_path, llm=llm)
+    questions = ["Explain merge sort step by step", "explain merge sort step by step?"] * 3
+    answers = []
+
+    def click(question):
+        tokens = [c for c in assistant.ask_stream(question) if isinstance(c, str)]
+        answers.append("".join(tokens))
+
+    threads = [threading.Thread(target=click, args=(q,)) for q in questions]
+    for thread in threads:
+        thread.start()
+    assert llm.started.wait(5)
+    deadline = time.monotonic() + 5
+    while assistant._single_flight.coalesced < len(questions) - 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    llm.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert answers == ["ok"] * len(questions)
+    assert assistant.metrics.breakdown()["llm"]["count"] == 1
+    assert assistant.metrics.counters()["coalesced_requests_total"] == len(questions) - 1
+
+
+def test_warm_up_precomputes_answers_and_refresh_invalidates_them(tmp_path):
+    from precomputed_answers import PrecomputedAnswers
+
+    path = str(tmp_path / "precomputed.sqlite")
+    llm = FakeListChatModel(responses=["first", "second", "third"])
+    assistant, embeddings = make_assistant(
+        tmp_path, llm=llm, precomputed=PrecomputedAnswers(path),
+        warmup_questions=[("What is a stack?", "Stacks")],
+    )
+    assistant.warm_up()
+    queries = embeddings.queries
+
+    chunks = list(assistant.ask_stream("what is a stack", topic="Stacks"))
+
+    assert chunks[0] == "first"
+    assert chunks[-1]["precomputed"] is True
+    assert "LIFO" in chunks[-1]["sources"][0].page_content
+    assert asyncio.run(assistant.aask("What is a stack?", topic="Stacks"))[0] == "first"
+    assert embeddings.queries == queries  # no retrieval
+    assert assistant.metrics.counters()["precomputed_hits_total"] == 2
+
+    # Editing the section drops the chunks the stored answer came from
+    edit_notes(tmp_path, "(LIFO)", "(LIFO order)")
+    assistant.refresh()
+    assistant.warm_up()
+    answer, sources = assistant.ask("What is a stack?", topic="Stacks")
+
+    assert answer == "second"
+    assert "LIFO order" in sources[0].page_content
+
+    # A restarted process serves the stored answer without an LLM call
+    restarted, _ = make_assistant(
+        tmp_path, llm=FakeListChatModel(responses=["unused"]),
+        notes=(tmp_path / "notes.txt").read_text(encoding="utf-8"),
+        precomputed=PrecomputedAnswers(path),
+    )
+    assert restarted.ask("What is a stack?", topic="Stacks")[0] == "second"
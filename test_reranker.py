@@ -0,0 +1,104 @@
+"""
+Tests for the cross-encoder rerank stage, with a fake scorer
+"""
+
+import time
+
+from langchain_core.documents import Document
+
+from reranker import Reranker
+
+
+class KeywordScorer:
+    """Scores a pair by how often the chunk contains the question's last word"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32):
+        self.calls.append(len(pairs))
+        time.sleep(self.delay * len(pairs))
+        return [text.count(question.split()[-1]) for question, text in pairs]
+
+
+def make_docs(*texts):
+    return [Document(page_content=text, metadata={"chunk_id": f"c{i}"})
+            for i, text in enumerate(texts)]
+
+
+def test_rerank_keeps_best_scores_in_one_forward_pass():
+    scorer = KeywordScorer()
+    reranker = Reranker(model=scorer)
+    docs = make_docs("a queue", "stack stack", "arrays", "stack")
+
+    best = reranker.rerank("what is a stack", docs, k=2)
+
+    assert [doc.page_content for doc in best] == ["stack stack", "stack"]
+    assert scorer.calls == [4]
+
+
+def test_scores_are_cached_per_question_and_chunk():
+    scorer = KeywordScorer()
+    reranker = Reranker(model=scorer)
+    docs = make_docs("stack", "queue", "heap")
+
+    reranker.rerank("what is a stack", docs, k=1)
+    extra = Document(page_content="stack stack", metadata={"chunk_id": "c9"})
+    best = reranker.rerank("What is a  stack", docs[:2] + [extra], k=1)
+
+    # Only the new chunk is scored the second time
+    assert scorer.calls == [3, 1]
+    assert best == [extra]
+    assert reranker.stats()["cached_pairs"] == 2
+
+
+def test_skips_when_the_latency_budget_would_be_exceeded():
+    scorer = KeywordScorer(delay=0.01)
+    reranker = Reranker(model=scorer, latency_budget=0.05)
+    reranker.rerank("what is a stack", make_docs("queue", "stack"), k=1)
+
+    docs = make_docs(*[f"chunk {i}" for i in range(8)])
+    kept = reranker.rerank("what is a heap", docs, k=3)
+
+    assert kept == docs[:3]
+    assert scorer.calls == [2]
+    assert reranker.stats()["skipped"] == 1
+
+
+class SlowStartScorer(KeywordScorer):
+    """Slow on its first call only, like a cold CPU cache"""
+
+    def predict(self, pairs, batch_size=32):
+        delay, self.delay = self.delay, 0.0
+        time.sleep(delay)
+        return super().predict(pairs, batch_size)
+
+
+def test_recovers_after_one_slow_call():
+    scorer = SlowStartScorer(delay=0.5)
+    reranker = Reranker(model=scorer, latency_budget=0.05, probe_every=2)
+    reranker.rerank("what is a stack", make_docs("queue", "stack"), k=1)
+
+    for i in range(3):
+        reranker.rerank(f"what is a heap {i}", make_docs("heap", "queue", "stack"), k=1)
+
+    # Two skips, a one-pair probe, then the cheap estimate lets it rerank again
+    assert scorer.calls == [2, 1, 3]
+    assert reranker.stats()["skipped"] == 2
+    assert reranker.stats()["reranked"] == 2
+
+
+def test_model_loading_is_not_counted_as_scoring_time(monkeypatch):
+    def slow_load(model_name):
+        time.sleep(0.3)
+        return KeywordScorer()
+
+    monkeypatch.setattr("reranker.create_cross_encoder", slow_load)
+    reranker = Reranker(latency_budget=0.05)
+
+    reranker.rerank("what is a stack", make_docs("queue", "stack"), k=1)
+
+    assert reranker.seconds_per_pair < 0.01
+    reranker.rerank("what is a heap", make_docs(*[f"heap {i}" for i in range(12)]), k=3)
+    assert reranker.stats()["reranked"] == 2
@@ -0,0 +1,43 @@
+"""
+Offline tests for the heading-aware section tree
+"""
+
+from section_tree import SectionTree, normalize_title
+
+CHUNKS = [
+    ("intro", {"source": "notes.md", "heading_path": "Notes"}),
+    ("search", {"source": "notes.md", "heading_path": "Notes > Searching", "topic": "Searching"}),
+    ("linear", {"source": "notes.md", "heading_path": "Notes > Searching > 1. Linear Search",
+                "topic": "Searching"}),
+    ("binary-1", {"source": "notes.md", "heading_path": "Notes > Searching > 2. Binary Search",
+                  "topic": "Searching"}),
+    ("binary-2", {"source": "notes.md", "heading_path": "Notes > Searching > 2. Binary Search",
+                  "topic": "Searching"}),
+    ("binary-3", {"source": "notes.md", "heading_path": "Notes > Searching > 2. Binary Search",
+                  "topic": "Searching"}),
+    ("stacks", {"source": "notes.md", "heading_path": "Notes > Stacks", "topic": "Stacks",
+                "headings": ["Stacks", "Stack Operations"]}),
+]
+
+
+def test_labels_resolve_to_topics():
+    tree = SectionTree(CHUNKS)
+
+    assert normalize_title("### 2. Binary Search") == "binary search"
+    assert tree.topics() == ["Searching", "Stacks"]
+    assert tree.resolve("🔍 Binary Search") == ["Searching"]
+    assert tree.resolve(["Stacks", "searching"]) == ["Stacks", "Searching"]
+    assert tree.resolve("stack operations") == ["Stacks"]
+    assert tree.resolve("Graphs") == []
+    assert tree.topic_chunks("Stacks") == ["stacks"]
+
+
+def test_parent_and_siblings_are_direct_lookups():
+    tree = SectionTree(CHUNKS)
+
+    assert tree.siblings("binary-2") == ["binary-1", "binary-3"]
+    assert tree.siblings("binary-1") == ["binary-2"]
+    assert tree.parent("binary-3") == "search"
+    assert tree.parent("search") == "intro"
+    assert tree.parent("intro") is None
+    assert tree.related(["binary-2", "binary-1"]) == ["search", "binary-3"]
@@ -0,0 +1,64 @@
+"""
+Offline tests for the process-wide shared resource layer
+"""
+
+import threading
+
+from shared_resources import SharedResources
+
+
+def test_concurrent_sessions_share_one_build(tmp_path):
+    built = {"embeddings": 0, "llm": 0, "assistant": 0}
+
+    def fake_embeddings():
+        built["embeddings"] += 1
+        return object()
+
+    def fake_llm():
+        built["llm"] += 1
+        return object()
+
+    def fake_assistant(**kwargs):
+        built["assistant"] += 1
+        return kwargs
+
+    shared = SharedResources(fake_embeddings, fake_llm, fake_assistant)
+    handles = []
+
+    def open_session(i):
+        handles.append(shared.assistant(persist_directory=str(tmp_path),
+                                        session_id=f"session-{i}"))
+
+    threads = [threading.Thread(target=open_session, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert built == {"embeddings": 1, "llm": 1, "assistant": 1}
+    assert all(h is handles[0] for h in handles)
+    assert handles[0]["embeddings"] is shared.embeddings()
+    assert handles[0]["answer_cache"] is shared.answer_cache(str(tmp_path))
+
+    stats = shared.stats()
+    assert stats["assistants"] == 1
+    assert stats["sessions"] == 20
+
+    shared.release_session("session-0")
+    assert shared.stats()["sessions"] == 19
+
+
+def test_idle_sessions_expire_from_the_stats(tmp_path):
+    now = [0.0]
+    shared = SharedResources(object, object, lambda **kwargs: kwargs,
+                             session_ttl=60, clock=lambda: now[0])
+    shared.assistant(persist_directory=str(tmp_path), session_id="a")
+    shared.assistant(persist_directory=str(tmp_path), session_id="b")
+
+    now[0] = 45.0
+    shared.touch_session("a")
+    now[0] = 90.0
+
+    assert shared.stats()["sessions"] == 1
+    shared.touch_session("b")
+    assert shared.stats()["sessions"] == 2
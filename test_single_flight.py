@@ -0,0 +1,85 @@
+"""
+Tests for single-flight request coalescing
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_run():
+    flights = SingleFlight()
+    gate = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        gate.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.call("q", work)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: flights.coalesced == 4)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert runs == [1]
+    assert results == ["answer"] * 5
+    assert flights.call("q", lambda: "fresh") == "fresh"  # finished runs are forgotten
+
+
+def test_streams_replay_from_the_start_and_share_errors():
+    flights = SingleFlight()
+    gate = threading.Event()
+
+    def tokens():
+        yield "a"
+        gate.wait(5)
+        yield "b"
+        raise RuntimeError("upstream")
+
+    leader = flights.stream("q", tokens)
+    assert next(leader) == "a"
+    late = flights.stream("q", lambda: iter(["never"]))
+    gate.set()
+
+    assert next(late) == "a"
+    assert next(late) == "b"
+    with pytest.raises(RuntimeError):
+        next(late)
+    leader.close()  # stopping early doesn't disturb the run
+
+
+def test_async_calls_share_one_task_and_survive_a_cancelled_caller():
+    flights = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        impatient = asyncio.create_task(flights.acall("q", work))
+        await asyncio.sleep(0)
+        others = [flights.acall("q", work) for _ in range(3)]
+        impatient.cancel()
+        return await asyncio.gather(*others)
+
+    assert asyncio.run(scenario()) == ["answer"] * 3
+    assert runs == [1]
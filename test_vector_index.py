@@ -0,0 +1,51 @@
+"""
+Offline tests for the content-addressed persistent index
+"""
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from vector_index import PersistentIndex
+
+SETTINGS = {"splitter": {"chunk_size": 1000}, "embedding_model": "fake"}
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that remember how many documents were embedded"""
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_warm_start_skips_embedding(tmp_path):
+    embeddings = CountingEmbeddings(size=8)
+    texts = ["arrays store items", "stacks are LIFO", "queues are FIFO"]
+
+    _, stats = PersistentIndex(embeddings, SETTINGS, str(tmp_path)).sync(texts)
+    assert stats == {"added": 3, "removed": 0, "kept": 0}
+
+    vectorstore, stats = PersistentIndex(embeddings, SETTINGS, str(tmp_path)).sync(texts)
+    assert stats == {"added": 0, "removed": 0, "kept": 3}
+    assert embeddings.embedded == 3
+    assert len(vectorstore.get(include=[])["ids"]) == 3
+
+
+def test_only_changed_chunks_are_reembedded(tmp_path):
+    embeddings = CountingEmbeddings(size=8)
+    PersistentIndex(embeddings, SETTINGS, str(tmp_path)).sync(["a", "b", "c"])
+
+    vectorstore, stats = PersistentIndex(embeddings, SETTINGS, str(tmp_path)).sync(["a", "b", "d"])
+    assert stats == {"added": 1, "removed": 1, "kept": 2}
+    assert embeddings.embedded == 4
+    assert sorted(vectorstore.get()["documents"]) == ["a", "b", "d"]
+
+
+def test_settings_change_rebuilds_index(tmp_path):
+    embeddings = CountingEmbeddings(size=8)
+    PersistentIndex(embeddings, SETTINGS, str(tmp_path)).sync(["a", "b"])
+
+    other = dict(SETTINGS, embedding_model="other")
+    vectorstore, stats = PersistentIndex(embeddings, other, str(tmp_path)).sync(["a", "b"])
+    assert stats == {"added": 2, "removed": 0, "kept": 0}
+    assert len(vectorstore.get(include=[])["ids"]) == 2
@@ -0,0 +1,325 @@
+"""
+Content-addressed persistent vector index for the DSA notes
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from ingestion import heading_titles
+from lexical_index import BM25Index
+from section_tree import SectionTree
+
+
+MANIFEST_FILE = "index_manifest.json"
+BACKENDS = ("chroma", "numpy")
+ADD_BATCH_SIZE = 1000  # Chroma rejects very large single inserts
+
+
+def settings_fingerprint(settings):
+    """Hash the splitter and embedding settings that shape every chunk vector"""
+    payload = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _chunk_info(text, metadata):
+    """What the manifest and the section tree keep about one chunk"""
+    info = {"chars": len(text)}
+    for key, name in (("section_id", "section"), ("source", "source"),
+                      ("heading_path", "heading_path"), ("topic", "topic")):
+        if metadata.get(key):
+            info[name] = metadata[key]
+    # Subheadings that start inside the chunk, so the tree can find them too
+    headings = heading_titles(text)
+    if headings:
+        info["headings"] = headings
+    return info
+
+
+def chunk_id(text, fingerprint, metadata=None):
+    """Stable ID for a chunk: same text + metadata + settings -> same ID"""
+    digest = hashlib.sha256()
+    digest.update(fingerprint.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    if metadata:
+        digest.update(b"\0")
+        digest.update(json.dumps(metadata, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; used to swap index contents"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            # Block new readers first, then wait for the current ones to leave
+            while self._writing:
+                self._cond.wait()
+            self._writing = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class PersistentIndex:
+    """Vector store kept in sync with the notes through a hash manifest"""
+
+    def __init__(self, embeddings, settings, persist_directory="./chroma_db",
+                 collection_name="dsa_notes", backend="chroma", lexical=False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown vector backend {backend!r}, expected one of {BACKENDS}")
+        self.backend = backend
+        self.embeddings = embeddings
+        self.settings = settings
+        self.fingerprint = settings_fingerprint(settings)
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.manifest_path = os.path.join(persist_directory, MANIFEST_FILE)
+        # Set by sync_chunks; sync_sections updates them in place
+        self.vectorstore = None
+        self.chunks = {}
+        self.tree = SectionTree()
+        # Optional BM25 index over the same chunks, for hybrid retrieval
+        self.lexical = BM25Index() if lexical else None
+
+    def _load_manifest(self):
+        """Read the manifest written by the previous sync (if any)"""
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A corrupt manifest just means we fall back to the collection itself
+            return None
+
+    def _save_manifest(self, chunks):
+        """Atomically write the manifest for the current chunk set"""
+        os.makedirs(self.persist_directory, exist_ok=True)
+        manifest = {
+            "fingerprint": self.fingerprint,
+            "settings": self.settings,
+            "chunks": chunks,
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _open_collection(self):
+        # Only pay for the backend that is actually used
+        if self.backend == "numpy":
+            from numpy_store import NumpyVectorStore
+            return NumpyVectorStore(self.embeddings, persist_directory=self.persist_directory)
+        from langchain_community.vectorstores import Chroma
+        return Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory,
+        )
+
+    def sync(self, texts, metadatas=None):
+        """
+        Load the persisted collection and bring it in line with `texts`.
+
+        Only chunks whose ID is missing from the collection are embedded;
+        chunks that no longer exist in the notes are deleted. Returns the
+        vector store and a dict with `added`, `removed` and `kept` counts.
+        """
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+        return self.sync_chunks(zip(texts, metadatas))
+
+    def sync_chunks(self, chunks):
+        """
+        Like `sync`, but consumes an iterable of (text, metadata) pairs.
+
+        New chunks are embedded and inserted in batches of ADD_BATCH_SIZE
+        on a background thread while the iterable is still being produced,
+        so splitting overlaps with embedding and at most two batches of
+        text are held at a time. Stale chunks are deleted once it is
+        exhausted.
+        """
+        vectorstore = self._open_collection()
+        manifest = self._load_manifest()
+
+        if manifest is not None and manifest.get("fingerprint") != self.fingerprint:
+            # Splitter or embedding model changed: old vectors are incompatible
+            vectorstore.delete_collection()
+            vectorstore = self._open_collection()
+            manifest = None
+
+        existing = set(vectorstore.get(include=[])["ids"])
+        if manifest is not None and set(manifest.get("chunks", {})) != existing:
+            # Interrupted sync or manual edits; the collection is the truth
+            print("⚠️  Index manifest out of date, re-checking collection")
+
+        wanted = {}
+        batch = []
+        added = 0
+        lexical = BM25Index() if self.lexical is not None else None
+        # One writer thread: embeds batch N while the caller produces N + 1
+        writer = ThreadPoolExecutor(max_workers=1)
+        pending = None
+
+        def flush():
+            nonlocal batch, pending
+            if pending is not None:
+                pending.result()
+            pending = writer.submit(
+                vectorstore.add_texts,
+                texts=[text for _, text, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch],
+                ids=[cid for cid, _, _ in batch],
+            )
+            batch = []
+
+        # The NumPy store rebuilds and saves its matrix once, after the last batch
+        bulk = vectorstore.bulk() if hasattr(vectorstore, "bulk") else nullcontext()
+        with bulk:
+            try:
+                for text, metadata in chunks:
+                    metadata = metadata or {}
+                    cid = chunk_id(text, self.fingerprint, metadata)
+                    # Identical chunks collapse onto one ID, so keep the first occurrence
+                    if cid in wanted:
+                        continue
+                    wanted[cid] = _chunk_info(text, metadata)
+                    if lexical is not None:
+                        lexical.add(cid, text)
+                    if cid not in existing:
+                        # Keep the ID on the chunk so retrieved documents can name it
+                        batch.append((cid, text, dict(metadata, chunk_id=cid)))
+                        added += 1
+                        if len(batch) >= ADD_BATCH_SIZE:
+                            flush()
+                if batch:
+                    flush()
+                if pending is not None:
+                    pending.result()
+                stale_ids = [cid for cid in existing if cid not in wanted]
+                if stale_ids:
+                    vectorstore.delete(ids=stale_ids)
+            finally:
+                writer.shutdown(wait=True)
+
+        self._save_manifest(wanted)
+        self.vectorstore = vectorstore
+        self.chunks = wanted
+        self.tree = SectionTree(wanted.items())
+        self.lexical = lexical
+
+        stats = {
+            "added": added,
+            "removed": len(stale_ids),
+            "kept": len(wanted) - added,
+        }
+        return vectorstore, stats
+
+    def _add_embedded(self, entries, vectors):
+        """Insert (id, text, metadata) entries with precomputed vectors"""
+        for start in range(0, len(entries), ADD_BATCH_SIZE):
+            batch = entries[start:start + ADD_BATCH_SIZE]
+            ids = [cid for cid, _, _ in batch]
+            texts = [text for _, text, _ in batch]
+            metadatas = [metadata for _, _, metadata in batch]
+            embeddings = vectors[start:start + ADD_BATCH_SIZE]
+            if hasattr(self.vectorstore, "add_embeddings"):
+                self.vectorstore.add_embeddings(texts, embeddings, metadatas, ids)
+            else:
+                # The LangChain Chroma wrapper can't take precomputed vectors
+                self.vectorstore._collection.upsert(
+                    ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas
+                )
+
+    def sync_sections(self, sections, write_lock=None):
+        """
+        Refresh an already synced index section by section.
+
+        `sections` yields (section_id, split) pairs, where `split()` returns
+        the section's (text, metadata) chunks. Sections already in the
+        index keep their chunks without being split; only new or edited
+        ones are split and embedded. All embedding happens before
+        `write_lock` is taken, so the lock is only held for the quick
+        insert-and-delete and readers using it never see half an update.
+        Returns a dict with `sections_changed`, `added`, `removed`, `kept`.
+        """
+        if self.vectorstore is None:
+            raise RuntimeError("sync_chunks must run before sync_sections")
+
+        by_section = {}
+        for cid, info in self.chunks.items():
+            by_section.setdefault(info.get("section"), []).append(cid)
+
+        wanted = {}
+        new = []
+        changed = 0
+        for section_id, split in sections:
+            if section_id in by_section:
+                for cid in by_section[section_id]:
+                    wanted[cid] = self.chunks[cid]
+                continue
+            changed += 1
+            for text, metadata in split():
+                cid = chunk_id(text, self.fingerprint, metadata)
+                if cid in wanted:
+                    continue
+                wanted[cid] = _chunk_info(text, dict(metadata, section_id=section_id))
+                if cid not in self.chunks:
+                    new.append((cid, text, dict(metadata, chunk_id=cid)))
+
+        stale_ids = [cid for cid in self.chunks if cid not in wanted]
+        vectors = self.embeddings.embed_documents([text for _, text, _ in new]) if new else []
+        tree = SectionTree(wanted.items())
+
+        bulk = self.vectorstore.bulk() if hasattr(self.vectorstore, "bulk") else nullcontext()
+        with write_lock() if write_lock else nullcontext():
+            with bulk:
+                if new:
+                    self._add_embedded(new, vectors)
+                if stale_ids:
+                    self.vectorstore.delete(ids=stale_ids)
+            if self.lexical is not None:
+                for cid, text, _ in new:
+                    self.lexical.add(cid, text)
+                for cid in stale_ids:
+                    self.lexical.remove(cid)
+            self.chunks = wanted
+            self.tree = tree
+
+        self._save_manifest(wanted)
+        return {
+            "sections_changed": changed,
+            "added": len(new),
+            "removed": len(stale_ids),
+            "kept": len(wanted) - len(new),
+        }